@@ -146,7 +146,8 @@ class AddressForm(forms.ModelForm):
     class Meta:
         model = Address
         fields = ('address_type', 'recipient_name', 'recipient_phone', 'flat_number',
-                 'street_address', 'landmark', 'city', 'state', 'pincode', 'is_default')
+                 'street_address', 'landmark', 'city', 'state', 'pincode', 'is_default',
+                 'latitude', 'longitude')
         widgets = {
             'address_type': forms.Select(attrs={'class': 'form-select'}),
             'recipient_name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -158,4 +159,6 @@ class AddressForm(forms.ModelForm):
             'state': forms.TextInput(attrs={'class': 'form-control'}),
             'pincode': forms.TextInput(attrs={'class': 'form-control'}),
             'is_default': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'latitude': forms.HiddenInput(),
+            'longitude': forms.HiddenInput(),
         }
@@ -4,7 +4,7 @@ from .models import Advertisement, AdClick, AdImpression
 
 @admin.register(Advertisement)
 class AdvertisementAdmin(admin.ModelAdmin):
-    list_display = ['title', 'placement', 'status', 'impressions', 'clicks', 'ctr', 'start_date', 'end_date']
+    list_display = ['title', 'placement', 'status', 'weight', 'impressions', 'clicks', 'ctr', 'start_date', 'end_date']
     list_filter = ['status', 'placement', 'start_date', 'end_date']
     search_fields = ['title', 'description']
     readonly_fields = ['impressions', 'clicks', 'ctr', 'created_at', 'updated_at']
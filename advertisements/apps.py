@@ -5,3 +5,6 @@ class AdvertisementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'advertisements'
     verbose_name = 'Advertisements'
+    
+    def ready(self):
+        import advertisements.signals
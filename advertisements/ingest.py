@@ -0,0 +1,233 @@
+import json
+import logging
+import threading
+import uuid
+from collections import Counter, deque
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from core.utils import get_redis_client
+from core.models import User
+from .models import Advertisement, AdClick, AdImpression
+
+logger = logging.getLogger(__name__)
+
+AD_EVENTS_KEY = 'ad_events'
+# Oldest events are dropped beyond this, so a stalled flusher cannot exhaust memory
+MAX_QUEUED_EVENTS = 100000
+FLUSH_BATCH_SIZE = 1000
+MAX_BATCHES_PER_FLUSH = 50
+MAX_EVENTS_PER_REQUEST = 20
+LOCAL_FLUSH_THRESHOLD = 500
+# A batch that fails this many flushes is parked so later events are not stuck behind it
+MAX_FLUSH_ATTEMPTS = 5
+MAX_DEAD_LETTER_EVENTS = 10000
+
+
+class RedisEventQueue:
+    """Capped Redis list shared by every web worker"""
+
+    def __init__(self, client):
+        self.client = client
+        self.key = cache.make_key(AD_EVENTS_KEY)
+
+    def push(self, events):
+        pipe = self.client.pipeline()
+        pipe.rpush(self.key, *[json.dumps(event) for event in events])
+        pipe.ltrim(self.key, -MAX_QUEUED_EVENTS, -1)
+        pipe.execute()
+
+    def drain(self, count):
+        """Move up to `count` events to a processing list and return them"""
+        processing_key = f'{self.key}:processing'
+        # A leftover processing list means the previous flush died; retry it first
+        raw_events = self.client.lrange(processing_key, 0, -1)
+        if not raw_events:
+            pipe = self.client.pipeline(transaction=True)
+            for _ in range(count):
+                pipe.lmove(self.key, processing_key, 'LEFT', 'RIGHT')
+            raw_events = [raw for raw in pipe.execute() if raw is not None]
+        return [json.loads(raw) for raw in raw_events]
+
+    def ack(self):
+        self.client.delete(f'{self.key}:processing', f'{self.key}:attempts')
+
+    def record_failure(self):
+        """Count a failed store of the processing batch; returns the attempts so far"""
+        return self.client.incr(f'{self.key}:attempts')
+
+    def dead_letter(self):
+        """Park the processing batch under a capped dead-letter list for inspection"""
+        processing_key = f'{self.key}:processing'
+        dead_key = f'{self.key}:dead'
+        raw_events = self.client.lrange(processing_key, 0, -1)
+        pipe = self.client.pipeline(transaction=True)
+        if raw_events:
+            pipe.rpush(dead_key, *raw_events)
+            pipe.ltrim(dead_key, -MAX_DEAD_LETTER_EVENTS, -1)
+        pipe.delete(processing_key, f'{self.key}:attempts')
+        pipe.execute()
+
+
+class LocalEventQueue:
+    """In-process ring buffer used when the cache is not Redis"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=MAX_QUEUED_EVENTS)
+        self.processing = []
+        self.attempts = 0
+        self.dead = deque(maxlen=MAX_DEAD_LETTER_EVENTS)
+
+    def push(self, events):
+        with self.lock:
+            self.events.extend(events)
+            due = len(self.events) >= LOCAL_FLUSH_THRESHOLD
+        if due:
+            flush_ad_events()
+
+    def drain(self, count):
+        with self.lock:
+            if not self.processing:
+                self.processing = [self.events.popleft() for _ in range(min(count, len(self.events)))]
+            return list(self.processing)
+
+    def ack(self):
+        with self.lock:
+            self.processing = []
+            self.attempts = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.attempts += 1
+            return self.attempts
+
+    def dead_letter(self):
+        with self.lock:
+            self.dead.extend(self.processing)
+            self.processing = []
+            self.attempts = 0
+
+
+_local_queue = LocalEventQueue()
+
+
+def get_event_queue():
+    client = get_redis_client()
+    if client is not None:
+        return RedisEventQueue(client)
+    return _local_queue
+
+
+def _valid_uuid(ad_id):
+    try:
+        return str(uuid.UUID(str(ad_id)))
+    except (TypeError, ValueError):
+        return None
+
+
+def enqueue_events(kind, ad_ids, request):
+    """Queue impression/click events for the given ads from one request"""
+    user_id = str(request.user.id) if request.user.is_authenticated else None
+    ip_address = request.META.get('REMOTE_ADDR', '')
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+    events = []
+    for ad_id in list(ad_ids)[:MAX_EVENTS_PER_REQUEST]:
+        ad_id = _valid_uuid(ad_id)
+        if ad_id:
+            events.append({
+                'kind': kind,
+                'ad_id': ad_id,
+                'user_id': user_id,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+            })
+    if not events:
+        return 0
+
+    try:
+        get_event_queue().push(events)
+    except Exception as e:
+        logger.warning(f"Failed to queue ad events: {e}")
+        return 0
+    return len(events)
+
+
+def _store_batch(events):
+    ad_ids = {_valid_uuid(event['ad_id']) for event in events} - {None}
+    known_ads = {
+        str(ad_id) for ad_id in
+        Advertisement.objects.filter(id__in=ad_ids).values_list('id', flat=True)
+    }
+    # Users deleted since their events were queued are stored anonymously
+    user_ids = {_valid_uuid(event['user_id']) for event in events if event['user_id']} - {None}
+    known_users = {
+        str(user_id) for user_id in
+        User.objects.filter(id__in=user_ids).values_list('id', flat=True)
+    }
+
+    impressions = []
+    clicks = []
+    impression_counts = Counter()
+    click_counts = Counter()
+    for event in events:
+        if event['ad_id'] not in known_ads:
+            continue
+        user_id = event['user_id'] if event['user_id'] in known_users else None
+        if event['kind'] == 'click':
+            clicks.append(AdClick(
+                advertisement_id=event['ad_id'],
+                user_id=user_id,
+                ip_address=event['ip_address'] or '0.0.0.0',
+                user_agent=event['user_agent'],
+            ))
+            click_counts[event['ad_id']] += 1
+        else:
+            impressions.append(AdImpression(
+                advertisement_id=event['ad_id'],
+                user_id=user_id,
+                ip_address=event['ip_address'] or '0.0.0.0',
+            ))
+            impression_counts[event['ad_id']] += 1
+
+    with transaction.atomic():
+        AdImpression.objects.bulk_create(impressions, batch_size=FLUSH_BATCH_SIZE)
+        AdClick.objects.bulk_create(clicks, batch_size=FLUSH_BATCH_SIZE)
+        for field, counts in (('impressions', impression_counts), ('clicks', click_counts)):
+            if not counts:
+                continue
+            increment = Case(
+                *[When(id=ad_id, then=Value(count)) for ad_id, count in counts.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            Advertisement.objects.filter(id__in=list(counts)).update(
+                **{field: F(field) + increment}
+            )
+    return len(impressions) + len(clicks)
+
+
+def flush_ad_events():
+    """Drain queued events into bulk inserts and F() counter rollups"""
+    queue = get_event_queue()
+    stored = 0
+    for _ in range(MAX_BATCHES_PER_FLUSH):
+        events = queue.drain(FLUSH_BATCH_SIZE)
+        if not events:
+            break
+        try:
+            stored += _store_batch(events)
+        except Exception as e:
+            # Kept for the next flush unless it keeps failing
+            if queue.record_failure() < MAX_FLUSH_ATTEMPTS:
+                raise
+            logger.error(f"Dead-lettering {len(events)} ad events after {MAX_FLUSH_ATTEMPTS} failed flushes: {e}")
+            queue.dead_letter()
+            continue
+        # Only now are the events dropped; a failed store is retried next flush
+        queue.ack()
+        if len(events) < FLUSH_BATCH_SIZE:
+            break
+    return stored
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advertisements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advertisement',
+            name='weight',
+            field=models.PositiveIntegerField(default=1, help_text='Relative share of rotations within a placement'),
+        ),
+        migrations.AddIndex(
+            model_name='advertisement',
+            index=models.Index(fields=['placement', 'status', 'end_date'], name='ad_placement_window_idx'),
+        ),
+    ]
@@ -30,6 +30,7 @@ class Advertisement(models.Model):
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    weight = models.PositiveIntegerField(default=1, help_text='Relative share of rotations within a placement')
     impressions = models.PositiveIntegerField(default=0)
     clicks = models.PositiveIntegerField(default=0)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -38,6 +39,9 @@ class Advertisement(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['placement', 'status', 'end_date'], name='ad_placement_window_idx'),
+        ]
 
     def __str__(self):
         return self.title
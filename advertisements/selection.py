@@ -0,0 +1,78 @@
+import random
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from .models import Advertisement
+
+ACTIVE_ADS_CACHE_KEY = 'active_ads_{}'
+# Upper bound on cache lifetime even when no start/end boundary is near
+MAX_CACHE_TIMEOUT = 60 * 60
+
+
+def _serialize(ad):
+    return {
+        'id': str(ad.id),
+        'title': ad.title,
+        'description': ad.description,
+        'image_url': ad.image.url if ad.image else '',
+        'click_url': reverse('advertisements:track_click', args=[ad.id]),
+        'weight': ad.weight,
+        'start': ad.start_date.timestamp(),
+        'end': ad.end_date.timestamp(),
+    }
+
+
+def _build_placement(placement, now):
+    """Eligible ads for a placement plus the next time that set can change"""
+    ads = Advertisement.objects.filter(
+        status='active',
+        placement=placement,
+        start_date__lte=now + timedelta(seconds=MAX_CACHE_TIMEOUT),
+        end_date__gte=now
+    )
+
+    eligible = []
+    boundary = now.timestamp() + MAX_CACHE_TIMEOUT
+    for ad in ads:
+        if ad.start_date <= now:
+            eligible.append(_serialize(ad))
+            boundary = min(boundary, ad.end_date.timestamp())
+        else:
+            boundary = min(boundary, ad.start_date.timestamp())
+    return eligible, boundary
+
+
+def get_eligible_ads(placement):
+    """Active, in-window ads for a placement, cached until the next boundary"""
+    cache_key = ACTIVE_ADS_CACHE_KEY.format(placement)
+    now = timezone.now()
+    cached = cache.get(cache_key)
+    if cached is None:
+        eligible, boundary = _build_placement(placement, now)
+        timeout = max(1, int(boundary - now.timestamp()) + 1)
+        cache.set(cache_key, eligible, timeout)
+        cached = eligible
+
+    # Re-check the window so second-level cache rounding never shows a stale ad
+    timestamp = now.timestamp()
+    return [ad for ad in cached if ad['start'] <= timestamp <= ad['end']]
+
+
+def select_ads(placement, count):
+    """Weighted random rotation over the eligible ads, without repeats"""
+    ads = get_eligible_ads(placement)
+    if len(ads) <= count:
+        return ads
+    # Efraimidis-Spirakis: the top-k of u ** (1 / weight) is a weighted sample
+    keyed = [(random.random() ** (1.0 / max(ad['weight'], 1)), ad) for ad in ads]
+    keyed.sort(key=lambda item: item[0], reverse=True)
+    return [ad for _, ad in keyed[:count]]
+
+
+def invalidate_ad_cache():
+    cache.delete_many([
+        ACTIVE_ADS_CACHE_KEY.format(placement)
+        for placement, _ in Advertisement.PLACEMENT_CHOICES
+    ])
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Advertisement
+from .selection import invalidate_ad_cache
+
+
+@receiver(post_save, sender=Advertisement)
+@receiver(post_delete, sender=Advertisement)
+def clear_active_ads_cache(sender, instance, **kwargs):
+    """Drop cached placements whenever an ad is edited or removed"""
+    invalidate_ad_cache()
@@ -0,0 +1,18 @@
+from celery import shared_task
+from .ingest import flush_ad_events as flush_queued_ad_events
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_ad_events():
+    """Bulk-insert queued ad impressions and clicks and roll up counters"""
+    try:
+        stored = flush_queued_ad_events()
+        if stored:
+            logger.info(f"Stored {stored} queued ad events")
+        return stored
+    except Exception as e:
+        logger.error(f"Error flushing ad events: {str(e)}")
+        return f"Error: {str(e)}"
@@ -1,6 +1,7 @@
 from django import template
+from django.utils.html import format_html, format_html_join
 from django.utils.safestring import mark_safe
-from advertisements.models import Advertisement
+from advertisements.selection import select_ads
 
 register = template.Library()
 
@@ -8,57 +9,44 @@ register = template.Library()
 @register.simple_tag
 def show_banner_ads():
     """Display banner advertisements"""
-    ads = Advertisement.objects.filter(
-        status='active',
-        placement='banner'
-    )[:3]
+    ads = select_ads('banner', 3)
     
     if not ads:
         return ''
     
-    html = '<div class="row mb-3">'
-    for ad in ads:
-        html += f'''
+    cards = format_html_join('', '''
         <div class="col-md-4 mb-2">
-            <div class="card border-0">
-                <a href="{ad.link}" target="_blank" onclick="trackClick('{ad.id}')">
-                    <img src="{ad.image.url}" class="card-img-top" alt="{ad.title}" 
+            <div class="card border-0" data-ad-id="{}">
+                <a href="{}" target="_blank">
+                    <img src="{}" class="card-img-top" alt="{}" 
                          style="height: 120px; object-fit: cover;">
                 </a>
             </div>
         </div>
-        '''
-    html += '</div>'
+        ''', ((ad['id'], ad['click_url'], ad['image_url'], ad['title']) for ad in ads))
     
-    return mark_safe(html)
+    return format_html('<div class="row mb-3">{}</div>', cards)
 
 
 @register.simple_tag
 def show_sidebar_ads():
     """Display sidebar advertisements"""
-    ads = Advertisement.objects.filter(
-        status='active',
-        placement='sidebar'
-    )[:2]
+    ads = select_ads('sidebar', 2)
     
     if not ads:
         return ''
     
-    html = ''
-    for ad in ads:
-        html += f'''
-        <div class="card mb-3">
-            <a href="{ad.link}" target="_blank" onclick="trackClick('{ad.id}')">
-                <img src="{ad.image.url}" class="card-img-top" alt="{ad.title}"
+    return format_html_join('', '''
+        <div class="card mb-3" data-ad-id="{}">
+            <a href="{}" target="_blank">
+                <img src="{}" class="card-img-top" alt="{}"
                      style="height: 150px; object-fit: cover;">
             </a>
             <div class="card-body p-2">
-                <small class="text-muted">{ad.title}</small>
+                <small class="text-muted">{}</small>
             </div>
         </div>
-        '''
-    
-    return mark_safe(html)
+        ''', ((ad['id'], ad['click_url'], ad['image_url'], ad['title'], ad['title']) for ad in ads))
 
 
 @register.simple_tag
@@ -66,37 +54,53 @@ def ad_tracking_script():
     """Advertisement tracking JavaScript"""
     return mark_safe('''
     <script>
-    function trackClick(adId) {
-        fetch('/ads/track-click/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
-            },
-            body: JSON.stringify({ad_id: adId})
-        }).catch(error => console.log('Ad tracking error:', error));
-    }
-    
-    // Track ad impressions
+    // Track ad impressions, batched into a single beacon per page
     document.addEventListener('DOMContentLoaded', function() {
         const ads = document.querySelectorAll('[data-ad-id]');
-        ads.forEach(ad => {
-            const observer = new IntersectionObserver((entries) => {
-                entries.forEach(entry => {
-                    if (entry.isIntersecting) {
-                        fetch('/ads/track-impression/', {
-                            method: 'POST',
-                            headers: {
-                                'Content-Type': 'application/json',
-                                'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
-                            },
-                            body: JSON.stringify({ad_id: ad.dataset.adId})
-                        }).catch(error => console.log('Ad tracking error:', error));
-                        observer.unobserve(entry.target);
-                    }
-                });
+        if (!ads.length) {
+            return;
+        }
+        
+        let pendingAdIds = [];
+        let flushTimer = null;
+        
+        function flushImpressions() {
+            clearTimeout(flushTimer);
+            flushTimer = null;
+            if (!pendingAdIds.length) {
+                return;
+            }
+            const body = JSON.stringify({ad_ids: pendingAdIds});
+            pendingAdIds = [];
+            if (navigator.sendBeacon) {
+                navigator.sendBeacon('/ads/track-impression/', new Blob([body], {type: 'application/json'}));
+            } else {
+                fetch('/ads/track-impression/', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: body,
+                    keepalive: true
+                }).catch(error => console.log('Ad tracking error:', error));
+            }
+        }
+        
+        const observer = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    pendingAdIds.push(entry.target.dataset.adId);
+                    observer.unobserve(entry.target);
+                }
             });
-            observer.observe(ad);
+            if (pendingAdIds.length && !flushTimer) {
+                flushTimer = setTimeout(flushImpressions, 1000);
+            }
+        });
+        ads.forEach(ad => observer.observe(ad));
+        
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                flushImpressions();
+            }
         });
     });
     </script>
@@ -0,0 +1,59 @@
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import ingest
+
+
+def _event(kind='impression'):
+    return {
+        'kind': kind,
+        'ad_id': str(uuid.uuid4()),
+        'user_id': None,
+        'ip_address': '127.0.0.1',
+        'user_agent': '',
+    }
+
+
+class FlushAdEventsTest(SimpleTestCase):
+    def setUp(self):
+        self.queue = ingest.LocalEventQueue()
+        patcher = mock.patch.object(ingest, 'get_event_queue', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_failed_batch_is_retried_then_dead_lettered(self):
+        poison = [_event(), _event('click')]
+        self.queue.events.extend(poison)
+        
+        with mock.patch.object(ingest, '_store_batch', side_effect=RuntimeError('insert failed')) as store:
+            for _ in range(ingest.MAX_FLUSH_ATTEMPTS - 1):
+                with self.assertRaises(RuntimeError):
+                    ingest.flush_ad_events()
+                # The batch is kept for the next flush
+                self.assertEqual(self.queue.processing, poison)
+            
+            self.assertEqual(ingest.flush_ad_events(), 0)
+        
+        self.assertEqual(store.call_count, ingest.MAX_FLUSH_ATTEMPTS)
+        self.assertEqual(self.queue.processing, [])
+        self.assertEqual(list(self.queue.dead), poison)
+        
+        # Later events are no longer stuck behind the parked batch
+        later = _event()
+        self.queue.events.append(later)
+        with mock.patch.object(ingest, '_store_batch', return_value=1) as store:
+            self.assertEqual(ingest.flush_ad_events(), 1)
+        store.assert_called_once_with([later])
+        self.assertEqual(self.queue.attempts, 0)
+    
+    def test_successful_store_acks_the_batch(self):
+        events = [_event()]
+        self.queue.events.extend(events)
+        
+        with mock.patch.object(ingest, '_store_batch', return_value=1):
+            self.assertEqual(ingest.flush_ad_events(), 1)
+        
+        self.assertEqual(self.queue.processing, [])
+        self.assertEqual(list(self.queue.dead), [])
@@ -1,9 +1,10 @@
 from django.shortcuts import get_object_or_404, redirect
+from django.http import HttpResponse
 from django.utils import timezone
 from django.views.decorators.http import require_POST
-from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
-from .models import Advertisement, AdClick, AdImpression
+from .models import Advertisement
+from .ingest import enqueue_events
 import json
 
 
@@ -21,45 +22,28 @@ def get_active_ads(placement='banner'):
 @csrf_exempt
 @require_POST
 def track_impression(request):
-    """Track ad impression"""
+    """Queue ad impressions; accepts a single ad_id or a batched ad_ids list"""
     try:
-        data = json.loads(request.body)
-        ad_id = data.get('ad_id')
-        
-        ad = get_object_or_404(Advertisement, id=ad_id)
-        
-        # Create impression record
-        AdImpression.objects.create(
-            advertisement=ad,
-            user=request.user if request.user.is_authenticated else None,
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-        )
-        
-        # Update impression count
-        ad.impressions += 1
-        ad.save(update_fields=['impressions'])
-        
-        messages.success(request, 'Ad impression tracked')
-        return redirect('core:home')
-    except Exception as e:
-        messages.error(request, f'Error tracking impression: {str(e)}')
-        return redirect('core:home')
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return HttpResponse(status=400)
+    if not isinstance(data, dict):
+        return HttpResponse(status=400)
+    
+    ad_ids = data.get('ad_ids') or [data.get('ad_id')]
+    if not isinstance(ad_ids, list):
+        return HttpResponse(status=400)
+    
+    # Stored in bulk by advertisements.tasks.flush_ad_events
+    enqueue_events('impression', ad_ids, request)
+    return HttpResponse(status=204)
 
 
 def track_click(request, ad_id):
     """Track ad click and redirect"""
-    ad = get_object_or_404(Advertisement, id=ad_id)
-    
-    # Create click record
-    AdClick.objects.create(
-        advertisement=ad,
-        user=request.user if request.user.is_authenticated else None,
-        ip_address=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-    )
-    
-    # Update click count
-    ad.clicks += 1
-    ad.save(update_fields=['clicks'])
+    click_url = Advertisement.objects.filter(id=ad_id).values_list('click_url', flat=True).first()
+    if click_url is None:
+        get_object_or_404(Advertisement, id=ad_id)
     
-    return redirect(ad.click_url)
+    enqueue_events('click', [ad_id], request)
+    return redirect(click_url)
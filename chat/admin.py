@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatRoom, ChatMessage, ChatMessageRead
+from .models import ChatRoom, ChatMessage, ChatMessageRead, ChatReadState
 
 
 @admin.register(ChatRoom)
@@ -22,3 +22,9 @@ class ChatMessageReadAdmin(admin.ModelAdmin):
     list_display = ('message', 'user', 'read_at')
     list_filter = ('read_at',)
     search_fields = ('message__content', 'user__username')
+
+
+@admin.register(ChatReadState)
+class ChatReadStateAdmin(admin.ModelAdmin):
+    list_display = ('room', 'user', 'last_read_at')
+    search_fields = ('room__name', 'user__username')
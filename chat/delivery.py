@@ -0,0 +1,66 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+from .models import ChatRoom, ChatMessage
+from .moderation import queue_moderation
+from .inbox import record_message as record_inbox_message
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 1000
+
+
+def room_group_name(room_id):
+    return f'chat_{room_id}'
+
+
+def serialize_message(message):
+    """Payload broadcast to room members for a new message"""
+    return {
+        'id': str(message.id),
+        'room_id': str(message.room_id),
+        'sender_id': str(message.sender_id),
+        'sender': message.sender.full_name or message.sender.username,
+        'content': message.content,
+        'message_type': message.message_type,
+        'attachments': message.attachments,
+        'is_flagged': message.is_flagged,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def create_message(room, sender, content, message_type='text', attachments=None):
+    """Persist a chat message and queue it for moderation.
+
+    Shared by the WebSocket consumer and the HTTP upload path so both
+    produce identical side effects.
+    """
+    message = ChatMessage.objects.create(
+        room=room,
+        sender=sender,
+        content=content,
+        message_type=message_type,
+        attachments=attachments or []
+    )
+    ChatRoom.objects.filter(pk=room.pk).update(last_activity=timezone.now())
+    participant_ids = list(room.participants.values_list('id', flat=True))
+    record_inbox_message(message, participant_ids)
+    queue_moderation(message)
+    return message
+
+
+def broadcast_message(message):
+    """Push a message to everyone connected to its room (sync callers)"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            room_group_name(message.room_id),
+            {'type': 'chat_message', 'message': serialize_message(message)}
+        )
+    except Exception as e:
+        # The message is stored; clients pick it up on their next load
+        logger.warning(f"Failed to broadcast chat message {message.id}: {e}")
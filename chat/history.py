@@ -0,0 +1,58 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(Exception):
+    """A `before` cursor that did not come from encode_cursor"""
+
+
+def encode_cursor(message):
+    raw = f'{message.created_at.isoformat()}|{message.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor string, or None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, message_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(message_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def get_message_page(room, before=None, limit=PAGE_SIZE):
+    """A page of a room's messages older than the `before` cursor.
+
+    Seeks on (created_at, id) so every page is one range scan of the
+    room/created_at index however deep into history it is. Returns the
+    messages oldest first and the cursor for the next older page, or None.
+    Raises InvalidCursor for a `before` that did not come from encode_cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    messages = room.messages.select_related('sender')
+
+    if before:
+        position = decode_cursor(before)
+        if position is None:
+            raise InvalidCursor(before)
+        created_at, message_id = position
+        messages = messages.filter(
+            Q(created_at__lt=created_at) |
+            Q(created_at=created_at, id__lt=message_id)
+        )
+
+    page = list(messages.order_by('-created_at', '-id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+
+    next_cursor = encode_cursor(page[0]) if has_more else None
+    return page, next_cursor
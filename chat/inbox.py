@@ -0,0 +1,115 @@
+from django.db.models import Case, F, When
+from django.utils import timezone
+from django.utils.text import Truncator
+from .models import ChatInboxEntry, ChatRoom
+
+PREVIEW_LENGTH = 100
+
+
+def _describe(room, user, participants):
+    """(title, subtitle, counterpart_name) for a room as one user sees it"""
+    if room.product_id:
+        title = room.product.title
+        subtitle = f"with {room.product.vendor.store_name}"
+    elif room.order_id:
+        title = f"Order #{room.order.order_number}"
+        subtitle = room.order.vendor.store_name
+    else:
+        title = room.name or "Chat"
+        subtitle = ''
+    counterpart_name = ', '.join(
+        participant.full_name or participant.username
+        for participant in participants if participant.pk != user.pk
+    )
+    return title, subtitle, counterpart_name
+
+
+def _preview(message):
+    return Truncator(message.content).chars(PREVIEW_LENGTH)
+
+
+def sync_room_entries(room):
+    """(Re)build every participant's inbox entry for a room from source rows"""
+    room = ChatRoom.objects.select_related(
+        'product__vendor', 'order__vendor'
+    ).get(pk=room.pk)
+    participants = list(room.participants.all())
+    last_message = room.messages.order_by('-created_at', '-id').first()
+
+    entries = []
+    for user in participants:
+        title, subtitle, counterpart_name = _describe(room, user, participants)
+        unread = room.messages.exclude(sender=user)
+        last_read_at = room.read_states.filter(user=user).values_list('last_read_at', flat=True).first()
+        if last_read_at is not None:
+            unread = unread.filter(created_at__gt=last_read_at)
+        entries.append(ChatInboxEntry(
+            user=user,
+            room=room,
+            room_type=room.room_type,
+            title=title[:255],
+            subtitle=subtitle[:255],
+            counterpart_name=counterpart_name[:255],
+            last_message_preview=_preview(last_message) if last_message else '',
+            last_activity=last_message.created_at if last_message else room.last_activity,
+            unread_count=unread.count(),
+        ))
+    ChatInboxEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['user', 'room'],
+        update_fields=[
+            'room_type', 'title', 'subtitle', 'counterpart_name',
+            'last_message_preview', 'last_activity', 'unread_count', 'updated_at',
+        ],
+    )
+    return len(entries)
+
+
+def record_message(message, participant_ids):
+    """Project a new message onto every participant's inbox in one UPDATE"""
+    updated = ChatInboxEntry.objects.filter(room_id=message.room_id).update(
+        last_message_preview=_preview(message),
+        last_activity=message.created_at,
+        unread_count=Case(
+            When(user_id=message.sender_id, then=F('unread_count')),
+            default=F('unread_count') + 1,
+        ),
+        updated_at=timezone.now(),
+    )
+    # New rooms and participants get their entries built on first message
+    if updated < len(participant_ids):
+        sync_room_entries(message.room)
+
+
+def resync_product_title(product):
+    """Carry a renamed product's title onto the inbox entries of its rooms"""
+    title = product.title[:255]
+    return ChatInboxEntry.objects.filter(room__product=product).exclude(title=title).update(
+        title=title, updated_at=timezone.now()
+    )
+
+
+def resync_vendor_name(vendor):
+    """Carry a renamed store onto the subtitles of its product and order rooms"""
+    now = timezone.now()
+    product_subtitle = f"with {vendor.store_name}"[:255]
+    order_subtitle = vendor.store_name[:255]
+    return (
+        ChatInboxEntry.objects.filter(room__product__vendor=vendor).exclude(
+            subtitle=product_subtitle).update(subtitle=product_subtitle, updated_at=now)
+        + ChatInboxEntry.objects.filter(room__order__vendor=vendor).exclude(
+            subtitle=order_subtitle).update(subtitle=order_subtitle, updated_at=now)
+    )
+
+
+def mark_entry_read(room_id, user_id):
+    ChatInboxEntry.objects.filter(room_id=room_id, user_id=user_id).update(unread_count=0)
+
+
+def get_inbox(user):
+    """A user's active rooms, most recent first, in one indexed query"""
+    return ChatInboxEntry.objects.filter(
+        user=user,
+        room__is_active=True
+    ).select_related('room').order_by('-last_activity')
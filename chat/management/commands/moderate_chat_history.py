@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from chat.models import ChatMessage
+from chat.moderation import ChatModerator
+
+
+class Command(BaseCommand):
+    help = 'Scan stored chat messages with the moderation engine and flag violations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only scan messages from the last N days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only scan and report throughput')
+
+    def handle(self, *args, **options):
+        # Already flagged messages have their moderation records
+        messages = ChatMessage.objects.filter(is_flagged=False).only('id', 'content')
+        if options['days']:
+            messages = messages.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        messages = messages.iterator(chunk_size=options['batch_size'])
+        
+        started = time.perf_counter()
+        if options['dry_run']:
+            scanned = flagged = 0
+            for message in messages:
+                scanned += 1
+                flagged += bool(ChatModerator.scan(message.content))
+        else:
+            scanned, flagged = ChatModerator.check_messages(messages, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        
+        rate = scanned / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} messages, flagged {flagged} in {elapsed:.2f}s ({rate:.0f} messages/s)'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from chat.inbox import sync_room_entries
+from chat.models import ChatRoom
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the chat inbox projection for every room'
+
+    def handle(self, *args, **options):
+        rooms = 0
+        entries = 0
+        for room in ChatRoom.objects.only('id').iterator(chunk_size=500):
+            entries += sync_room_entries(room)
+            rooms += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {entries} inbox entries across {rooms} rooms'))
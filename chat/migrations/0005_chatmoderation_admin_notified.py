@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+def mark_existing_notified(apps, schema_editor):
+    # Violations before this point were already emailed one by one
+    ChatModeration = apps.get_model('chat', 'ChatModeration')
+    ChatModeration.objects.update(admin_notified=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatmessage_flagged_reason_chatmessage_is_flagged_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmoderation',
+            name='admin_notified',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(mark_existing_notified, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+from django.utils.text import Truncator
+
+
+def backfill_inbox(apps, schema_editor):
+    # Mirrors chat.inbox.sync_room_entries against the historical models
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatReadState = apps.get_model('chat', 'ChatReadState')
+    ChatInboxEntry = apps.get_model('chat', 'ChatInboxEntry')
+    rooms = ChatRoom.objects.select_related(
+        'product__vendor', 'order__vendor'
+    ).prefetch_related('participants').order_by('pk')
+    for room in rooms.iterator(chunk_size=500):
+        participants = list(room.participants.all())
+        if not participants:
+            continue
+        if room.product_id:
+            title = room.product.title
+            subtitle = f"with {room.product.vendor.store_name}"
+        elif room.order_id:
+            title = f"Order #{room.order.order_number}"
+            subtitle = room.order.vendor.store_name
+        else:
+            title = room.name or "Chat"
+            subtitle = ''
+        messages = ChatMessage.objects.filter(room_id=room.pk)
+        last_message = messages.order_by('-created_at', '-id').first()
+        read_at = dict(ChatReadState.objects.filter(room_id=room.pk).values_list('user_id', 'last_read_at'))
+
+        entries = []
+        for user in participants:
+            unread = messages.exclude(sender_id=user.pk)
+            if read_at.get(user.pk) is not None:
+                unread = unread.filter(created_at__gt=read_at[user.pk])
+            counterpart_name = ', '.join(
+                participant.full_name or participant.username
+                for participant in participants if participant.pk != user.pk
+            )
+            entries.append(ChatInboxEntry(
+                user_id=user.pk,
+                room_id=room.pk,
+                room_type=room.room_type,
+                title=title[:255],
+                subtitle=subtitle[:255],
+                counterpart_name=counterpart_name[:255],
+                last_message_preview=Truncator(last_message.content).chars(100) if last_message else '',
+                last_activity=last_message.created_at if last_message else room.last_activity,
+                unread_count=unread.count(),
+            ))
+        ChatInboxEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_chatroom_room_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
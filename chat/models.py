@@ -1,3 +1,5 @@
+import hashlib
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import BaseModel
@@ -15,6 +17,13 @@ class ChatRoom(BaseModel):
     is_active = models.BooleanField(default=True)
     is_flagged = models.BooleanField(default=False)
     last_activity = models.DateTimeField(auto_now=True)
+    # Canonical identity of a product chat: product plus the sorted participant pair
+    room_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    
+    @staticmethod
+    def make_room_key(product_id, *user_ids):
+        pair = ':'.join(sorted(str(user_id) for user_id in user_ids))
+        return f"product:{product_id}:{hashlib.sha1(pair.encode()).hexdigest()}"
     
     def __str__(self):
         if self.order:
@@ -44,6 +53,9 @@ class ChatMessage(BaseModel):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['room', 'created_at', 'id'], name='chat_msg_room_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}"
@@ -61,6 +73,41 @@ class ChatMessageRead(BaseModel):
         return f"{self.user.username} read {self.message.id}"
 
 
+class ChatReadState(BaseModel):
+    """How far a participant has read a room, as a single watermark"""
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_read_states')
+    last_read_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['room', 'user']
+    
+    def __str__(self):
+        return f"{self.user.username} read {self.room} up to {self.last_read_at}"
+
+
+class ChatInboxEntry(BaseModel):
+    """Per-user projection of a room for the chat inbox, kept current on message write"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_inbox')
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='inbox_entries')
+    room_type = models.CharField(max_length=20)
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    counterpart_name = models.CharField(max_length=255, blank=True)
+    last_message_preview = models.CharField(max_length=255, blank=True)
+    last_activity = models.DateTimeField()
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'room']
+        indexes = [
+            models.Index(fields=['user', '-last_activity'], name='chat_inbox_user_activity_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.title}"
+
+
 class ChatModeration(BaseModel):
     VIOLATION_TYPES = [
         ('contact_sharing', 'Contact Information Sharing'),
@@ -75,6 +122,7 @@ class ChatModeration(BaseModel):
     detected_content = models.TextField()
     is_reviewed = models.BooleanField(default=False)
     admin_action = models.CharField(max_length=100, blank=True)
+    admin_notified = models.BooleanField(default=False, db_index=True)
     
     def __str__(self):
         return f"Moderation - {self.violation_type} in {self.message.room}"
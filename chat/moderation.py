@@ -1,7 +1,38 @@
+import logging
 import re
+from functools import lru_cache
+from itertools import islice
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import ChatModeration
+from django.db import transaction
+from django.utils import timezone
+from custom_admin.stats import invalidate_sidebar_stat
+from .models import ChatMessage, ChatModeration
+
+logger = logging.getLogger(__name__)
+
+# Caps one digest email; anything beyond rolls into the next run
+MAX_DIGEST_ITEMS = 200
+
+
+def queue_moderation(message):
+    """Moderate a message in Celery once it is committed"""
+    from .tasks import moderate_message
+    
+    def enqueue():
+        try:
+            moderate_message.delay(str(message.id))
+        except Exception as e:
+            # Broker unavailable; the scan itself is cheap enough to run inline
+            logger.warning(f"Could not queue moderation for {message.id}: {e}")
+            ChatModerator.check_message(message)
+    transaction.on_commit(enqueue)
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
 
 class ChatModerator:
@@ -27,73 +58,152 @@ class ChatModerator:
         r'\bmeet\b.*\bperson\b', r'\bcash\b.*\bdelivery\b',
     ]
     
+    VIOLATION_RULES = (
+        ('contact_sharing', 'Contact information detected', CONTACT_PATTERNS),
+        ('external_payment', 'External payment method detected', EXTERNAL_PAYMENT_PATTERNS),
+        ('escrow_bypass', 'Escrow bypass attempt detected', ESCROW_BYPASS_PATTERNS),
+    )
+    
     @classmethod
-    def check_message(cls, message):
-        """Check message for policy violations"""
-        content = message.content.lower()
-        violations = []
-        
-        # Check for contact sharing
-        for pattern in cls.CONTACT_PATTERNS:
-            if re.search(pattern, content, re.IGNORECASE):
-                violations.append(('contact_sharing', 'Contact information detected'))
-                break
-        
-        # Check for external payment
-        for pattern in cls.EXTERNAL_PAYMENT_PATTERNS:
-            if re.search(pattern, content, re.IGNORECASE):
-                violations.append(('external_payment', 'External payment method detected'))
-                break
+    @lru_cache(maxsize=None)
+    def _matcher(cls, violation_types):
+        """One compiled alternation with a named group per violation type"""
+        groups = [
+            '(?P<{}>{})'.format(name, '|'.join(f'(?:{pattern})' for pattern in patterns))
+            for name, _, patterns in cls.VIOLATION_RULES
+            if name in violation_types
+        ]
+        return re.compile('|'.join(groups), re.IGNORECASE)
+    
+    @classmethod
+    def scan(cls, content):
+        """Violations in a piece of text as (violation_type, reason) pairs.
         
-        # Check for escrow bypass
-        for pattern in cls.ESCROW_BYPASS_PATTERNS:
-            if re.search(pattern, content, re.IGNORECASE):
-                violations.append(('escrow_bypass', 'Escrow bypass attempt detected'))
+        Clean text costs a single pass of the combined pattern. A match can
+        hide an overlapping match of another type, so once something is
+        found only the still-missing types are rescanned.
+        """
+        content = content.lower()
+        remaining = frozenset(name for name, _, _ in cls.VIOLATION_RULES)
+        found = set()
+        while remaining:
+            hits = {match.lastgroup for match in cls._matcher(remaining).finditer(content)}
+            if not hits:
                 break
+            found |= hits
+            remaining -= hits
+        return [(name, reason) for name, reason, _ in cls.VIOLATION_RULES if name in found]
+    
+    @classmethod
+    def check_message(cls, message):
+        """Check message for policy violations"""
+        violations = cls.scan(message.content)
         
         # Create moderation records and flag message
         if violations:
             message.is_flagged = True
             message.flagged_reason = violations[0][1]
-            message.save()
+            message.save(update_fields=['is_flagged', 'flagged_reason', 'updated_at'])
             
-            for violation_type, detected_content in violations:
-                ChatModeration.objects.create(
+            ChatModeration.objects.bulk_create([
+                ChatModeration(
                     message=message,
                     violation_type=violation_type,
                     detected_content=detected_content
                 )
-            
-            # Notify admin
-            cls.notify_admin(message, violations)
+                for violation_type, detected_content in violations
+            ])
         
         return violations
     
     @classmethod
-    def notify_admin(cls, message, violations):
-        """Send notification to admin about policy violation"""
-        try:
-            violation_types = [v[0] for v in violations]
+    def check_messages(cls, messages, batch_size=1000):
+        """Moderate many stored messages at once, e.g. to backfill history.
+        
+        Flags and moderation records are written in bulk per batch and are
+        kept out of the admin digest. Returns (scanned, flagged) counts.
+        """
+        scanned = flagged = 0
+        for batch in _batched(messages, batch_size):
+            to_flag = []
+            moderations = []
+            now = timezone.now()
+            for message in batch:
+                violations = cls.scan(message.content)
+                if not violations:
+                    continue
+                message.is_flagged = True
+                message.flagged_reason = violations[0][1]
+                message.updated_at = now
+                to_flag.append(message)
+                moderations.extend(
+                    ChatModeration(
+                        message=message,
+                        violation_type=violation_type,
+                        detected_content=detected_content,
+                        admin_notified=True
+                    )
+                    for violation_type, detected_content in violations
+                )
             
-            subject = f"Chat Policy Violation Detected - {', '.join(violation_types)}"
-            message_content = f"""
-Policy violation detected in chat:
-
-Room: {message.room}
+            with transaction.atomic():
+                ChatMessage.objects.bulk_update(to_flag, ['is_flagged', 'flagged_reason', 'updated_at'])
+                ChatModeration.objects.bulk_create(moderations)
+            scanned += len(batch)
+            flagged += len(to_flag)
+        if flagged:
+            # bulk_update() skips the post_save receiver that keeps this fresh
+            invalidate_sidebar_stat('flagged_messages')
+        return scanned, flagged
+    
+    @classmethod
+    def send_admin_digest(cls):
+        """Email admins one summary of all violations not yet reported.
+        
+        Records are only marked notified once the mail has gone out, so a
+        failed send is retried by the next digest run.
+        """
+        pending = list(
+            ChatModeration.objects.filter(admin_notified=False)
+            .select_related('message__sender', 'message__room__order', 'message__room__product')
+            .order_by('created_at')[:MAX_DIGEST_ITEMS]
+        )
+        if not pending:
+            return 0
+        
+        by_message = {}
+        for moderation in pending:
+            by_message.setdefault(moderation.message_id, []).append(moderation)
+        
+        sections = []
+        for moderations in by_message.values():
+            message = moderations[0].message
+            sections.append(f"""Room: {message.room}
 Sender: {message.sender.full_name} ({message.sender.email})
 Message: {message.content}
-Violations: {', '.join([v[1] for v in violations])}
-Time: {message.created_at}
-
-Please review and take appropriate action.
-"""
-            
+Violations: {', '.join(moderation.detected_content for moderation in moderations)}
+Time: {message.created_at}""")
+        
+        subject = f"Chat Policy Violations - {len(by_message)} flagged message(s)"
+        body = (
+            "Policy violations detected in chat since the last digest:\n\n" +
+            "\n\n".join(sections) +
+            "\n\nPlease review and take appropriate action.\n"
+        )
+        
+        try:
             send_mail(
                 subject,
-                message_content,
+                body,
                 settings.DEFAULT_FROM_EMAIL,
                 [settings.ADMIN_EMAIL],
-                fail_silently=True
+                fail_silently=False
             )
         except Exception as e:
-            print(f"Failed to send admin notification: {e}")
+            logger.error(f"Failed to send moderation digest: {e}")
+            return 0
+        
+        ChatModeration.objects.filter(
+            id__in=[moderation.id for moderation in pending]
+        ).update(admin_notified=True)
+        return len(by_message)
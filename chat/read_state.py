@@ -0,0 +1,18 @@
+from django.utils import timezone
+from .models import ChatReadState
+from .inbox import mark_entry_read
+
+
+def mark_room_read(room, user, read_at=None):
+    """Move the user's read watermark for a room forward with one upsert.
+
+    Unread counts themselves live on ``ChatInboxEntry.unread_count``.
+    """
+    read_at = read_at or timezone.now()
+    ChatReadState.objects.bulk_create(
+        [ChatReadState(room=room, user=user, last_read_at=read_at)],
+        update_conflicts=True,
+        unique_fields=['room', 'user'],
+        update_fields=['last_read_at', 'updated_at'],
+    )
+    mark_entry_read(room.pk, user.pk)
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from products.models import Product
+from vendors.models import Vendor
+from .inbox import resync_product_title, resync_vendor_name
+
+
+@receiver(post_save, sender=Product)
+def resync_inbox_product_title(sender, instance, created, update_fields=None, **kwargs):
+    """Inbox entries copy the product title; keep them in step with renames"""
+    if created or (update_fields is not None and 'title' not in update_fields):
+        return
+    resync_product_title(instance)
+
+
+@receiver(post_save, sender=Vendor)
+def resync_inbox_vendor_name(sender, instance, created, update_fields=None, **kwargs):
+    """Inbox entries copy the store name; keep them in step with renames"""
+    if created or (update_fields is not None and 'store_name' not in update_fields):
+        return
+    resync_vendor_name(instance)
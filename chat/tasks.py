@@ -0,0 +1,73 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def moderate_message(message_id):
+    """Run policy checks on a freshly sent chat message"""
+    from .models import ChatMessage
+    from .moderation import ChatModerator
+    
+    try:
+        message = ChatMessage.objects.get(id=message_id)
+        violations = ChatModerator.check_message(message)
+        if violations:
+            logger.info(f"Message {message_id} flagged: {[v[0] for v in violations]}")
+        return len(violations)
+    except ChatMessage.DoesNotExist:
+        logger.warning(f"Message {message_id} not found for moderation")
+        return 0
+
+
+@shared_task
+def send_moderation_digest():
+    """Email admins one summary of recent policy violations"""
+    from .moderation import ChatModerator
+    
+    try:
+        count = ChatModerator.send_admin_digest()
+        if count:
+            logger.info(f"Moderation digest sent for {count} messages")
+        return count
+    except Exception as e:
+        logger.error(f"Error sending moderation digest: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def process_chat_image(message_id):
+    """Strip metadata from a message's image attachments and generate resized variants"""
+    from django.core.files.storage import default_storage
+    from core.images import generate_variants, strip_metadata
+    from .models import ChatMessage
+    
+    try:
+        message = ChatMessage.objects.get(id=message_id)
+        processed = 0
+        replaced = []
+        for attachment in message.attachments:
+            if attachment.get('type') != 'image' or 'variants' in attachment:
+                continue
+            # The original stays linked, so its EXIF (GPS etc.) is removed too
+            path = strip_metadata(attachment['path'])
+            if path != attachment['path']:
+                replaced.append(attachment['path'])
+                attachment['path'] = path
+                attachment['url'] = f'/media/{path}'
+            attachment['variants'] = generate_variants(path)
+            attachment['thumbnail_url'] = attachment['variants']['thumb']['jpeg']
+            processed += 1
+        if processed:
+            message.save(update_fields=['attachments', 'updated_at'])
+        # Only drop the originals once the message points at the stripped copies
+        for path in replaced:
+            default_storage.delete(path)
+        return processed
+    except ChatMessage.DoesNotExist:
+        logger.warning(f"Message {message_id} not found for image processing")
+        return 0
+    except Exception as e:
+        logger.error(f"Error processing images for message {message_id}: {str(e)}")
+        return f"Error: {str(e)}"
@@ -1,3 +1,200 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Category
+from products.models import Product
+from vendors.models import Vendor
+from .history import InvalidCursor, decode_cursor, encode_cursor, get_message_page
+from .inbox import record_message, sync_room_entries
+from .models import ChatInboxEntry, ChatMessage, ChatReadState, ChatRoom
+from .moderation import ChatModerator
+from .read_state import mark_room_read
+
+User = get_user_model()
+
+
+def _user(name):
+    return User.objects.create_user(username=name, email=f'{name}@example.com', password='testpass123')
+
+
+class ChatModeratorScanTest(SimpleTestCase):
+    def test_clean_message(self):
+        self.assertEqual(ChatModerator.scan('Is the copper wire still available?'), [])
+    
+    def test_finds_every_violation_type(self):
+        violations = ChatModerator.scan('Call 9876543210, pay by PayTM and skip the commission')
+        self.assertEqual(
+            [violation_type for violation_type, _ in violations],
+            ['contact_sharing', 'external_payment']
+        )
+    
+    def test_overlapping_matches_are_not_lost(self):
+        # 'cash' alone is an external payment; 'cash ... delivery' is also escrow bypass
+        violations = ChatModerator.scan('Cash on delivery please')
+        self.assertEqual(
+            [violation_type for violation_type, _ in violations],
+            ['external_payment', 'escrow_bypass']
+        )
+
+
+class MarkRoomReadTest(TestCase):
+    def setUp(self):
+        self.buyer = _user('buyer')
+        self.seller = _user('seller')
+        self.room = ChatRoom.objects.create(name='Scrap pickup', room_type='support')
+        self.room.participants.add(self.buyer, self.seller)
+    
+    def test_first_read_creates_the_watermark(self):
+        read_at = timezone.now()
+        mark_room_read(self.room, self.buyer, read_at)
+        
+        state = ChatReadState.objects.get(room=self.room, user=self.buyer)
+        self.assertEqual(state.last_read_at, read_at)
+    
+    def test_later_read_moves_the_same_row(self):
+        first = timezone.now() - timedelta(hours=1)
+        mark_room_read(self.room, self.buyer, first)
+        mark_room_read(self.room, self.buyer, first + timedelta(minutes=30))
+        
+        states = ChatReadState.objects.filter(room=self.room, user=self.buyer)
+        self.assertEqual(states.count(), 1)
+        self.assertEqual(states.get().last_read_at, first + timedelta(minutes=30))
+    
+    def test_clears_the_inbox_unread_count(self):
+        ChatInboxEntry.objects.create(
+            user=self.buyer, room=self.room, room_type='support', title='Scrap pickup',
+            last_activity=timezone.now(), unread_count=3,
+        )
+        mark_room_read(self.room, self.buyer)
+        
+        self.assertEqual(ChatInboxEntry.objects.get(user=self.buyer, room=self.room).unread_count, 0)
+        self.assertFalse(ChatReadState.objects.filter(room=self.room, user=self.seller).exists())
+
+
+class ChatInboxProjectionTest(TestCase):
+    def setUp(self):
+        self.buyer = _user('buyer')
+        seller = _user('seller')
+        self.vendor = Vendor.objects.create(
+            user=seller,
+            store_name='Scrapyard',
+            business_email='seller@example.com',
+            business_phone='9999999999',
+            store_address={},
+        )
+        self.product = Product.objects.create(
+            vendor=self.vendor,
+            category=Category.objects.create(name='Metal Scrap'),
+            title='Copper wire',
+            description='Sorted scrap',
+            price='120.00',
+            sku='SKU-1',
+        )
+        self.room = ChatRoom.objects.create(product=self.product, room_type='product')
+        self.room.participants.add(self.buyer, seller)
+        self.seller = seller
+    
+    def _send(self, sender, content):
+        return ChatMessage.objects.create(room=self.room, sender=sender, content=content)
+    
+    def _entry(self, user):
+        return ChatInboxEntry.objects.get(room=self.room, user=user)
+    
+    def test_sync_builds_an_entry_per_participant(self):
+        self._send(self.seller, 'first')
+        mark_room_read(self.room, self.buyer)
+        self._send(self.seller, 'second')
+        
+        self.assertEqual(sync_room_entries(self.room), 2)
+        
+        entry = self._entry(self.buyer)
+        self.assertEqual(entry.title, 'Copper wire')
+        self.assertEqual(entry.subtitle, 'with Scrapyard')
+        self.assertEqual(entry.counterpart_name, 'seller')
+        self.assertEqual(entry.last_message_preview, 'second')
+        self.assertEqual(entry.unread_count, 1)
+        self.assertEqual(self._entry(self.seller).unread_count, 0)
+    
+    def test_sync_is_idempotent(self):
+        self._send(self.seller, 'hello')
+        sync_room_entries(self.room)
+        sync_room_entries(self.room)
+        
+        self.assertEqual(ChatInboxEntry.objects.filter(room=self.room).count(), 2)
+        self.assertEqual(self._entry(self.buyer).unread_count, 1)
+    
+    def test_record_message_builds_missing_entries(self):
+        message = self._send(self.buyer, 'is this available?')
+        record_message(message, [self.buyer.pk, self.seller.pk])
+        
+        self.assertEqual(self._entry(self.seller).unread_count, 1)
+        self.assertEqual(self._entry(self.buyer).unread_count, 0)
+    
+    def test_record_message_bumps_everyone_but_the_sender(self):
+        sync_room_entries(self.room)
+        for content in ('one', 'two'):
+            record_message(self._send(self.seller, content), [self.buyer.pk, self.seller.pk])
+        
+        buyer_entry = self._entry(self.buyer)
+        self.assertEqual(buyer_entry.unread_count, 2)
+        self.assertEqual(buyer_entry.last_message_preview, 'two')
+        self.assertEqual(self._entry(self.seller).unread_count, 0)
+    
+    def test_renames_are_carried_onto_entries(self):
+        sync_room_entries(self.room)
+        self.product.title = 'Copper wire, stripped'
+        self.product.save()
+        self.vendor.store_name = 'Metalworks'
+        self.vendor.save()
+        
+        entry = self._entry(self.buyer)
+        self.assertEqual(entry.title, 'Copper wire, stripped')
+        self.assertEqual(entry.subtitle, 'with Metalworks')
+
+
+class HistoryCursorTest(SimpleTestCase):
+    def test_round_trip(self):
+        message = SimpleNamespace(created_at=timezone.now(), id=uuid.uuid4())
+        
+        self.assertEqual(decode_cursor(encode_cursor(message)), (message.created_at, message.id))
+    
+    def test_malformed_cursor_decodes_to_none(self):
+        for cursor in ('not-base64!', 'bm8tc2VwYXJhdG9y', encode_cursor(SimpleNamespace(created_at=timezone.now(), id='x'))):
+            self.assertIsNone(decode_cursor(cursor))
+
+
+class MessagePageTest(TestCase):
+    def setUp(self):
+        self.user = _user('buyer')
+        self.room = ChatRoom.objects.create(name='Scrap pickup', room_type='support')
+        self.room.participants.add(self.user)
+    
+    def test_messages_sharing_a_timestamp_are_split_by_id(self):
+        for index in range(5):
+            ChatMessage.objects.create(room=self.room, sender=self.user, content=str(index))
+        ChatMessage.objects.filter(room=self.room).update(created_at=timezone.now())
+        expected = sorted(ChatMessage.objects.filter(room=self.room).values_list('id', flat=True))
+        
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = get_message_page(self.room, cursor, limit=2)
+            seen = [message.id for message in page] + seen
+            if cursor is None:
+                break
+        
+        self.assertEqual(seen, expected)
+    
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(InvalidCursor):
+            get_message_page(self.room, 'garbage')
+        
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('chat:history', args=[self.room.id]), {'before': 'garbage'})
+        self.assertEqual(response.status_code, 400)
@@ -9,6 +9,7 @@ urlpatterns = [
     path('dashboard/', views.chat_dashboard, name='dashboard'),
     path('room/<uuid:room_id>/', views.chat_room, name='room'),
     path('room/<uuid:room_id>/send/', views.send_message, name='send_message'),
+    path('room/<uuid:room_id>/history/', views.chat_history, name='history'),
     
     # API endpoints
     path('api/products/<uuid:product_id>/chat/', views.create_product_chat, name='create_product_chat'),
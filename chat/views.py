@@ -4,10 +4,16 @@ from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib import messages
 from django.core.files.storage import default_storage
 from django.http import JsonResponse
+from django.db import transaction
+from django.core.paginator import Paginator
 from django.core.mail import send_mail
 from django.conf import settings
 from .models import ChatRoom, ChatMessage, ChatModeration
-from .utils import compress_image
+from .tasks import process_chat_image
+from .delivery import broadcast_message, create_message, serialize_message
+from .history import PAGE_SIZE, InvalidCursor, get_message_page
+from .read_state import mark_room_read
+from .inbox import get_inbox
 from products.models import Product
 import uuid
 import os
@@ -24,29 +30,23 @@ def create_product_chat(request, product_id):
         if hasattr(product.vendor, 'user') and product.vendor.user == request.user:
             return JsonResponse({'error': 'You cannot chat about your own product'}, status=400)
         
-        # Check if chat room already exists between user and vendor for this product
-        existing_room = ChatRoom.objects.filter(
-            product=product,
-            participants__in=[request.user]
-        ).filter(participants__in=[product.vendor.user]).first()
-        
-        if existing_room:
-            return JsonResponse({'room_id': str(existing_room.id)})
-        
-        # Create new chat room
-        room = ChatRoom.objects.create(
-            product=product,
-            room_type='product',
-            name=f"Chat about {product.title}"
-        )
-        room.participants.add(request.user, product.vendor.user)
+        # One room per product and buyer/seller pair, found through its unique key
+        vendor_user = product.vendor.user
+        with transaction.atomic():
+            room, created = ChatRoom.objects.get_or_create(
+                room_key=ChatRoom.make_room_key(product.id, request.user.id, vendor_user.id),
+                defaults={
+                    'product': product,
+                    'room_type': 'product',
+                    'name': f"Chat about {product.title}",
+                }
+            )
+            if created:
+                room.participants.add(request.user, vendor_user)
         
-        # Send initial message
-        ChatMessage.objects.create(
-            room=room,
-            sender=request.user,
-            message=f"Hi! I'm interested in your product: {product.title}"
-        )
+        if created:
+            # Send initial message
+            create_message(room, request.user, f"Hi! I'm interested in your product: {product.title}")
         
         return JsonResponse({'room_id': str(room.id)})
         
@@ -55,11 +55,6 @@ def create_product_chat(request, product_id):
     except Exception as e:
         print(f"Chat creation error: {e}")  # Debug print
         return JsonResponse({'error': 'Failed to create chat room'}, status=500)
-        
-        return JsonResponse({'room_id': str(room.id)})
-        
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
 
 
 @login_required
@@ -68,10 +63,7 @@ def mark_messages_read(request, room_id):
     """Mark messages as read"""
     try:
         room = get_object_or_404(ChatRoom, id=room_id, participants=request.user)
-        ChatMessage.objects.filter(
-            room=room,
-            is_read=False
-        ).exclude(sender=request.user).update(is_read=True)
+        mark_room_read(room, request.user)
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
@@ -123,10 +115,8 @@ KABAADWALA™ Team
 @login_required
 def chat_dashboard(request):
     """Chat dashboard showing all user's chat rooms"""
-    user_rooms = ChatRoom.objects.filter(participants=request.user, is_active=True).order_by('-last_activity')
-    
     context = {
-        'rooms': user_rooms,
+        'rooms': get_inbox(request.user),
         'is_admin': request.user.is_admin_user,
     }
     return render(request, 'chat/dashboard.html', context)
@@ -135,10 +125,10 @@ def chat_dashboard(request):
 @login_required
 def chat_list(request):
     """List all chat rooms for user"""
-    user_rooms = ChatRoom.objects.filter(participants=request.user, is_active=True).order_by('-last_activity')
+    paginator = Paginator(get_inbox(request.user), 24)
     
     context = {
-        'rooms': user_rooms,
+        'rooms': paginator.get_page(request.GET.get('page')),
     }
     return render(request, 'chat/list.html', context)
 
@@ -149,26 +139,55 @@ def chat_room(request, room_id):
     room = get_object_or_404(ChatRoom, id=room_id)
     
     # Check permissions
-    if not request.user.is_admin_user and request.user not in room.participants.all():
+    is_participant = room.participants.filter(pk=request.user.pk).exists()
+    if not request.user.is_admin_user and not is_participant:
         return render(request, 'chat/access_denied.html')
     
-    # Get messages
-    messages_list = room.messages.all()
+    # Only the latest page; older messages are fetched by chat_history on scroll
+    messages_list, next_cursor = get_message_page(room)
+    
+    # Opening the room reads everything in it
+    if is_participant:
+        mark_room_read(room, request.user)
     
-    # Mark messages as read
-    unread_messages = messages_list.exclude(sender=request.user).filter(is_read=False)
-    for message in unread_messages:
-        message.is_read = True
-        message.save()
+    # Own messages show as read up to the furthest the other side has read
+    counterpart_read_at = max(
+        room.read_states.exclude(user=request.user).values_list('last_read_at', flat=True),
+        default=None
+    )
     
     context = {
         'room': room,
         'messages': messages_list,
+        'next_cursor': next_cursor,
+        'counterpart_read_at': counterpart_read_at,
         'is_admin': request.user.is_admin_user,
     }
     return render(request, 'chat/room.html', context)
 
 
+@login_required
+def chat_history(request, room_id):
+    """Older messages of a room, one keyset page at a time"""
+    room = get_object_or_404(ChatRoom, id=room_id)
+    if not request.user.is_admin_user and not room.participants.filter(pk=request.user.pk).exists():
+        return JsonResponse({'error': 'Not authorized'}, status=403)
+    
+    try:
+        limit = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        limit = PAGE_SIZE
+    try:
+        messages_list, next_cursor = get_message_page(room, request.GET.get('before'), limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    return JsonResponse({
+        'messages': [serialize_message(message) for message in messages_list],
+        'next_cursor': next_cursor,
+    })
+
+
 @login_required
 @require_http_methods(["POST"])
 def send_message(request, room_id):
@@ -208,6 +227,7 @@ def send_message(request, room_id):
             file_path = default_storage.save(filename, uploaded_file)
             attachments.append({
                 'type': 'image',
+                'path': file_path,
                 'url': f'/media/{file_path}',
                 'name': uploaded_file.name,
                 'size': uploaded_file.size
@@ -220,33 +240,22 @@ def send_message(request, room_id):
             messages.error(request, 'Message content or image required')
             return redirect('chat:room', room_id=room_id)
         
-        # Create message
-        message = ChatMessage.objects.create(
-            room=room,
-            sender=request.user,
-            content=content,
-            message_type=message_type,
-            attachments=attachments
-        )
-        
-        # Check for violations
-        from .moderation import ChatModerator
-        ChatModerator.check_message(message)
-        
-        # Update room activity
-        room.save()  # This updates last_activity
+        # Persist, queue moderation and push to connected room members
+        message = create_message(room, request.user, content, message_type, attachments)
+        broadcast_message(message)
+        if message_type == 'image':
+            # Resizing runs in Celery; the original is served until variants exist
+            transaction.on_commit(lambda: process_chat_image.delay(str(message.id)))
         
-        # For AJAX requests, redirect back to room
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            messages.success(request, 'Message sent successfully!')
+            return JsonResponse(serialize_message(message))
         
         return redirect('chat:room', room_id=room_id)
         
     except Exception as e:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            messages.error(request, f'Failed to send message: {str(e)}')
-        else:
-            messages.error(request, f'Failed to send message: {str(e)}')
+            return JsonResponse({'error': f'Failed to send message: {str(e)}'}, status=400)
+        messages.error(request, f'Failed to send message: {str(e)}')
         return redirect('chat:room', room_id=room_id)
 
 
@@ -2,14 +2,31 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from chat.delivery import MAX_MESSAGE_LENGTH, create_message, room_group_name, serialize_message
+from chat.models import ChatRoom
 
 User = get_user_model()
 
+# Close codes the chat page treats as final and does not reconnect after
+CLOSE_UNAUTHENTICATED = 4001
+CLOSE_FORBIDDEN = 4003
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """Sends, persists and fans out chat messages for one room"""
+    
     async def connect(self):
         self.room_name = self.scope['url_route']['kwargs']['room_name']
-        self.room_group_name = f'chat_{self.room_name}'
+        self.room_group_name = room_group_name(self.room_name)
+        self.user = self.scope['user']
+        
+        self.room, self.can_send = await self.get_room_access()
+        if self.room is None:
+            # Accept first; a rejected handshake reaches the browser as a bare 1006
+            await self.accept()
+            await self.close(code=CLOSE_FORBIDDEN if self.user.is_authenticated else CLOSE_UNAUTHENTICATED)
+            return
         
         # Join room group
         await self.channel_layer.group_add(
@@ -26,29 +43,78 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
     
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
-        user = self.scope['user']
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data)
+        except (TypeError, ValueError):
+            data = None
+        if not isinstance(data, dict):
+            await self.send_error('Invalid message format')
+            return
         
-        # Send message to room group
+        content = str(data.get('message', '')).strip()
+        client_id = data.get('client_id')
+        if not self.can_send:
+            await self.send_error('Not authorized to send messages in this room.', client_id)
+            return
+        if not content:
+            await self.send_error('Message content required', client_id)
+            return
+        if len(content) > MAX_MESSAGE_LENGTH:
+            await self.send_error(f'Message too long (max {MAX_MESSAGE_LENGTH} characters)', client_id)
+            return
+        
+        payload = await self.save_message(content)
+        
+        # Send message to room group; client_id lets the sending tab skip its own echo
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
-                'message': message,
-                'user_id': str(user.id) if user.is_authenticated else None,
-                'username': user.username if user.is_authenticated else 'Anonymous'
+                'message': {**payload, 'client_id': client_id}
             }
         )
+        
+        await self.send(text_data=json.dumps({
+            'type': 'ack',
+            'client_id': client_id,
+            'message_id': payload['id'],
+            'created_at': payload['created_at']
+        }))
     
     async def chat_message(self, event):
         # Send message to WebSocket
         await self.send(text_data=json.dumps({
-            'message': event['message'],
-            'user_id': event['user_id'],
-            'username': event['username']
+            'type': 'message',
+            'message': event['message']
+        }))
+    
+    async def send_error(self, error, client_id=None):
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'client_id': client_id,
+            'error': error
         }))
+    
+    @database_sync_to_async
+    def get_room_access(self):
+        """(room, can_send) for the connecting user, or (None, False)"""
+        if not self.user.is_authenticated:
+            return None, False
+        try:
+            room = ChatRoom.objects.get(id=self.room_name, is_active=True)
+        except (ChatRoom.DoesNotExist, ValidationError, ValueError):
+            return None, False
+        
+        is_participant = room.participants.filter(pk=self.user.pk).exists()
+        if not is_participant and not self.user.is_admin_user:
+            return None, False
+        return room, is_participant
+    
+    @database_sync_to_async
+    def save_message(self, content):
+        message = create_message(self.room, self.user, content)
+        return serialize_message(message)
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
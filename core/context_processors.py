@@ -2,26 +2,65 @@ from products.models import Cart
 from wallet.models import Wallet
 
 
+class LazyUserObject:
+    """Defers loading a per-user row until a template touches it.
+
+    Attributes listed in `cached_attributes` are answered from the cache
+    without loading the row at all, so navbar badges never hit the DB.
+    """
+    model = None
+    cached_attributes = {}
+    
+    def __init__(self, user):
+        self._user = user
+        self._instance = None
+        self._cached_values = {}
+    
+    def _get_instance(self):
+        if self._instance is None:
+            self._instance, created = self.model.objects.get_or_create(user=self._user)
+        return self._instance
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        loader = self.cached_attributes.get(name)
+        if loader is not None:
+            if name not in self._cached_values:
+                self._cached_values[name] = loader(self._user.id)
+            return self._cached_values[name]
+        return getattr(self._get_instance(), name)
+    
+    def __str__(self):
+        return str(self._get_instance())
+
+
+class LazyCart(LazyUserObject):
+    model = Cart
+    cached_attributes = {'summary': Cart.get_cached_summary}
+    
+    @property
+    def total_items(self):
+        return self.summary['total_items']
+    
+    @property
+    def total_amount(self):
+        return self.summary['total_amount']
+
+
+class LazyWallet(LazyUserObject):
+    model = Wallet
+    cached_attributes = {'current_balance': Wallet.get_cached_balance}
+
+
 def user_context(request):
     """Add user-related context data"""
     context = {}
     
     if request.user.is_authenticated:
-        # Get or create cart
-        try:
-            cart = Cart.objects.get(user=request.user)
-        except Cart.DoesNotExist:
-            cart = Cart.objects.create(user=request.user)
-        
-        # Get or create wallet
-        try:
-            wallet = Wallet.objects.get(user=request.user)
-        except Wallet.DoesNotExist:
-            wallet = Wallet.objects.create(user=request.user)
-        
         context.update({
-            'user_cart': cart,
-            'user_wallet': wallet,
+            'user_cart': LazyCart(request.user),
+            'user_wallet': LazyWallet(request.user),
         })
     
     return context
@@ -0,0 +1,158 @@
+import math
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_MAX_PRECISION = 9
+MAX_COVERING_CELLS = 32
+DEFAULT_SEARCH_RADIUS_KM = 250
+
+
+def to_float(value):
+    """Coerce Decimal/str coordinates, returning None when missing"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+    a = (math.sin(d_phi / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle around a point"""
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6 or d_lat >= 90:
+        d_lng = 180.0
+    else:
+        d_lng = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return (
+        max(-90.0, lat - d_lat),
+        min(90.0, lat + d_lat),
+        max(-180.0, lng - d_lng),
+        min(180.0, lng + d_lng),
+    )
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_MAX_PRECISION):
+    """Encode a coordinate as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    result = []
+    bit, char, even = 0, 0, True
+    while len(result) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                char = (char << 1) | 1
+                lng_range[0] = mid
+            else:
+                char = char << 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                char = (char << 1) | 1
+                lat_range[0] = mid
+            else:
+                char = char << 1
+                lat_range[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            result.append(GEOHASH_ALPHABET[char])
+            bit, char = 0, 0
+    return ''.join(result)
+
+
+def geohash_cell_size(precision):
+    """(lat_degrees, lng_degrees) spanned by a geohash cell of given precision"""
+    bits = precision * 5
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def covering_geohashes(lat, lng, radius_km):
+    """Geohash prefixes whose cells together cover the radius' bounding box.
+
+    Picks the finest precision that needs at most MAX_COVERING_CELLS cells;
+    an empty list means the box is too large to be worth prefiltering.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+
+    for precision in range(GEOHASH_MAX_PRECISION, 0, -1):
+        lat_step, lng_step = geohash_cell_size(precision)
+        rows = int((max_lat - min_lat) / lat_step) + 2
+        cols = int((max_lng - min_lng) / lng_step) + 2
+        if rows * cols > MAX_COVERING_CELLS * 4:
+            continue
+
+        # Sampling one point per cell width (plus the far edges) hits every cell
+        lats = [min(max_lat, min_lat + row * lat_step) for row in range(rows)]
+        lngs = [min(max_lng, min_lng + col * lng_step) for col in range(cols)]
+        cells = {
+            geohash_encode(cell_lat, cell_lng, precision)
+            for cell_lat in lats for cell_lng in lngs
+        }
+        if len(cells) <= MAX_COVERING_CELLS:
+            return sorted(cells)
+    return []
+
+
+def get_search_radius_km():
+    """Admin-configurable discovery radius (SystemSettings.SEARCH_RADIUS_KM)"""
+    from core.models import SystemSettings
+    return SystemSettings.get_value('SEARCH_RADIUS_KM', DEFAULT_SEARCH_RADIUS_KM, cast=float)
+
+
+def get_user_location(user):
+    """(latitude, longitude) of the user's default address, if it has one"""
+    if not user.is_authenticated:
+        return None
+    coordinates = user.addresses.filter(
+        is_default=True,
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).values_list('latitude', 'longitude').first()
+    if not coordinates:
+        return None
+    return to_float(coordinates[0]), to_float(coordinates[1])
+
+
+def vendors_within_radius(lat, lng, radius_km):
+    """Map of vendor id to distance (km) for active vendors inside the radius.
+
+    Geohash prefixes and the bounding box narrow the candidates through
+    indexes; the exact haversine check runs only on that small set.
+    """
+    from vendors.models import Vendor
+    
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    vendors = Vendor.objects.filter(
+        is_active=True,
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng)
+    )
+    
+    prefixes = covering_geohashes(lat, lng, radius_km)
+    if prefixes:
+        cell_filter = Q()
+        for prefix in prefixes:
+            cell_filter |= Q(geohash__startswith=prefix)
+        vendors = vendors.filter(cell_filter)
+    
+    nearby = {}
+    for vendor_id, vendor_lat, vendor_lng in vendors.values_list('id', 'latitude', 'longitude'):
+        distance = haversine_km(lat, lng, float(vendor_lat), float(vendor_lng))
+        if distance <= radius_km:
+            nearby[vendor_id] = distance
+    return nearby
@@ -0,0 +1,107 @@
+import os
+from io import BytesIO
+
+from PIL import ExifTags, Image, ImageOps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# name -> bounding box; generated largest first so each step shrinks the last
+VARIANT_SIZES = {
+    'large': (1600, 1600),
+    'medium': (800, 800),
+    'thumb': (320, 320),
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Orientations that rotate by 90 degrees, swapping width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+# Formats strip_metadata re-encodes; GIF carries no EXIF and may be animated
+STRIPPED_FORMATS = {
+    'JPEG': {'quality': 95},
+    'PNG': {'optimize': True},
+}
+
+
+def open_scaled(fp, size):
+    """Open an image already cut down close to `size` as cheaply as possible.
+
+    draft() lets the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding,
+    and reduce() then drops whole pixel blocks before any resampling.
+    `size` is in display orientation, so it is swapped for draft() on
+    images stored rotated.
+    """
+    image = Image.open(fp)
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+    image.draft('RGB', size[::-1] if orientation in TRANSPOSED_ORIENTATIONS else size)
+    image = ImageOps.exif_transpose(image)
+
+    factor = min(image.width // size[0], image.height // size[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('LA', 'PA', 'P') else 'RGB')
+    return image
+
+
+def encode(image, fmt):
+    """Encode to bytes; metadata is not copied, so EXIF (GPS etc.) is stripped"""
+    pil_format, options = VARIANT_FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = BytesIO()
+    image.save(output, format=pil_format, **options)
+    return output.getvalue()
+
+
+def strip_metadata(name, storage=default_storage):
+    """Store a copy of a JPEG/PNG without its EXIF (GPS etc.) under a new name.
+
+    The orientation is applied to the pixels first so the image still
+    displays upright. The original is left in place: the caller deletes it
+    once nothing points at it any more. Returns the name of the stripped
+    copy, or ``name`` unchanged for other formats.
+    """
+    with storage.open(name, 'rb') as fp:
+        image = Image.open(fp)
+        options = STRIPPED_FORMATS.get(image.format)
+        if options is None:
+            return name
+        pil_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    output = BytesIO()
+    image.save(output, format=pil_format, **options)
+    stem, extension = os.path.splitext(name)
+    return storage.save(f'{stem}_clean{extension}', ContentFile(output.getvalue()))
+
+
+def generate_variants(name, storage=default_storage, sizes=VARIANT_SIZES, formats=VARIANT_FORMATS):
+    """Write resized WebP/JPEG variants of a stored image next to it.
+
+    Returns {variant: {'width', 'height', <format>: url, ...}}. Images
+    smaller than a box are never upscaled.
+    """
+    stem, _ = os.path.splitext(name)
+    directory, filename = os.path.split(stem)
+    largest = max(sizes.values())
+
+    with storage.open(name, 'rb') as fp:
+        image = open_scaled(fp, largest)
+        image.load()
+
+    variants = {}
+    for variant, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        image.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        entry = {'width': image.width, 'height': image.height}
+        for fmt in formats:
+            path = os.path.join(directory, 'variants', f'{filename}_{variant}.{fmt}')
+            if storage.exists(path):
+                storage.delete(path)
+            saved = storage.save(path, ContentFile(encode(image, fmt)))
+            entry[fmt] = storage.url(saved)
+        variants[variant] = entry
+    return variants
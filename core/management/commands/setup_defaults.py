@@ -10,6 +10,7 @@ class Command(BaseCommand):
         defaults = [
             ('SEARCH_RADIUS_KM', '250', 'Default search radius in kilometers'),
             ('ESCROW_MODE', 'auto', 'Escrow release mode: auto or manual'),
+            ('ESCROW_HOLD_DAYS', '3', 'Days a delivered order stays in escrow before auto-release'),
             ('GLOBAL_COMMISSION_RATE', '5.0', 'Global commission rate percentage'),
             ('MIN_WALLET_RECHARGE', '100', 'Minimum wallet recharge amount'),
             ('MAX_WALLET_RECHARGE', '50000', 'Maximum wallet recharge amount'),
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import RegexValidator
+from django.core.cache import cache
 from django.utils import timezone
 import uuid
 
@@ -118,27 +119,20 @@ class Notification(models.Model):
     
     @classmethod
     def create_notification(cls, user, title, message, notification_type='system', data=None):
-        """Create a new notification and keep only latest 15"""
-        # Create new notification
-        notification = cls.objects.create(
+        """Create a new notification; core.tasks.prune_old_notifications keeps the latest 15"""
+        return cls.objects.create(
             user=user,
             title=title,
             message=message,
             notification_type=notification_type,
             data=data or {}
         )
-        
-        # Keep only latest 15 notifications per user
-        user_notifications = cls.objects.filter(user=user).order_by('-created_at')
-        if user_notifications.count() > 15:
-            old_notifications = user_notifications[15:]
-            cls.objects.filter(id__in=[n.id for n in old_notifications]).delete()
-        
-        return notification
 
 
 class SystemSettings(BaseModel):
     """System-wide settings"""
+    CACHE_KEY = 'system_setting_{}'
+    
     key = models.CharField(max_length=100, unique=True)
     value = models.TextField()
     description = models.TextField(blank=True)
@@ -148,6 +142,29 @@ class SystemSettings(BaseModel):
     
     def __str__(self):
         return f"{self.key}: {self.value[:50]}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.delete(self.CACHE_KEY.format(self.key))
+    
+    def delete(self, *args, **kwargs):
+        cache.delete(self.CACHE_KEY.format(self.key))
+        return super().delete(*args, **kwargs)
+    
+    @classmethod
+    def get_value(cls, key, default=None, cast=str):
+        """Cached setting lookup, falling back to default when missing or invalid"""
+        cache_key = cls.CACHE_KEY.format(key)
+        value = cache.get(cache_key)
+        if value is None:
+            value = cls.objects.filter(key=key).values_list('value', flat=True).first()
+            if value is None:
+                return default
+            cache.set(cache_key, value, None)
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return default
 
 
 class Category(BaseModel):
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from itertools import islice
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import F, OuterRef, Subquery
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Latest notifications kept per user by prune_notifications
+NOTIFICATIONS_PER_USER = 15
+FANOUT_BATCH_SIZE = 1000
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def _group_send_all(channel_layer, events):
+    await asyncio.gather(*[
+        channel_layer.group_send(group, event) for group, event in events
+    ])
+
+
+def push_notifications(notifications):
+    """Send a batch of notifications to their users' WebSocket groups at once"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not notifications:
+        return
+    events = [
+        (f'notifications_{notification.user_id}', {
+            'type': 'notification_message',
+            'notification_type': notification.notification_type,
+            'message': notification.message,
+            'data': {
+                'id': str(notification.id),
+                'title': notification.title,
+                **notification.data,
+            },
+        })
+        for notification in notifications
+    ]
+    try:
+        async_to_sync(_group_send_all)(channel_layer, events)
+    except Exception as e:
+        # Rows are stored; users see them on their next page load
+        logger.warning(f"Failed to push {len(events)} notifications: {e}")
+
+
+def notify_users(user_ids, title, message, notification_type='system', data=None, push=True):
+    """Create the same notification for many users with batched inserts.
+
+    Old rows are not trimmed here; prune_notifications does that for all
+    users in one set-based delete. Returns the number created.
+    """
+    created = 0
+    for batch in _batched(user_ids, FANOUT_BATCH_SIZE):
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                data=data or {}
+            )
+            for user_id in batch
+        ])
+        if push:
+            push_notifications(notifications)
+        created += len(notifications)
+    return created
+
+
+def prune_notifications(keep=NOTIFICATIONS_PER_USER):
+    """Delete everything older than each user's `keep` newest notifications"""
+    cutoff = Notification.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-created_at').values('created_at')[keep - 1:keep]
+    stale = Notification.objects.annotate(
+        cutoff=Subquery(cutoff)
+    ).filter(created_at__lt=F('cutoff')).values('id')
+    deleted, _ = Notification.objects.filter(id__in=stale).delete()
+    return deleted
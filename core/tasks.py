@@ -176,3 +176,35 @@ def send_email_with_fallback(task_func, *args, **kwargs):
         logger.warning(f"Async task failed, executing synchronously: {e}")
         # Fallback to synchronous execution
         return task_func(*args, **kwargs)
+
+
+@shared_task
+def prune_thumbnail_cache():
+    """Evict least recently used thumbnails beyond the cache size budget"""
+    from .thumbnails import evict_thumbnails
+    
+    removed, remaining = evict_thumbnails()
+    logger.info(f"Thumbnail cache pruned: {removed} files removed, {remaining} bytes kept")
+    return removed
+
+
+@shared_task
+def fan_out_notification(title, message, notification_type='system', data=None, user_ids=None):
+    """Notify the given users, or every active user, in batched inserts"""
+    from .notifications import notify_users
+    
+    if user_ids is None:
+        user_ids = User.objects.filter(is_active=True).values_list('id', flat=True).iterator(chunk_size=2000)
+    created = notify_users(user_ids, title, message, notification_type, data)
+    logger.info(f"Fanned out '{title}' to {created} users")
+    return created
+
+
+@shared_task
+def prune_old_notifications():
+    """Trim every user's notifications to the most recent ones"""
+    from .notifications import prune_notifications
+    
+    deleted = prune_notifications()
+    logger.info(f"Pruned {deleted} old notifications")
+    return deleted
@@ -0,0 +1,58 @@
+from django import template
+from django.conf import settings
+from django.urls import reverse
+from django.utils.html import format_html
+
+from core.thumbnails import THUMBNAIL_WIDTHS
+
+register = template.Library()
+
+SRCSET_WIDTHS = (320, 480, 640, 960)
+
+
+def _media_path(image):
+    """Storage name for an ImageField file or a /media/ URL, else None"""
+    if not image:
+        return None
+    name = getattr(image, 'name', None)
+    if name:
+        return name
+    image = str(image)
+    if image.startswith(settings.MEDIA_URL):
+        return image[len(settings.MEDIA_URL):]
+    return None
+
+
+def _srcset(path, fmt, widths):
+    return ', '.join(
+        f"{reverse('core:thumbnail', args=[width, fmt, path])} {width}w"
+        for width in widths
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', css_class='', style='', width=480):
+    """<picture> with WebP and JPEG srcsets served by the thumbnail view.
+
+    Images outside MEDIA_ROOT (e.g. external URLs) fall back to a plain <img>.
+    """
+    path = _media_path(image)
+    if path is None:
+        src = getattr(image, 'url', image)
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">',
+            src, alt, css_class, style
+        )
+    
+    widths = [w for w in SRCSET_WIDTHS if w in THUMBNAIL_WIDTHS]
+    fallback_width = width if width in THUMBNAIL_WIDTHS else widths[-1]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(path, 'webp', widths), sizes,
+        reverse('core:thumbnail', args=[fallback_width, 'jpeg', path]),
+        _srcset(path, 'jpeg', widths), sizes,
+        alt, css_class, style
+    )
@@ -1,8 +1,34 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from PIL import ExifTags, Image, JpegImagePlugin
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Address, Category
+from chat.models import ChatMessage, ChatRoom
+from .consumers import CLOSE_FORBIDDEN, CLOSE_UNAUTHENTICATED
+from .models import Address, Category, Notification
+from .routing import websocket_urlpatterns
+from .geo import covering_geohashes, geohash_encode, haversine_km
+from . import thumbnails
+from .images import open_scaled, strip_metadata
+from .notifications import notify_users, prune_notifications
 
 User = get_user_model()
 
@@ -59,3 +85,239 @@ class AuthAPITest(APITestCase):
         response = self.client.get('/api/v1/health/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], 'healthy')
+
+
+class GeoHelpersTest(SimpleTestCase):
+    def test_haversine_delhi_mumbai(self):
+        distance = haversine_km(28.6139, 77.2090, 19.0760, 72.8777)
+        self.assertAlmostEqual(distance, 1148, delta=5)
+    
+    def test_covering_geohashes_contains_point_cell(self):
+        cells = covering_geohashes(28.6139, 77.2090, 25)
+        point_hash = geohash_encode(28.6139, 77.2090)
+        self.assertTrue(any(point_hash.startswith(cell) for cell in cells))
+
+
+class NotificationFanOutTest(TestCase):
+    def _users(self, count, prefix='user'):
+        return [
+            User.objects.create_user(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password='pass')
+            for i in range(count)
+        ]
+    
+    def _seed(self, user, count):
+        """`count` notifications, a minute apart; returns their ids newest first"""
+        now = timezone.now()
+        ids = []
+        for i in range(count):
+            notification = Notification.objects.create(user=user, title=f'Notice {i}', message='Hello')
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(minutes=i))
+            ids.append(notification.pk)
+        return ids
+    
+    @mock.patch('core.notifications.FANOUT_BATCH_SIZE', 2)
+    def test_notify_users_creates_one_row_per_user_across_batches(self):
+        users = self._users(5)
+        
+        created = notify_users((user.pk for user in users), 'Sale', 'Everything is 10% off', push=False)
+        
+        self.assertEqual(created, 5)
+        self.assertCountEqual(
+            Notification.objects.filter(title='Sale').values_list('user_id', flat=True),
+            [user.pk for user in users]
+        )
+    
+    def test_prune_keeps_newest_per_user(self):
+        first, second, light = self._users(3)
+        first_ids = self._seed(first, 20)
+        second_ids = self._seed(second, 17)
+        light_ids = self._seed(light, 4)
+        
+        deleted = prune_notifications(keep=15)
+        
+        self.assertEqual(deleted, 5 + 2)
+        self.assertCountEqual(Notification.objects.filter(user=first).values_list('pk', flat=True), first_ids[:15])
+        self.assertCountEqual(Notification.objects.filter(user=second).values_list('pk', flat=True), second_ids[:15])
+        self.assertCountEqual(Notification.objects.filter(user=light).values_list('pk', flat=True), light_ids)
+
+
+class ThumbnailTest(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.cache_dir = Path(self.media_root) / 'thumbnails'
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, THUMBNAIL_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        output = BytesIO()
+        Image.new('RGB', (1200, 800), 'green').save(output, format='JPEG')
+        default_storage.save('products/photo.jpg', ContentFile(output.getvalue()))
+    
+    def _url(self, width, fmt, path):
+        return reverse('core:thumbnail', kwargs={'width': width, 'fmt': fmt, 'path': path})
+    
+    def test_renders_once_then_serves_from_cache(self):
+        with mock.patch('core.thumbnails.open_scaled', wraps=thumbnails.open_scaled) as open_scaled:
+            first = thumbnails.get_thumbnail('products/photo.jpg', 320, 'webp')
+            second = thumbnails.get_thumbnail('products/photo.jpg', 320, 'webp')
+        
+        self.assertEqual(first, second)
+        self.assertEqual(open_scaled.call_count, 1)
+        with Image.open(first) as image:
+            self.assertEqual((image.format, image.width), ('WEBP', 320))
+    
+    def test_only_allowed_widths_and_formats(self):
+        response = self.client.get(self._url(320, 'jpeg', 'products/photo.jpg'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        response.close()
+        
+        self.assertEqual(self.client.get(self._url(321, 'jpeg', 'products/photo.jpg')).status_code, 404)
+        self.assertEqual(self.client.get(self._url(320, 'png', 'products/photo.jpg')).status_code, 404)
+    
+    def test_rejects_traversal(self):
+        outside = Path(self.media_root).parent / 'outside.jpg'
+        Image.new('RGB', (10, 10)).save(outside)
+        self.addCleanup(outside.unlink)
+        
+        with self.assertRaises(SuspiciousFileOperation):
+            thumbnails.get_thumbnail('../outside.jpg', 320, 'webp')
+        self.assertEqual(self.client.get(self._url(320, 'webp', '../outside.jpg')).status_code, 404)
+    
+    def test_undecodable_image_is_not_found(self):
+        default_storage.save('products/broken.jpg', ContentFile(b'not an image'))
+        self.assertEqual(self.client.get(self._url(320, 'webp', 'products/broken.jpg')).status_code, 404)
+    
+    def test_evicts_least_recently_used(self):
+        now = time.time()
+        for age, name in enumerate(['newest', 'middle', 'oldest']):
+            path = self.cache_dir / 'ab' / f'{name}.webp'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b'x' * 100)
+            os.utime(path, (now - age * 60, now - age * 60))
+        in_flight = self.cache_dir / 'ab' / 'render.tmp'
+        in_flight.write_bytes(b'x' * 100)
+        
+        removed, remaining = thumbnails.evict_thumbnails(max_bytes=250)
+        
+        self.assertEqual((removed, remaining), (1, 200))
+        self.assertFalse((self.cache_dir / 'ab' / 'oldest.webp').exists())
+        self.assertTrue((self.cache_dir / 'ab' / 'middle.webp').exists())
+        self.assertTrue(in_flight.exists())
+    
+    def test_clears_stale_temp_files(self):
+        stale = self.cache_dir / 'ab' / 'crashed.tmp'
+        stale.parent.mkdir(parents=True)
+        stale.write_bytes(b'x')
+        old = time.time() - thumbnails.TEMP_FILE_GRACE - 60
+        os.utime(stale, (old, old))
+        
+        thumbnails.evict_thumbnails(max_bytes=0)
+        
+        self.assertFalse(stale.exists())
+
+
+def _rotated_jpeg(size):
+    """JPEG stored at `size` with EXIF saying to display it rotated by 90 degrees"""
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = 6
+    exif[ExifTags.Base.Make] = 'PhoneCam'
+    output = BytesIO()
+    Image.new('RGB', size, 'green').save(output, format='JPEG', exif=exif)
+    output.seek(0)
+    return output
+
+
+class ImageProcessingTest(SimpleTestCase):
+    def test_draft_box_follows_exif_orientation(self):
+        draft = JpegImagePlugin.JpegImageFile.draft
+        with mock.patch.object(JpegImagePlugin.JpegImageFile, 'draft', autospec=True, side_effect=draft) as spy:
+            image = open_scaled(_rotated_jpeg((1200, 400)), (100, 400))
+        
+        spy.assert_called_once_with(mock.ANY, 'RGB', (400, 100))
+        self.assertLess(image.width, image.height)
+    
+    def test_strip_metadata_keeps_orientation_and_drops_exif(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            name = default_storage.save('chat_images/photo.jpg', ContentFile(_rotated_jpeg((120, 40)).getvalue()))
+            
+            stripped = strip_metadata(name)
+            
+            self.assertNotEqual(stripped, name)
+            # The original is only removed by the caller, after relinking
+            self.assertTrue(default_storage.exists(name))
+            with default_storage.open(stripped, 'rb') as fp, Image.open(fp) as image:
+                self.assertEqual(image.size, (40, 120))
+                self.assertEqual(dict(image.getexif()), {})
+
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatConsumerTest(TransactionTestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', email='seller@example.com', password='testpass123')
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='testpass123')
+        self.room = ChatRoom.objects.create(name='Scrap pickup', room_type='support')
+        self.room.participants.add(self.buyer, self.seller)
+        patcher = mock.patch('chat.delivery.queue_moderation')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _communicator(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.room.id}/')
+        communicator.scope['user'] = user
+        return communicator
+    
+    async def _assert_refused(self, user, code):
+        communicator = self._communicator(user)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': code})
+        await communicator.disconnect()
+    
+    async def test_anonymous_and_outsiders_are_refused(self):
+        await self._assert_refused(AnonymousUser(), CLOSE_UNAUTHENTICATED)
+        await self._assert_refused(self.outsider, CLOSE_FORBIDDEN)
+    
+    async def test_message_is_stored_broadcast_and_acked(self):
+        sender = self._communicator(self.buyer)
+        receiver = self._communicator(self.seller)
+        self.assertTrue((await sender.connect())[0])
+        self.assertTrue((await receiver.connect())[0])
+        
+        await sender.send_json_to({'message': 'Is the copper still available?', 'client_id': 'c-1'})
+        
+        # The ack is sent from receive(), before the consumer handles its own group echo
+        ack = await sender.receive_json_from()
+        echo = await sender.receive_json_from()
+        delivered = await receiver.receive_json_from()
+        self.assertEqual(echo['message']['client_id'], 'c-1')
+        self.assertEqual(ack['type'], 'ack')
+        self.assertEqual(ack['client_id'], 'c-1')
+        self.assertEqual(delivered['type'], 'message')
+        self.assertEqual(delivered['message']['id'], ack['message_id'])
+        
+        stored = await database_sync_to_async(ChatMessage.objects.get)(id=ack['message_id'])
+        self.assertEqual(stored.content, 'Is the copper still available?')
+        self.assertEqual(stored.sender_id, self.buyer.id)
+        
+        await sender.disconnect()
+        await receiver.disconnect()
+    
+    async def test_invalid_payload_is_rejected_without_storing(self):
+        communicator = self._communicator(self.buyer)
+        await communicator.connect()
+        
+        await communicator.send_json_to({'message': '   ', 'client_id': 'c-2'})
+        
+        error = await communicator.receive_json_from()
+        self.assertEqual(error['type'], 'error')
+        self.assertEqual(error['client_id'], 'c-2')
+        self.assertEqual(await database_sync_to_async(ChatMessage.objects.count)(), 0)
+        await communicator.disconnect()
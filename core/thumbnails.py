@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.storage import default_storage
+from .images import encode, open_scaled
+
+# Widths a thumbnail may be requested at; anything else would let clients
+# fill the cache with arbitrary sizes
+THUMBNAIL_WIDTHS = (160, 320, 480, 640, 960)
+THUMBNAIL_FORMATS = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Temp files younger than this may still be mid-write and about to be renamed
+TEMP_FILE_GRACE = 60 * 60
+
+
+def get_cache_dir():
+    return Path(getattr(settings, 'THUMBNAIL_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'thumbnails'))
+
+
+def get_cache_budget():
+    return getattr(settings, 'THUMBNAIL_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES)
+
+
+def thumbnail_path(source, width, fmt):
+    """Cache file for (source, width, format); the source mtime versions it"""
+    modified = default_storage.get_modified_time(source).timestamp()
+    digest = hashlib.sha1(f'{source}:{modified}:{width}:{fmt}'.encode()).hexdigest()
+    return get_cache_dir() / digest[:2] / f'{digest}.{fmt}'
+
+
+def get_thumbnail(source, width, fmt):
+    """Path to a cached thumbnail of a media file, rendering it on a miss"""
+    path = thumbnail_path(source, width, fmt)
+    try:
+        # Bump the mtime so eviction treats it as recently used
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    with default_storage.open(source, 'rb') as fp:
+        image = open_scaled(fp, (width, width * 4))
+        image.thumbnail((width, width * 4), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        data = encode(image, fmt)
+
+    # Write then rename so concurrent requests never serve a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_path, path)
+    return path
+
+
+def evict_thumbnails(max_bytes=None):
+    """Delete least recently used thumbnails until the cache fits its budget.
+
+    Returns (files_removed, bytes_remaining).
+    """
+    max_bytes = get_cache_budget() if max_bytes is None else max_bytes
+    cache_dir = get_cache_dir()
+    if not cache_dir.exists():
+        return 0, 0
+
+    entries = []
+    total = 0
+    stale_before = time.time() - TEMP_FILE_GRACE
+    for entry in cache_dir.glob('*/*'):
+        try:
+            stat = entry.stat()
+            if entry.suffix == '.tmp':
+                # Only clear temp files left behind by a crashed render
+                if stat.st_mtime < stale_before:
+                    entry.unlink()
+                continue
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+        total += stat.st_size
+
+    removed = 0
+    entries.sort()
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed += 1
+    return removed, total
@@ -11,6 +11,9 @@ urlpatterns = [
     # Health check
     path('health/', views.health_check, name='health_check'),
     
+    # Resized media images
+    path('thumbs/<int:width>/<str:fmt>/<path:path>', views.thumbnail, name='thumbnail'),
+    
     # Notifications
     path('notifications/', NotificationListView.as_view(), name='notifications'),
     path('notifications/get/', views.get_notifications, name='get_notifications'),
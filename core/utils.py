@@ -9,6 +9,19 @@ from datetime import timedelta
 from user_agents import parse
 
 
+def get_redis_client():
+    """Raw redis client behind the default cache, or None if it is not Redis"""
+    from django.core.cache import cache
+    
+    client_factory = getattr(getattr(cache, '_cache', None), 'get_client', None)
+    if client_factory is None:
+        return None
+    try:
+        return client_factory(write=True)
+    except Exception:
+        return None
+
+
 def generate_otp():
     """Generate 6-digit OTP"""
     return ''.join(random.choices(string.digits, k=6))
@@ -2,7 +2,16 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.views.decorators.cache import cache_control
+from PIL import Image, UnidentifiedImageError
 from .models import Notification
+from .thumbnails import IMAGE_EXTENSIONS, THUMBNAIL_FORMATS, THUMBNAIL_WIDTHS, get_thumbnail
+
+# Thumbnail URLs are not versioned, so a replaced image may linger this long
+THUMBNAIL_MAX_AGE = 24 * 60 * 60
 
 
 def home(request):
@@ -15,6 +24,25 @@ def health_check(request):
     return render(request, 'core/health.html', {'status': 'ok'})
 
 
+@cache_control(public=True, max_age=THUMBNAIL_MAX_AGE)
+def thumbnail(request, width, fmt, path):
+    """Resized copy of a media image, rendered once and served from disk"""
+    if width not in THUMBNAIL_WIDTHS or fmt not in THUMBNAIL_FORMATS:
+        raise Http404
+    if not path.lower().endswith(IMAGE_EXTENSIONS):
+        raise Http404
+    try:
+        if not default_storage.exists(path):
+            raise Http404
+        cached = get_thumbnail(path, width, fmt)
+        response = FileResponse(open(cached, 'rb'), content_type=THUMBNAIL_FORMATS[fmt])
+    except (SuspiciousFileOperation, UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        # Traversal, a file PIL cannot (or will not) decode, or a thumbnail
+        # evicted before it could be opened
+        raise Http404
+    return response
+
+
 @login_required
 def get_notifications(request):
     """Get user notifications page"""
@@ -5,3 +5,6 @@ class CustomAdminConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'custom_admin'
     verbose_name = 'Custom Admin Panel'
+    
+    def ready(self):
+        import custom_admin.signals
@@ -1,7 +1,4 @@
-from django.db.models import Count, Q
-from vendors.models import Vendor
-from chat.models import ChatMessage
-from orders.models import Order
+from .stats import get_sidebar_stats
 
 
 def admin_stats(request):
@@ -10,21 +7,15 @@ def admin_stats(request):
         return {}
     
     try:
-        stats = {
-            'pending_kyc': Vendor.objects.filter(kyc_status='pending').count(),
-            'flagged_messages': ChatMessage.objects.filter(is_flagged=True).count(),
-        }
-        
-        escrow_stats = {
-            'pending_release': Order.objects.filter(
-                escrow_status='held', 
-                order_status='delivered'
-            ).count(),
-        }
-        
+        sidebar_stats = get_sidebar_stats()
         return {
-            'stats': stats,
-            'escrow_stats': escrow_stats,
+            'stats': {
+                'pending_kyc': sidebar_stats['pending_kyc'],
+                'flagged_messages': sidebar_stats['flagged_messages'],
+            },
+            'escrow_stats': {
+                'pending_release': sidebar_stats['pending_release'],
+            },
         }
     except:
         return {
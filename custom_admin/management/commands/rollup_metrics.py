@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from custom_admin.metrics import rollup_daily_metrics
+
+
+class Command(BaseCommand):
+    help = 'Roll rows up into the dashboard DailyMetrics (full history on the first run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-aggregate all history')
+
+    def handle(self, *args, **options):
+        rows = rollup_daily_metrics(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Updated {rows} daily metrics rows'))
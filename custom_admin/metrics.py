@@ -0,0 +1,183 @@
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import User
+from vendors.models import Vendor
+from products.models import Product
+from orders.models import Order
+from wallet.models import WalletTransaction
+from coupons.models import Coupon
+from advertisements.models import Advertisement
+from .models import DailyMetrics, MetricsWatermark
+
+WATERMARK_NAME = 'daily_metrics'
+# Days before the watermark that are re-aggregated each run, so rows whose
+# status settles soon after creation (e.g. pending recharges) are counted;
+# later changes move the watermark back with reopen_metrics_day
+REOPEN_DAYS = 2
+SNAPSHOT_CACHE_KEY = 'admin_dashboard_snapshot'
+SNAPSHOT_TIMEOUT = 5 * 60
+
+# dimension -> (queryset factory, timestamp field, summed amount field)
+METRIC_SOURCES = {
+    'users': (lambda: User.objects.all(), 'date_joined', None),
+    'vendors': (lambda: Vendor.objects.all(), 'created_at', None),
+    'products': (lambda: Product.objects.all(), 'created_at', None),
+    'orders': (lambda: Order.objects.all(), 'created_at', 'total_amount'),
+    'paid_orders': (lambda: Order.objects.filter(payment_status='paid'), 'created_at', 'total_amount'),
+    'recharges': (
+        lambda: WalletTransaction.objects.filter(transaction_type='recharge', status='completed'),
+        'created_at',
+        'amount',
+    ),
+    'wallet_transactions': (
+        lambda: WalletTransaction.objects.filter(status='completed'),
+        'created_at',
+        None,
+    ),
+}
+
+
+# Fields whose change alters an already rolled-up day; saves limited to
+# other fields (update_fields) cannot, and do not reopen anything
+REOPEN_FIELDS = {
+    Order: {'payment_status', 'total_amount'},
+    WalletTransaction: {'transaction_type', 'status', 'amount'},
+}
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def reopen_metrics_day(created_at):
+    """Have the next rollup re-aggregate from the day a row was created.
+
+    Rows are bucketed by creation time, so a status change (an order marked
+    paid, a recharge completed) on an older row would otherwise never be
+    counted. The rollup already redoes REOPEN_DAYS before the watermark, so
+    only days older than that move it back, and only ever backwards.
+    """
+    reopened_through = timezone.localdate(created_at) + timedelta(days=REOPEN_DAYS)
+    if reopened_through >= timezone.localdate():
+        return 0
+    return MetricsWatermark.objects.filter(
+        name=WATERMARK_NAME, processed_through__gt=reopened_through
+    ).update(processed_through=reopened_through, updated_at=timezone.now())
+
+
+def rollup_daily_metrics(full=False):
+    """Aggregate new rows since the watermark into DailyMetrics.
+
+    Each dimension is one GROUP BY over the reopened window, so the cost
+    depends on recent activity rather than total history.
+    """
+    today = timezone.localdate()
+    started_from = MetricsWatermark.objects.filter(name=WATERMARK_NAME).values_list(
+        'processed_through', flat=True).first()
+    if full or started_from is None:
+        since = None
+    else:
+        since = min(started_from, today) - timedelta(days=REOPEN_DAYS)
+
+    rows = 0
+    with transaction.atomic():
+        for dimension, (queryset_factory, date_field, amount_field) in METRIC_SOURCES.items():
+            queryset = queryset_factory()
+            if since is not None:
+                queryset = queryset.filter(**{f'{date_field}__gte': _start_of_day(since)})
+            aggregates = {'total': Count('id')}
+            if amount_field:
+                aggregates['amount'] = Sum(amount_field)
+            daily = queryset.annotate(day=TruncDate(date_field)).values('day').annotate(
+                **aggregates
+            ).order_by()
+
+            existing = DailyMetrics.objects.filter(dimension=dimension)
+            if since is not None:
+                existing = existing.filter(date__gte=since)
+            existing = {metric.date: metric for metric in existing}
+
+            to_create, to_update = [], []
+            for entry in daily:
+                metric = existing.pop(entry['day'], None)
+                if metric is None:
+                    to_create.append(DailyMetrics(
+                        date=entry['day'],
+                        dimension=dimension,
+                        count=entry['total'],
+                        amount=entry.get('amount') or 0,
+                    ))
+                else:
+                    metric.count = entry['total']
+                    metric.amount = entry.get('amount') or 0
+                    to_update.append(metric)
+            # Days in the window that no longer have rows (e.g. deleted)
+            for metric in existing.values():
+                metric.count = 0
+                metric.amount = 0
+                to_update.append(metric)
+
+            DailyMetrics.objects.bulk_create(to_create)
+            DailyMetrics.objects.bulk_update(to_update, ['count', 'amount'])
+            rows += len(to_create) + len(to_update)
+
+        if started_from is None:
+            MetricsWatermark.objects.get_or_create(
+                name=WATERMARK_NAME,
+                defaults={'processed_through': today}
+            )
+        elif started_from < today:
+            # Only advance from the value this run started at: a reopen that
+            # landed meanwhile moved it back, and the next run must see that
+            MetricsWatermark.objects.filter(
+                name=WATERMARK_NAME, processed_through=started_from
+            ).update(processed_through=today, updated_at=timezone.now())
+    return rows
+
+
+def get_metric_totals():
+    """All-time count and amount per dimension, summed from the rollup"""
+    totals = {dimension: {'count': 0, 'amount': 0} for dimension in METRIC_SOURCES}
+    for entry in DailyMetrics.objects.values('dimension').annotate(
+        total_count=Sum('count'),
+        total_amount=Sum('amount')
+    ):
+        totals[entry['dimension']] = {
+            'count': entry['total_count'] or 0,
+            'amount': entry['total_amount'] or 0,
+        }
+    return totals
+
+
+def get_metric_series(dimension, days):
+    """Daily (day, count, amount) for the last `days` days, oldest first"""
+    since = timezone.localdate() - timedelta(days=days)
+    return list(
+        DailyMetrics.objects.filter(dimension=dimension, date__gte=since)
+        .order_by('date')
+        .values('date', 'count', 'amount')
+    )
+
+
+def get_dashboard_snapshot():
+    """Current-state counters that are not time series, cached briefly"""
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is None:
+        order_stats = Order.objects.aggregate(
+            pending_orders=Count('id', filter=Q(order_status='placed')),
+            held_amount=Sum('total_amount', filter=Q(escrow_status='held')),
+            disputed_orders=Count('id', filter=Q(escrow_status='disputed')),
+        )
+        snapshot = {
+            **order_stats,
+            'active_coupons': Coupon.objects.filter(is_active=True).count(),
+            'active_ads': Advertisement.objects.filter(status='active').count(),
+        }
+        cache.set(SNAPSHOT_CACHE_KEY, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
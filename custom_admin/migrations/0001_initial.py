@@ -0,0 +1,43 @@
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetrics',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('users', 'New Users'), ('vendors', 'New Vendors'), ('products', 'New Products'), ('orders', 'Orders Placed'), ('paid_orders', 'Paid Orders'), ('recharges', 'Completed Recharges'), ('wallet_transactions', 'Completed Wallet Transactions')], max_length=30)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Metrics',
+                'ordering': ['-date', 'dimension'],
+                'unique_together': {('dimension', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricsWatermark',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('processed_through', models.DateField()),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
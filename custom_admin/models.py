@@ -0,0 +1,37 @@
+from django.db import models
+from core.models import BaseModel
+
+
+class DailyMetrics(BaseModel):
+    """Precomputed per-day totals for one dashboard dimension"""
+    DIMENSION_CHOICES = [
+        ('users', 'New Users'),
+        ('vendors', 'New Vendors'),
+        ('products', 'New Products'),
+        ('orders', 'Orders Placed'),
+        ('paid_orders', 'Paid Orders'),
+        ('recharges', 'Completed Recharges'),
+        ('wallet_transactions', 'Completed Wallet Transactions'),
+    ]
+    
+    date = models.DateField()
+    dimension = models.CharField(max_length=30, choices=DIMENSION_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name_plural = "Daily Metrics"
+        ordering = ['-date', 'dimension']
+        unique_together = ['dimension', 'date']
+    
+    def __str__(self):
+        return f"{self.date} - {self.dimension}: {self.count}"
+
+
+class MetricsWatermark(BaseModel):
+    """Last day fully rolled up for a metrics job"""
+    name = models.CharField(max_length=100, unique=True)
+    processed_through = models.DateField()
+    
+    def __str__(self):
+        return f"{self.name} @ {self.processed_through}"
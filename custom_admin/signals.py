@@ -0,0 +1,47 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from vendors.models import Vendor
+from chat.models import ChatMessage
+from orders.models import Order
+from wallet.models import WalletTransaction
+from .metrics import REOPEN_FIELDS, reopen_metrics_day
+from .stats import invalidate_sidebar_stat
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def vendor_changed(sender, instance, **kwargs):
+    invalidate_sidebar_stat('pending_kyc')
+
+
+@receiver(post_save, sender=ChatMessage)
+def chat_message_saved(sender, instance, created, **kwargs):
+    # New unflagged messages cannot change the count; skip the common case
+    if instance.is_flagged or not created:
+        invalidate_sidebar_stat('flagged_messages')
+
+
+@receiver(post_delete, sender=ChatMessage)
+def chat_message_deleted(sender, instance, **kwargs):
+    if instance.is_flagged:
+        invalidate_sidebar_stat('flagged_messages')
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if not created or (instance.escrow_status == 'held' and instance.order_status == 'delivered'):
+        invalidate_sidebar_stat('pending_release')
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    invalidate_sidebar_stat('pending_release')
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=WalletTransaction)
+def metrics_source_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Payment and recharge status can change long after the row's metrics day
+    if created or (update_fields is not None and not REOPEN_FIELDS[sender] & set(update_fields)):
+        return
+    reopen_metrics_day(instance.created_at)
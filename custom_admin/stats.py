@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from vendors.models import Vendor
+from chat.models import ChatMessage
+from orders.models import Order
+
+SIDEBAR_STATS_CACHE_KEY = 'admin_sidebar_stat_{}'
+# Signals keep these fresh; the timeout only bounds drift from bulk updates
+SIDEBAR_STATS_TIMEOUT = 60 * 60
+
+SIDEBAR_STAT_QUERIES = {
+    'pending_kyc': lambda: Vendor.objects.filter(kyc_status='pending').count(),
+    'flagged_messages': lambda: ChatMessage.objects.filter(is_flagged=True).count(),
+    'pending_release': lambda: Order.objects.filter(
+        escrow_status='held',
+        order_status='delivered'
+    ).count(),
+}
+
+
+def get_sidebar_stats():
+    """Sidebar badge counters, computed only for entries missing from cache"""
+    keys = {name: SIDEBAR_STATS_CACHE_KEY.format(name) for name in SIDEBAR_STAT_QUERIES}
+    cached = cache.get_many(keys.values())
+    
+    stats = {}
+    missing = {}
+    for name, key in keys.items():
+        if key in cached:
+            stats[name] = cached[key]
+        else:
+            stats[name] = SIDEBAR_STAT_QUERIES[name]()
+            missing[key] = stats[name]
+    if missing:
+        cache.set_many(missing, SIDEBAR_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_sidebar_stat(name):
+    cache.delete(SIDEBAR_STATS_CACHE_KEY.format(name))
+
+
+def reconcile_sidebar_stats():
+    """Recompute every counter, correcting drift from signal-less updates"""
+    stats = {name: query() for name, query in SIDEBAR_STAT_QUERIES.items()}
+    cache.set_many(
+        {SIDEBAR_STATS_CACHE_KEY.format(name): value for name, value in stats.items()},
+        SIDEBAR_STATS_TIMEOUT
+    )
+    return stats
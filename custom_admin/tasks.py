@@ -0,0 +1,30 @@
+from celery import shared_task
+from .stats import reconcile_sidebar_stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_admin_stats():
+    """Periodically recompute cached admin sidebar counters"""
+    try:
+        stats = reconcile_sidebar_stats()
+        logger.info(f"Admin sidebar stats reconciled: {stats}")
+        return stats
+    except Exception as e:
+        logger.error(f"Error reconciling admin stats: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def rollup_daily_metrics(full=False):
+    """Incrementally roll new rows up into DailyMetrics"""
+    try:
+        from .metrics import rollup_daily_metrics as run_rollup
+        rows = run_rollup(full=full)
+        logger.info(f"Daily metrics rollup updated {rows} rows")
+        return rows
+    except Exception as e:
+        logger.error(f"Error rolling up daily metrics: {str(e)}")
+        return f"Error: {str(e)}"
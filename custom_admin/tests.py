@@ -0,0 +1,135 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.models import Order
+from vendors.models import Vendor
+from .metrics import REOPEN_DAYS, WATERMARK_NAME, _start_of_day, rollup_daily_metrics
+from .models import DailyMetrics, MetricsWatermark
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DailyMetricsRollupTest(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass')
+        vendor_user = User.objects.create_user(username='yard', email='yard@example.com', password='pass')
+        self.vendor = Vendor.objects.create(
+            user=vendor_user,
+            store_name='yard',
+            business_email='yard@example.com',
+            business_phone='9999999999',
+            store_address={}
+        )
+    
+    def _order(self, days_ago, amount='100.00', payment_status='paid'):
+        order = Order.objects.create(
+            user=self.buyer,
+            vendor=self.vendor,
+            delivery_address={},
+            subtotal=Decimal(amount),
+            total_amount=Decimal(amount),
+            payment_status=payment_status
+        )
+        created_at = _start_of_day(self.today - timedelta(days=days_ago)) + timedelta(hours=12)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        order.created_at = created_at
+        return order
+    
+    def _metric(self, dimension, days_ago):
+        metric = DailyMetrics.objects.filter(dimension=dimension, date=self.today - timedelta(days=days_ago)).first()
+        return (metric.count, metric.amount) if metric else (0, 0)
+    
+    def test_first_run_is_full(self):
+        self._order(30, '100.00')
+        self._order(30, '50.00', payment_status='pending')
+        self._order(0, '20.00')
+        
+        rollup_daily_metrics()
+        
+        self.assertEqual(self._metric('orders', 30), (2, Decimal('150.00')))
+        self.assertEqual(self._metric('paid_orders', 30), (1, Decimal('100.00')))
+        self.assertEqual(self._metric('paid_orders', 0), (1, Decimal('20.00')))
+        self.assertEqual(MetricsWatermark.objects.get(name=WATERMARK_NAME).processed_through, self.today)
+    
+    def test_incremental_run_only_reaggregates_the_reopen_window(self):
+        old = self._order(30)
+        rollup_daily_metrics()
+        
+        # Deletes do not reopen a day, so the incremental run leaves it as it was
+        Order.objects.filter(pk=old.pk).delete()
+        self._order(0, '20.00')
+        rollup_daily_metrics()
+        
+        self.assertEqual(self._metric('orders', 30), (1, Decimal('100.00')))
+        self.assertEqual(self._metric('orders', 0), (1, Decimal('20.00')))
+        
+        rollup_daily_metrics(full=True)
+        self.assertEqual(self._metric('orders', 30), (0, Decimal('0.00')))
+    
+    def test_change_inside_reopen_window_is_picked_up(self):
+        order = self._order(REOPEN_DAYS, payment_status='pending')
+        rollup_daily_metrics()
+        self.assertEqual(self._metric('paid_orders', REOPEN_DAYS), (0, 0))
+        
+        Order.objects.filter(pk=order.pk).update(payment_status='paid')
+        rollup_daily_metrics()
+        
+        self.assertEqual(self._metric('paid_orders', REOPEN_DAYS), (1, Decimal('100.00')))
+    
+    def test_change_outside_reopen_window_reopens_its_day(self):
+        order = self._order(10, payment_status='pending')
+        rollup_daily_metrics()
+        
+        order.payment_status = 'paid'
+        order.save()
+        # The run re-aggregates REOPEN_DAYS before the watermark, which reaches the order's day
+        self.assertEqual(
+            MetricsWatermark.objects.get(name=WATERMARK_NAME).processed_through,
+            self.today - timedelta(days=10 - REOPEN_DAYS)
+        )
+        rollup_daily_metrics()
+        
+        self.assertEqual(self._metric('paid_orders', 10), (1, Decimal('100.00')))
+        self.assertEqual(MetricsWatermark.objects.get(name=WATERMARK_NAME).processed_through, self.today)
+    
+    def test_saves_of_other_fields_do_not_reopen(self):
+        order = self._order(10)
+        rollup_daily_metrics()
+        
+        order.order_status = 'delivered'
+        order.save(update_fields=['order_status', 'updated_at'])
+        
+        self.assertEqual(MetricsWatermark.objects.get(name=WATERMARK_NAME).processed_through, self.today)
+    
+    def test_reopen_during_a_rollup_survives_it(self):
+        order = self._order(10, payment_status='pending')
+        self._order(1)
+        rollup_daily_metrics()
+        MetricsWatermark.objects.filter(name=WATERMARK_NAME).update(processed_through=self.today - timedelta(days=1))
+        
+        original_bulk_update = DailyMetrics.objects.bulk_update
+        
+        def reopen_midway(*args, **kwargs):
+            if not Order.objects.filter(pk=order.pk, payment_status='paid').exists():
+                order.payment_status = 'paid'
+                order.save()
+            return original_bulk_update(*args, **kwargs)
+        
+        with mock.patch.object(DailyMetrics.objects, 'bulk_update', side_effect=reopen_midway):
+            rollup_daily_metrics()
+        
+        self.assertEqual(
+            MetricsWatermark.objects.get(name=WATERMARK_NAME).processed_through,
+            self.today - timedelta(days=10 - REOPEN_DAYS)
+        )
+        rollup_daily_metrics()
+        self.assertEqual(self._metric('paid_orders', 10), (1, Decimal('100.00')))
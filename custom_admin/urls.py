@@ -10,6 +10,7 @@ urlpatterns = [
     path('users/', views.user_management, name='user_management'),
     path('users/analytics/', views.user_analytics, name='user_analytics'),
     path('users/toggle-ban/<uuid:user_id>/', views.toggle_user_ban, name='toggle_user_ban'),
+    path('users/announce/', views.send_announcement, name='send_announcement'),
     
     # KYC Management
     path('kyc/', views.kyc_verification, name='kyc_verification'),
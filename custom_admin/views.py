@@ -4,6 +4,8 @@ from django.contrib import messages
 from django.db.models import Count, Sum, Q, Avg
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
+import json
 
 from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
@@ -12,55 +14,66 @@ from vendors.models import Vendor
 from chat.models import ChatMessage, ChatModeration
 from coupons.models import Coupon, CouponUsage
 from advertisements.models import Advertisement
+from orders.escrow import settle_orders
 from orders.models import Order
 from core.models import User, Category
+from core.tasks import fan_out_notification
 from products.models import Product
+from wallet.ledger import LedgerError
 from wallet.models import Wallet, WalletTransaction
+from .models import DailyMetrics
+from .metrics import get_dashboard_snapshot, get_metric_series, get_metric_totals
+from .stats import get_sidebar_stats
 
 
 @staff_member_required
 def admin_dashboard(request):
     """Enhanced admin dashboard with comprehensive analytics"""
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
+    today = timezone.localdate()
+    
+    # Totals and series come from the DailyMetrics rollup, not the raw tables
+    totals = get_metric_totals()
+    snapshot = get_dashboard_snapshot()
+    sidebar_stats = get_sidebar_stats()
+    today_users = DailyMetrics.objects.filter(dimension='users', date=today).values_list('count', flat=True).first()
     
     # Basic stats
     stats = {
-        'total_users': User.objects.count(),
-        'new_users_today': User.objects.filter(date_joined__date=today).count(),
-        'total_vendors': Vendor.objects.count(),
-        'pending_kyc': Vendor.objects.filter(kyc_status='pending').count(),
-        'total_products': Product.objects.count(),
-        'total_orders': Order.objects.count(),
-        'pending_orders': Order.objects.filter(order_status='placed').count(),
-        'flagged_messages': ChatMessage.objects.filter(is_flagged=True).count(),
-        'active_coupons': Coupon.objects.filter(is_active=True).count(),
-        'active_ads': Advertisement.objects.filter(status='active').count(),
+        'total_users': totals['users']['count'],
+        'new_users_today': today_users or 0,
+        'total_vendors': totals['vendors']['count'],
+        'pending_kyc': sidebar_stats['pending_kyc'],
+        'total_products': totals['products']['count'],
+        'total_orders': totals['orders']['count'],
+        'pending_orders': snapshot['pending_orders'],
+        'flagged_messages': sidebar_stats['flagged_messages'],
+        'active_coupons': snapshot['active_coupons'],
+        'active_ads': snapshot['active_ads'],
     }
     
     # Revenue analytics
-    revenue_data = Order.objects.filter(payment_status='paid').aggregate(
-        total_revenue=Sum('total_amount'),
-        total_orders=Count('id'),
-        avg_order_value=Avg('total_amount')
-    )
+    paid_orders = totals['paid_orders']
+    revenue_data = {
+        'total_revenue': paid_orders['amount'],
+        'total_orders': paid_orders['count'],
+        'avg_order_value': paid_orders['amount'] / paid_orders['count'] if paid_orders['count'] else None,
+    }
     
-    commission_rate = 0.05  # 5% commission
+    commission_rate = Decimal('0.05')  # 5% commission
     total_commission = (revenue_data['total_revenue'] or 0) * commission_rate
     
     # Escrow management
-    escrow_stats = Order.objects.aggregate(
-        held_amount=Sum('total_amount', filter=Q(escrow_status='held')),
-        pending_release=Count('id', filter=Q(escrow_status='held', order_status='delivered')),
-        disputed_orders=Count('id', filter=Q(escrow_status='disputed'))
-    )
+    escrow_stats = {
+        'held_amount': snapshot['held_amount'],
+        'pending_release': sidebar_stats['pending_release'],
+        'disputed_orders': snapshot['disputed_orders'],
+    }
     
     # Wallet analytics
-    wallet_stats = WalletTransaction.objects.aggregate(
-        total_recharges=Sum('amount', filter=Q(transaction_type='recharge', status='completed')),
-        total_transactions=Count('id', filter=Q(status='completed'))
-    )
+    wallet_stats = {
+        'total_recharges': totals['recharges']['amount'],
+        'total_transactions': totals['wallet_transactions']['count'],
+    }
     
     # Recent activities
     recent_orders = Order.objects.select_related('user', 'vendor').order_by('-created_at')[:5]
@@ -71,14 +84,10 @@ def admin_dashboard(request):
     ).select_related('user', 'vendor')[:5]
     
     # Chart data for analytics
-    daily_orders = Order.objects.filter(
-        created_at__gte=week_ago
-    ).extra(
-        select={'day': 'date(created_at)'}
-    ).values('day').annotate(
-        count=Count('id'),
-        revenue=Sum('total_amount')
-    ).order_by('day')
+    daily_orders = [
+        {'day': entry['date'].isoformat(), 'count': entry['count'], 'revenue': float(entry['amount'])}
+        for entry in get_metric_series('orders', 7)
+    ]
     
     context = {
         'stats': stats,
@@ -89,7 +98,7 @@ def admin_dashboard(request):
         'recent_orders': recent_orders,
         'recent_users': recent_users,
         'pending_escrow': pending_escrow,
-        'daily_orders': list(daily_orders),
+        'daily_orders': json.dumps(daily_orders),
     }
     
     return render(request, 'custom_admin/dashboard.html', context)
@@ -168,11 +177,15 @@ def release_escrow(request, order_id):
     """Release escrow payment to vendor"""
     order = get_object_or_404(Order, id=order_id)
     
-    if order.escrow_status == 'held':
-        order.escrow_status = 'released'
-        order.save()
-        
-        # Create commission record here if needed
+    try:
+        released = order.escrow_status == 'held' and settle_orders(
+            [order.id], released_by=request.user, notes='Released by admin'
+        )
+    except LedgerError as e:
+        messages.error(request, f'Payment release failed: {str(e)}')
+        return redirect('custom_admin:escrow_management')
+    
+    if released:
         messages.success(request, f'Payment released for order #{order.order_number}')
     else:
         messages.error(request, 'Order payment cannot be released')
@@ -419,6 +432,22 @@ def user_management(request):
     return render(request, 'custom_admin/user_management.html', context)
 
 
+@staff_member_required
+@require_POST
+def send_announcement(request):
+    """Queue an admin notice to every active user"""
+    title = request.POST.get('title', '').strip()
+    message = request.POST.get('message', '').strip()
+    if not title or not message:
+        messages.error(request, 'Announcement title and message are required')
+        return redirect('custom_admin:user_management')
+    
+    # One row per user; far too many to insert inside the request
+    fan_out_notification.delay(title[:200], message, notification_type='admin')
+    messages.success(request, 'Announcement queued for all active users')
+    return redirect('custom_admin:user_management')
+
+
 @staff_member_required
 @require_POST
 def toggle_user_ban(request, user_id):
@@ -20,6 +20,10 @@ python manage.py collectstatic --noinput
 echo "Setting up defaults..."
 python manage.py setup_defaults
 
+# Build dashboard metrics so they are not empty until the first beat run
+echo "Rolling up dashboard metrics..."
+python manage.py rollup_metrics
+
 # Create superuser if it doesn't exist
 echo "Creating superuser..."
 python manage.py shell << EOF
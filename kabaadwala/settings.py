@@ -193,6 +193,46 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'core.tasks.generate_daily_report',
         'schedule': crontab(hour=1, minute=0),  # Daily at 1 AM
     },
+    'flush-product-view-counts': {
+        'task': 'products.tasks.flush_product_view_counts',
+        'schedule': 60.0,  # Every minute
+    },
+    'flush-ad-events': {
+        'task': 'advertisements.tasks.flush_ad_events',
+        'schedule': 30.0,  # Every 30 seconds
+    },
+    'reconcile-admin-stats': {
+        'task': 'custom_admin.tasks.reconcile_admin_stats',
+        'schedule': crontab(minute='*/10'),  # Every 10 minutes
+    },
+    'rollup-daily-metrics': {
+        'task': 'custom_admin.tasks.rollup_daily_metrics',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+    },
+    'send-moderation-digest': {
+        'task': 'chat.tasks.send_moderation_digest',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
+    'prune-old-notifications': {
+        'task': 'core.tasks.prune_old_notifications',
+        'schedule': crontab(minute=15),  # Hourly
+    },
+    'prune-thumbnail-cache': {
+        'task': 'core.tasks.prune_thumbnail_cache',
+        'schedule': crontab(minute=30),  # Hourly
+    },
+    'release-escrow-payments': {
+        'task': 'orders.tasks.release_escrow_payments',
+        'schedule': crontab(hour=3, minute=0),  # Daily at 3 AM
+    },
+    'checkpoint-wallet-ledgers': {
+        'task': 'wallet.tasks.checkpoint_wallet_ledgers',
+        'schedule': crontab(minute=45),  # Hourly
+    },
+    'sweep-payment-events': {
+        'task': 'wallet.tasks.sweep_payment_events',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
 }
 
 # Redis Cache
@@ -219,6 +259,10 @@ CHANNEL_LAYERS = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# On-demand thumbnails (core.thumbnails), evicted LRU beyond this budget
+THUMBNAIL_CACHE_DIR = MEDIA_ROOT / 'thumbnails'
+THUMBNAIL_CACHE_MAX_BYTES = config('THUMBNAIL_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+
 # Email Configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -301,3 +345,10 @@ if use_file_logging:
 # Razorpay Configuration
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID', default='rzp_test_key')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET', default='rzp_test_secret')
+# Webhooks are rejected until a secret is configured in the Razorpay dashboard
+RAZORPAY_WEBHOOK_SECRET = config('RAZORPAY_WEBHOOK_SECRET', default='')
+# wallet.gateway.FakeGateway runs the recharge flow offline for load tests
+PAYMENT_GATEWAY_BACKEND = config('PAYMENT_GATEWAY_BACKEND', default='wallet.gateway.RazorpayGateway')
+PAYMENT_GATEWAY_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+FAKE_GATEWAY_LATENCY = config('FAKE_GATEWAY_LATENCY', default=0.0, cast=float)
+FAKE_GATEWAY_FAILURE_RATE = config('FAKE_GATEWAY_FAILURE_RATE', default=0.0, cast=float)
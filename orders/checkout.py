@@ -0,0 +1,183 @@
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from coupons.models import Coupon, CouponUsage
+from products.models import CartItem, Product
+from wallet import ledger
+from wallet.models import Wallet, WalletTransaction
+from .models import Order, OrderItem
+
+
+class CheckoutError(Exception):
+    """Checkout could not be completed; the message is safe to show the user"""
+
+
+def _address_snapshot(address):
+    return {
+        'name': address.recipient_name,
+        'phone': address.recipient_phone,
+        'address': address.street_address,
+        'city': address.city,
+        'state': address.state,
+        'postal_code': address.pincode,
+        'address_type': address.address_type
+    }
+
+
+def _product_snapshot(product):
+    return {
+        'title': product.title,
+        'description': product.description,
+        'price': float(product.price),
+        'category': product.category.name if product.category else None,
+    }
+
+
+class _CouponApplier:
+    """Applies one coupon code across the vendor orders of a checkout.
+
+    Mirrors Coupon.can_use, but counts the user's past usages once and
+    tracks usages granted within this checkout in memory.
+    """
+
+    def __init__(self, code, user):
+        self.coupon = Coupon.objects.filter(code=code.upper()).first() if code else None
+        self.user_usage = 0
+        if self.coupon is not None:
+            self.user_usage = CouponUsage.objects.filter(coupon=self.coupon, user=user).count()
+        self.applied = 0
+        self.message = None
+
+    def apply(self, order):
+        coupon = self.coupon
+        if coupon is None or not coupon.is_valid:
+            return None
+        if order.total_amount < coupon.min_order_amount:
+            return None
+        if self.user_usage + self.applied >= coupon.user_limit:
+            return None
+        if coupon.usage_limit is not None and coupon.used_count + self.applied >= coupon.usage_limit:
+            return None
+        if coupon.coupon_type == 'vendor' and coupon.vendor_id != order.vendor_id:
+            return None
+
+        discount = coupon.calculate_discount(order.total_amount)
+        order.coupon_discount = discount
+        order.total_amount -= discount
+        self.applied += 1
+        self.message = f"Coupon applied! You saved ₹{discount}"
+        return CouponUsage(coupon=coupon, user=order.user, order=order, discount_amount=discount)
+
+
+def _reserve_stock(cart_items):
+    """Lock the carted products and check their stock; returns {product_id: quantity}"""
+    quantities = Counter()
+    for item in cart_items:
+        quantities[item.product_id] += item.quantity
+
+    # Locked in pk order so checkouts sharing products cannot deadlock
+    stock = dict(
+        Product.objects.select_for_update().filter(pk__in=quantities).order_by('pk')
+        .values_list('pk', 'stock_quantity')
+    )
+    short = [
+        item.product.title for item in cart_items
+        if stock.get(item.product_id, 0) < quantities[item.product_id]
+    ]
+    if short:
+        raise CheckoutError(f"Not enough stock for: {', '.join(short)}")
+    return quantities
+
+
+def place_orders(user, address, notes='', coupon_code=''):
+    """Turn the user's cart into one paid, escrow-held order per vendor.
+
+    Cart lines are grouped by vendor in a single pass, and orders, items,
+    wallet holds and coupon usages are each written with one bulk insert
+    while the wallet row is locked, so concurrent checkouts of one cart
+    serialize. Stock is checked and decremented under product row locks.
+    Returns (orders, coupon_message).
+    """
+    with transaction.atomic():
+        wallet = Wallet.objects.select_for_update().get(user=user)
+        cart_items = list(
+            CartItem.objects.filter(cart__user=user)
+            .select_related('product__vendor', 'product__category')
+        )
+        if not cart_items:
+            raise CheckoutError('Your cart is empty!')
+        quantities = _reserve_stock(cart_items)
+
+        delivery_address = _address_snapshot(address)
+        orders_by_vendor = {}
+        order_items = []
+        for item in cart_items:
+            product = item.product
+            order = orders_by_vendor.get(product.vendor_id)
+            if order is None:
+                order = Order(
+                    order_number=f"ORD-{uuid.uuid4().hex[:8].upper()}",
+                    user=user,
+                    vendor=product.vendor,
+                    delivery_address=delivery_address,
+                    subtotal=Decimal('0.00'),
+                    total_amount=Decimal('0.00'),
+                    notes=notes,
+                    payment_method='wallet',
+                    payment_status='paid',
+                    order_status='placed',
+                    escrow_status='held'
+                )
+                orders_by_vendor[product.vendor_id] = order
+
+            line_total = product.price * item.quantity
+            order_items.append(OrderItem(
+                order=order,
+                product=product,
+                quantity=item.quantity,
+                unit_price=product.price,
+                total_price=line_total,
+                product_snapshot=_product_snapshot(product)
+            ))
+            order.subtotal += line_total
+            order.total_amount += line_total
+
+        orders = list(orders_by_vendor.values())
+        coupons = _CouponApplier(coupon_code, user)
+        coupon_usages = [usage for usage in map(coupons.apply, orders) if usage is not None]
+
+        # One hold per order, posted to the wallet locked above
+        try:
+            ledger.post_many(wallet.pk, [
+                WalletTransaction(
+                    transaction_type='hold',
+                    amount=order.total_amount,
+                    order_id=order.id,
+                    description=f'Payment held for order #{order.order_number}'
+                )
+                for order in orders
+                if order.total_amount > 0
+            ])
+        except ledger.InsufficientFunds as e:
+            raise CheckoutError(str(e)) from e
+
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(order_items)
+        if coupon_usages:
+            CouponUsage.objects.bulk_create(coupon_usages)
+            Coupon.objects.filter(pk=coupons.coupon.pk).update(
+                used_count=F('used_count') + len(coupon_usages)
+            )
+
+        Product.objects.filter(pk__in=quantities).update(stock_quantity=F('stock_quantity') - Case(
+            *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+    return orders, coupons.message
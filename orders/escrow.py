@@ -0,0 +1,163 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from core.models import SystemSettings
+from custom_admin.stats import invalidate_sidebar_stat
+from wallet import ledger
+from wallet.models import Wallet, WalletTransaction
+from .models import Order, OrderStatusHistory, Payment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ESCROW_HOLD_DAYS = 3
+DEFAULT_COMMISSION_RATE = 5.0  # percent
+SETTLEMENT_BATCH_SIZE = 500
+AUTO_RELEASE_NOTE = 'Escrow released automatically after the hold window'
+
+
+def get_escrow_hold_window():
+    """How long a delivered order stays in escrow (SystemSettings.ESCROW_HOLD_DAYS)"""
+    return timedelta(days=SystemSettings.get_value('ESCROW_HOLD_DAYS', DEFAULT_ESCROW_HOLD_DAYS, cast=float))
+
+
+def auto_release_enabled():
+    return SystemSettings.get_value('ESCROW_MODE', 'auto') != 'manual'
+
+
+def releasable_orders(now=None):
+    """Delivered, held orders past the hold window; served by order_escrow_release_idx"""
+    cutoff = (now or timezone.now()) - get_escrow_hold_window()
+    return Order.objects.filter(escrow_status='held', order_status='delivered', actual_delivery__lte=cutoff)
+
+
+def vendor_share(amount, commission_rate):
+    """What the vendor keeps of `amount` after a percentage commission"""
+    share = amount * (Decimal('100') - Decimal(str(commission_rate))) / Decimal('100')
+    return share.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _vendor_wallet_ids(user_ids):
+    wallet_ids = dict(Wallet.objects.filter(user_id__in=user_ids).values_list('user_id', 'pk'))
+    missing = set(user_ids) - set(wallet_ids)
+    if missing:
+        # Vendors created before wallets were added by signal
+        Wallet.objects.bulk_create([Wallet(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+        wallet_ids.update(Wallet.objects.filter(user_id__in=missing).values_list('user_id', 'pk'))
+    return wallet_ids
+
+
+def settle_orders(order_ids, released_by=None, notes='Escrow released'):
+    """Release escrow for a batch of orders in one transaction.
+
+    Every buyer hold is settled (held -> spent) and each vendor is credited
+    the order less commission, all in one ledger.post_batch; order status,
+    payments and status history are then written with one query each.
+    Orders already released or locked by another request are skipped.
+    Returns the ids of the orders released.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(pk__in=order_ids, escrow_status='held')
+            .select_related('vendor')
+        )
+        if not orders:
+            return []
+        ids = [order.pk for order in orders]
+
+        holds = {
+            hold.order_id: hold
+            for hold in WalletTransaction.objects.filter(
+                order_id__in=ids, transaction_type='hold', status='completed'
+            ).only('order_id', 'wallet_id', 'amount')
+        }
+        settled = set(WalletTransaction.objects.filter(
+            order_id__in=ids, status='completed', transaction_type__in=['deduct', 'release', 'refund']
+        ).values_list('order_id', flat=True))
+        vendor_wallets = _vendor_wallet_ids({order.vendor.user_id for order in orders})
+        default_rate = SystemSettings.get_value('GLOBAL_COMMISSION_RATE', DEFAULT_COMMISSION_RATE, cast=float)
+
+        postings = []
+        for order in orders:
+            hold = holds.get(order.pk)
+            if hold is None or order.pk in settled:
+                # Nothing left in escrow; only the status changes
+                continue
+            postings.append(WalletTransaction(
+                wallet_id=hold.wallet_id,
+                transaction_type='deduct',
+                amount=hold.amount,
+                order_id=order.pk,
+                description=f'Payment for order {order.order_number}'
+            ))
+            rate = order.vendor.commission_rate if order.vendor.commission_rate is not None else default_rate
+            share = vendor_share(hold.amount, rate)
+            if share > 0:
+                postings.append(WalletTransaction(
+                    wallet_id=vendor_wallets[order.vendor.user_id],
+                    transaction_type='earning',
+                    amount=share,
+                    order_id=order.pk,
+                    description=f'Earnings for order {order.order_number}'
+                ))
+        if postings:
+            ledger.post_batch(postings)
+
+        now = timezone.now()
+        Order.objects.filter(pk__in=ids).update(
+            escrow_status='released',
+            order_status=Case(When(order_status='delivered', then=Value('completed')), default=F('order_status')),
+            updated_at=now
+        )
+        Payment.objects.filter(order_id__in=ids).update(
+            escrow_status='released', released_at=now, released_by=released_by, updated_at=now
+        )
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(
+                order=order,
+                status='completed' if order.order_status == 'delivered' else order.order_status,
+                notes=notes,
+                updated_by=released_by
+            )
+            for order in orders
+        ])
+        # update() skips the Order post_save receiver that keeps this fresh
+        transaction.on_commit(lambda: invalidate_sidebar_stat('pending_release'))
+    return ids
+
+
+def release_due_escrow(batch_size=SETTLEMENT_BATCH_SIZE, now=None):
+    """Settle every order past its hold window, one chunked transaction at a time.
+
+    Chunks are walked by (actual_delivery, id) so orders that fail or are
+    skipped are not picked up again in the same run. Returns
+    (released, failed).
+    """
+    due = releasable_orders(now).order_by('actual_delivery', 'pk')
+    released = failed = 0
+    last = None
+    while True:
+        chunk = due
+        if last is not None:
+            chunk = chunk.filter(Q(actual_delivery__gt=last[0]) | Q(actual_delivery=last[0], pk__gt=last[1]))
+        rows = list(chunk.values_list('actual_delivery', 'pk')[:batch_size])
+        if not rows:
+            break
+        last = rows[-1]
+        order_ids = [order_id for _, order_id in rows]
+
+        try:
+            released += len(settle_orders(order_ids, notes=AUTO_RELEASE_NOTE))
+        except ledger.LedgerError:
+            # One inconsistent wallet should not hold back the whole chunk
+            for order_id in order_ids:
+                try:
+                    released += len(settle_orders([order_id], notes=AUTO_RELEASE_NOTE))
+                except ledger.LedgerError as e:
+                    failed += 1
+                    logger.error(f"Escrow release failed for order {order_id}: {e}")
+    return released, failed
@@ -52,6 +52,10 @@ class Order(BaseModel):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Escrow auto-release scans delivered, held orders by delivery time
+            models.Index(fields=['escrow_status', 'order_status', 'actual_delivery'], name='order_escrow_release_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.order_number:
@@ -78,7 +82,8 @@ class OrderStatusHistory(BaseModel):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_history')
     status = models.CharField(max_length=30)
     notes = models.TextField(blank=True)
-    updated_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Empty for changes made by scheduled tasks
+    updated_by = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
     
     class Meta:
         ordering = ['-created_at']
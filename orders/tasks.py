@@ -0,0 +1,22 @@
+from celery import shared_task
+from .escrow import auto_release_enabled, release_due_escrow
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def release_escrow_payments():
+    """Release escrow for delivered orders past the hold window"""
+    try:
+        if not auto_release_enabled():
+            return "Escrow auto-release is disabled"
+        
+        released, failed = release_due_escrow()
+        if failed:
+            logger.error(f"Escrow auto-release failed for {failed} orders")
+        logger.info(f"Escrow auto-release settled {released} orders")
+        return f"Released {released} orders, {failed} failed"
+    except Exception as e:
+        logger.error(f"Error releasing escrow payments: {str(e)}")
+        return f"Error: {str(e)}"
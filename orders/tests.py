@@ -1,3 +1,230 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.models import Address, Category
+from custom_admin.stats import SIDEBAR_STATS_CACHE_KEY
+from products.models import Cart, CartItem, Product
+from vendors.models import Vendor
+from wallet import ledger
+from wallet.models import Wallet, WalletTransaction
+from .checkout import CheckoutError, place_orders
+from .escrow import settle_orders, vendor_share
+from .models import Order, OrderItem, OrderStatusHistory, Payment
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class VendorShareTest(SimpleTestCase):
+    def test_commission_is_deducted(self):
+        self.assertEqual(vendor_share(Decimal('1000.00'), 5.0), Decimal('950.00'))
+    
+    def test_vendor_rate_overrides_as_decimal(self):
+        self.assertEqual(vendor_share(Decimal('1000.00'), Decimal('12.50')), Decimal('875.00'))
+    
+    def test_rounds_to_paise(self):
+        self.assertEqual(vendor_share(Decimal('99.99'), 5.0), Decimal('94.99'))
+
+
+def _user(name):
+    return User.objects.create_user(username=name, email=f'{name}@example.com', password='password')
+
+
+def _vendor(name, commission_rate=None):
+    return Vendor.objects.create(
+        user=_user(name),
+        store_name=name,
+        business_email=f'{name}@example.com',
+        business_phone='9999999999',
+        store_address={},
+        commission_rate=commission_rate
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SettleOrdersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = _user('buyer')
+        self.wallet = Wallet.objects.get(user=self.buyer)
+        ledger.post(self.wallet.pk, 'recharge', '1000.00', description='Recharge')
+        self.vendor = _vendor('scrapyard')
+        self.other_vendor = _vendor('metalworks', commission_rate=Decimal('10.00'))
+    
+    def _held_order(self, vendor, amount, order_status='delivered'):
+        order = Order.objects.create(
+            user=self.buyer,
+            vendor=vendor,
+            delivery_address={},
+            subtotal=amount,
+            total_amount=amount,
+            order_status=order_status
+        )
+        hold = ledger.post(
+            self.wallet.pk, 'hold', amount, order_id=order.pk, description=f'Hold for {order.order_number}'
+        )
+        Payment.objects.create(order=order, wallet_transaction_id=hold.pk, amount=amount)
+        return order
+    
+    def _earnings(self, vendor):
+        return WalletTransaction.objects.filter(wallet__user=vendor.user, transaction_type='earning')
+    
+    def test_release_credits_vendor_and_settles_hold(self):
+        order = self._held_order(self.vendor, Decimal('200.00'))
+        
+        self.assertEqual(settle_orders([order.pk]), [order.pk])
+        
+        order.refresh_from_db()
+        self.assertEqual((order.escrow_status, order.order_status), ('released', 'completed'))
+        self.assertEqual(Payment.objects.get(order=order).escrow_status, 'released')
+        
+        buyer_wallet = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual(buyer_wallet.held_amount, Decimal('0.00'))
+        self.assertEqual(buyer_wallet.total_spent, Decimal('200.00'))
+        self.assertEqual(buyer_wallet.current_balance, Decimal('800.00'))
+        
+        earning = self._earnings(self.vendor).get()
+        self.assertEqual(earning.order_id, order.pk)
+        self.assertEqual(earning.amount, Decimal('190.00'))
+        self.assertEqual(Wallet.objects.get(user=self.vendor.user).current_balance, Decimal('190.00'))
+        
+        history = OrderStatusHistory.objects.get(order=order)
+        self.assertEqual(history.status, 'completed')
+        self.assertIsNone(history.updated_by)
+    
+    def test_mixed_batch(self):
+        first = self._held_order(self.vendor, Decimal('100.00'))
+        second = self._held_order(self.other_vendor, Decimal('300.00'))
+        shipped = self._held_order(self.vendor, Decimal('50.00'), order_status='shipped')
+        refunded = self._held_order(self.vendor, Decimal('40.00'))
+        ledger.post(self.wallet.pk, 'refund', '40.00', order_id=refunded.pk, description='Refund')
+        
+        released = settle_orders([first.pk, second.pk, shipped.pk, refunded.pk])
+        
+        self.assertCountEqual(released, [first.pk, second.pk, shipped.pk, refunded.pk])
+        # The refunded hold is not spent a second time
+        buyer_wallet = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual(buyer_wallet.held_amount, Decimal('0.00'))
+        self.assertEqual(buyer_wallet.total_spent, Decimal('450.00'))
+        self.assertEqual(buyer_wallet.current_balance, Decimal('550.00'))
+        
+        self.assertEqual(Wallet.objects.get(user=self.vendor.user).current_balance, Decimal('142.50'))
+        self.assertEqual(Wallet.objects.get(user=self.other_vendor.user).current_balance, Decimal('270.00'))
+        self.assertCountEqual(
+            self._earnings(self.vendor).values_list('order_id', flat=True), [first.pk, shipped.pk]
+        )
+        
+        statuses = dict(OrderStatusHistory.objects.values_list('order_id', 'status'))
+        self.assertEqual(statuses, {
+            first.pk: 'completed', second.pk: 'completed', shipped.pk: 'shipped', refunded.pk: 'completed'
+        })
+        shipped.refresh_from_db()
+        self.assertEqual((shipped.escrow_status, shipped.order_status), ('released', 'shipped'))
+    
+    def test_rerun_skips_released_orders(self):
+        order = self._held_order(self.vendor, Decimal('200.00'))
+        settle_orders([order.pk])
+        
+        self.assertEqual(settle_orders([order.pk]), [])
+        
+        self.assertEqual(self._earnings(self.vendor).count(), 1)
+        self.assertEqual(Wallet.objects.get(user=self.vendor.user).current_balance, Decimal('190.00'))
+        self.assertEqual(OrderStatusHistory.objects.filter(order=order).count(), 1)
+    
+    def test_pending_release_counter_is_invalidated(self):
+        order = self._held_order(self.vendor, Decimal('200.00'))
+        cache.set(SIDEBAR_STATS_CACHE_KEY.format('pending_release'), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            settle_orders([order.pk])
+        
+        self.assertIsNone(cache.get(SIDEBAR_STATS_CACHE_KEY.format('pending_release')))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PlaceOrdersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = _user('buyer')
+        self.wallet = Wallet.objects.get(user=self.buyer)
+        ledger.post(self.wallet.pk, 'recharge', '500.00', description='Recharge')
+        self.address = Address(
+            user=self.buyer,
+            recipient_name='Buyer',
+            recipient_phone='+919999999999',
+            street_address='1 Market Road',
+            city='Delhi',
+            pincode='110001',
+            state='Delhi'
+        )
+        self.cart = Cart.objects.create(user=self.buyer)
+        self.category = Category.objects.create(name='Metal Scrap')
+        self.vendor = _vendor('scrapyard')
+        self.other_vendor = _vendor('metalworks')
+    
+    def _carted(self, vendor, price, quantity, stock=100):
+        product = Product.objects.create(
+            vendor=vendor,
+            category=self.category,
+            title=f'Scrap {Product.objects.count()}',
+            description='Sorted scrap',
+            price=Decimal(price),
+            stock_quantity=stock,
+            sku=f'SKU-{Product.objects.count()}'
+        )
+        CartItem.objects.create(cart=self.cart, product=product, quantity=quantity)
+        return product
+    
+    def assertNothingWritten(self, products):
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(WalletTransaction.objects.filter(transaction_type='hold').exists())
+        wallet = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual((wallet.current_balance, wallet.held_amount), (Decimal('500.00'), Decimal('0.00')))
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), len(products))
+        for product, stock in products.items():
+            self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, stock)
+    
+    def test_splits_cart_into_one_order_per_vendor(self):
+        copper = self._carted(self.vendor, '100.00', 2)
+        brass = self._carted(self.vendor, '50.00', 1)
+        steel = self._carted(self.other_vendor, '30.00', 3)
+        
+        orders, _ = place_orders(self.buyer, self.address)
+        
+        totals = {order.vendor_id: order.total_amount for order in orders}
+        self.assertEqual(totals, {self.vendor.pk: Decimal('250.00'), self.other_vendor.pk: Decimal('90.00')})
+        self.assertEqual(OrderItem.objects.filter(order__vendor=self.vendor).count(), 2)
+        
+        holds = dict(WalletTransaction.objects.filter(transaction_type='hold').values_list('order_id', 'amount'))
+        self.assertEqual(holds, {order.pk: order.total_amount for order in orders})
+        wallet = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual((wallet.current_balance, wallet.held_amount), (Decimal('160.00'), Decimal('340.00')))
+        
+        self.assertEqual(
+            [Product.objects.get(pk=product.pk).stock_quantity for product in (copper, brass, steel)],
+            [98, 99, 97]
+        )
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+    
+    def test_insufficient_balance_rolls_back(self):
+        copper = self._carted(self.vendor, '300.00', 1)
+        steel = self._carted(self.other_vendor, '250.00', 1)
+        
+        with self.assertRaises(CheckoutError):
+            place_orders(self.buyer, self.address)
+        
+        self.assertNothingWritten({copper: 100, steel: 100})
+    
+    def test_out_of_stock_rolls_back(self):
+        copper = self._carted(self.vendor, '10.00', 2)
+        steel = self._carted(self.other_vendor, '10.00', 3, stock=2)
+        
+        with self.assertRaisesMessage(CheckoutError, steel.title):
+            place_orders(self.buyer, self.address)
+        
+        self.assertNothingWritten({copper: 100, steel: 2})
@@ -3,12 +3,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
 from django.core.paginator import Paginator
+from django.utils import timezone
 
 from django.views.decorators.http import require_POST
 
 from .models import Order, OrderItem
+from .checkout import CheckoutError, place_orders
 from products.models import Cart
-from wallet.models import Wallet, WalletTransaction
+from wallet import ledger
 from core.models import Address
 
 
@@ -70,100 +72,22 @@ def create_order(request):
             messages.error(request, 'Invalid delivery address')
             return redirect('orders:create')
         
-        # Check wallet balance
-        wallet = Wallet.objects.get(user=request.user)
-        if wallet.current_balance < cart.total_amount:
-            messages.error(request, 'Insufficient wallet balance!')
+        try:
+            orders, coupon_message = place_orders(request.user, address, notes, coupon_code)
+        except CheckoutError as e:
+            messages.error(request, str(e))
             return redirect('products:cart')
-
-        with transaction.atomic():
-            # Create order for each vendor
-            vendor_orders = {}
-            for item in cart_items:
-                vendor = item.product.vendor
-                if vendor not in vendor_orders:
-                    order = Order.objects.create(
-                        user=request.user,
-                        vendor=vendor,
-                        delivery_address={
-                            'name': address.recipient_name,
-                            'phone': address.recipient_phone,
-                            'address': address.street_address,
-                            'city': address.city,
-                            'state': address.state,
-                            'postal_code': address.pincode,
-                            'address_type': address.address_type
-                        },
-                        subtotal=0,
-                        total_amount=0,
-                        notes=notes,
-                        payment_method='wallet',
-                        payment_status='paid',
-                        order_status='placed',
-                        escrow_status='held'
-                    )
-                    vendor_orders[vendor] = order
-                
-                # Create order item
-                OrderItem.objects.create(
-                    order=vendor_orders[vendor],
-                    product=item.product,
-                    quantity=item.quantity,
-                    unit_price=item.product.price,
-                    total_price=item.total_price,
-                    product_snapshot={
-                        'title': item.product.title,
-                        'description': item.product.description,
-                        'price': float(item.product.price),
-                        'category': item.product.category.name if item.product.category else None,
-                    }
-                )
-                
-                # Update order totals
-                vendor_orders[vendor].subtotal += item.total_price
-                vendor_orders[vendor].total_amount += item.total_price
-            
-            # Save updated orders and process payments
-            for order in vendor_orders.values():
-                # Apply coupon if provided
-                if coupon_code:
-                    try:
-                        from coupons.views import apply_coupon_to_order
-                        success, message = apply_coupon_to_order(order, coupon_code, request.user)
-                        if success:
-                            messages.success(request, message)
-                    except:
-                        pass
-                
-                order.save()
-                
-                # Hold amount in wallet
-                wallet.current_balance -= order.total_amount
-                wallet.held_amount += order.total_amount
-                wallet.save()
-                
-                # Create wallet transaction
-                WalletTransaction.objects.create(
-                    wallet=wallet,
-                    transaction_type='hold',
-                    amount=order.total_amount,
-                    order_id=str(order.id),
-                    status='completed',
-                    description=f'Payment held for order #{order.order_number}',
-                    balance_before=wallet.current_balance + order.total_amount,
-                    balance_after=wallet.current_balance
-                )
-            
-            # Clear cart
-            cart_items.delete()
-            
-            if len(vendor_orders) == 1:
-                order = list(vendor_orders.values())[0]
-                messages.success(request, f'Order #{order.order_number} placed successfully!')
-                return redirect('orders:detail', order_id=order.id)
-            else:
-                messages.success(request, f'{len(vendor_orders)} orders placed successfully!')
-                return redirect('orders:list')
+        
+        if coupon_message:
+            messages.success(request, coupon_message)
+        
+        if len(orders) == 1:
+            order = orders[0]
+            messages.success(request, f'Order #{order.order_number} placed successfully!')
+            return redirect('orders:detail', order_id=order.id)
+        else:
+            messages.success(request, f'{len(orders)} orders placed successfully!')
+            return redirect('orders:list')
         
     except Cart.DoesNotExist:
         messages.error(request, 'Your cart is empty!')
@@ -182,6 +106,9 @@ def update_order_status(request, order_id):
     
     if new_status in dict(Order.ORDER_STATUS_CHOICES):
         order.order_status = new_status
+        if new_status == 'delivered' and not order.actual_delivery:
+            # Starts the escrow hold window
+            order.actual_delivery = timezone.now()
         order.save()
         messages.success(request, f'Order status updated to {order.get_order_status_display()}')
     else:
@@ -194,30 +121,24 @@ def update_order_status(request, order_id):
 @require_POST
 def cancel_order(request, order_id):
     """Cancel order"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
-    
-    if order.order_status in ['placed', 'confirmed']:
-        order.order_status = 'cancelled'
-        order.save()
-        
-        # Release held amount back to wallet
-        wallet = request.user.wallet
-        wallet.current_balance += order.total_amount
-        wallet.held_amount -= order.total_amount
-        wallet.save()
-        
-        # Create refund transaction
-        WalletTransaction.objects.create(
-            wallet=wallet,
-            transaction_type='refund',
-            amount=order.total_amount,
-            order_id=str(order.id),
-            status='completed',
-            description=f'Refund for cancelled order #{order.order_number}',
-            balance_before=wallet.current_balance - order.total_amount,
-            balance_after=wallet.current_balance
-        )
+    with transaction.atomic():
+        # Row lock so a double submit cannot refund the same order twice
+        order = get_object_or_404(Order.objects.select_for_update(), id=order_id, user=request.user)
+        cancellable = order.order_status in ['placed', 'confirmed'] and order.escrow_status == 'held'
         
+        if cancellable:
+            order.order_status = 'cancelled'
+            order.save()
+            
+            # Return the held amount to the wallet
+            if order.total_amount > 0:
+                ledger.post(
+                    request.user.wallet.pk, 'refund', order.total_amount,
+                    order_id=order.id,
+                    description=f'Refund for cancelled order #{order.order_number}'
+                )
+    
+    if cancellable:
         messages.success(request, 'Order cancelled successfully')
     else:
         messages.error(request, 'Order cannot be cancelled at this stage')
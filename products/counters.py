@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from core.utils import get_redis_client
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+VIEW_BUFFER_KEY = 'product_views_buffer'
+FLUSH_CHUNK_SIZE = 500
+# Local buffers are flushed inline since a Celery worker cannot see them
+LOCAL_FLUSH_INTERVAL = 60
+LOCAL_FLUSH_THRESHOLD = 1000
+
+
+class RedisViewBuffer:
+    """View increments accumulated in a Redis hash shared by all workers"""
+
+    def __init__(self, client):
+        self.client = client
+        self.key = cache.make_key(VIEW_BUFFER_KEY)
+
+    def incr(self, product_id):
+        self.client.hincrby(self.key, str(product_id), 1)
+
+    def drain(self):
+        # Swap the hash out atomically so increments arriving mid-flush are kept
+        flushing_key = f'{self.key}:flushing'
+        # A leftover flushing hash means the previous flush died; retry it first
+        if not self.client.exists(flushing_key):
+            try:
+                self.client.rename(self.key, flushing_key)
+            except Exception:
+                # Nothing buffered since the last flush
+                return {}
+        pending = self.client.hgetall(flushing_key)
+        return {key.decode(): int(value) for key, value in pending.items()}
+
+    def ack(self):
+        self.client.delete(f'{self.key}:flushing')
+
+
+class LocalViewBuffer:
+    """Per-process fallback buffer for caches without Redis"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_flush = time.monotonic()
+
+    def incr(self, product_id):
+        with self.lock:
+            key = str(product_id)
+            self.pending[key] = self.pending.get(key, 0) + 1
+            due = (
+                len(self.pending) >= LOCAL_FLUSH_THRESHOLD or
+                time.monotonic() - self.last_flush >= LOCAL_FLUSH_INTERVAL
+            )
+        if due:
+            flush_view_counts()
+
+    def drain(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        return pending
+
+    def ack(self):
+        pass
+
+
+_local_buffer = LocalViewBuffer()
+
+
+def get_view_buffer():
+    client = get_redis_client()
+    if client is not None:
+        return RedisViewBuffer(client)
+    return _local_buffer
+
+
+def record_product_view(product_id):
+    """Buffer a product page view; flush_view_counts writes it later"""
+    try:
+        get_view_buffer().incr(product_id)
+    except Exception as e:
+        logger.warning(f"Failed to buffer product view for {product_id}: {e}")
+
+
+def flush_view_counts():
+    """Apply buffered view increments with one UPDATE per chunk of products"""
+    buffer = get_view_buffer()
+    pending = buffer.drain()
+    items = list(pending.items())
+    # All chunks commit together so a retried flush never double counts
+    with transaction.atomic():
+        for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+            chunk = items[start:start + FLUSH_CHUNK_SIZE]
+            increment = Case(
+                *[When(id=product_id, then=Value(count)) for product_id, count in chunk],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            Product.objects.filter(id__in=[product_id for product_id, _ in chunk]).update(
+                views_count=F('views_count') + increment
+            )
+    buffer.ack()
+    return sum(pending.values())
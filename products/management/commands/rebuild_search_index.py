@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from products.models import Product
+from products.search import get_backend, index_products
+
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        
+        # Recreate the index structures from scratch
+        with connection.cursor() as cursor:
+            backend.teardown(cursor)
+            backend.setup(cursor)
+        
+        count = 0
+        batch = []
+        products = Product.objects.select_related('category')
+        for product in products.iterator(chunk_size=CHUNK_SIZE):
+            batch.append(product)
+            if len(batch) >= CHUNK_SIZE:
+                index_products(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            index_products(batch)
+            count += len(batch)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {count} products using {backend.__class__.__name__}')
+        )
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from products.search import get_backend
+    
+    backend = get_backend(schema_editor.connection)
+    with schema_editor.connection.cursor() as cursor:
+        backend.setup(cursor)
+    
+    # Backfill existing products; new ones are indexed by signals
+    Product = apps.get_model('products', 'Product')
+    products = Product.objects.using(schema_editor.connection.alias).select_related('category')
+    backend.index(products.iterator(chunk_size=500))
+
+
+def drop_search_index(apps, schema_editor):
+    from products.search import get_backend
+    
+    backend = get_backend(schema_editor.connection)
+    with schema_editor.connection.cursor() as cursor:
+        backend.teardown(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_cart_cartitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
+from django.core.cache import cache
+from django.utils.functional import cached_property
 from django.contrib.auth import get_user_model
 from core.models import BaseModel, Category
 from vendors.models import Vendor
@@ -49,21 +53,58 @@ class ProductImage(BaseModel):
     image = models.ImageField(upload_to='products/images/')
     alt_text = models.CharField(max_length=255, blank=True)
     is_primary = models.BooleanField(default=False)
+    # Resized WebP/JPEG derivatives written by products.tasks.process_product_image
+    variants = models.JSONField(default=dict, blank=True)
     
     def __str__(self):
         return f"{self.product.title} - Image"
 
 
 class Cart(BaseModel):
+    SUMMARY_CACHE_KEY = 'cart_summary_{}'
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     
+    @classmethod
+    def compute_summary(cls, user_id):
+        """Item count and total for a user's cart in a single aggregate query"""
+        summary = CartItem.objects.filter(cart__user_id=user_id).aggregate(
+            total_items=models.Sum('quantity'),
+            total_amount=models.Sum(
+                models.F('quantity') * models.F('product__price'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+        return {
+            'total_items': summary['total_items'] or 0,
+            'total_amount': summary['total_amount'] or Decimal('0.00'),
+        }
+    
+    @classmethod
+    def get_cached_summary(cls, user_id):
+        """Cart summary cached until a CartItem or a carted product changes"""
+        cache_key = cls.SUMMARY_CACHE_KEY.format(user_id)
+        summary = cache.get(cache_key)
+        if summary is None:
+            summary = cls.compute_summary(user_id)
+            cache.set(cache_key, summary, None)
+        return summary
+    
+    @classmethod
+    def invalidate_cache(cls, *user_ids):
+        cache.delete_many([cls.SUMMARY_CACHE_KEY.format(user_id) for user_id in user_ids])
+    
+    @cached_property
+    def summary(self):
+        return self.get_cached_summary(self.user_id)
+    
     @property
     def total_items(self):
-        return self.items.aggregate(total=models.Sum('quantity'))['total'] or 0
+        return self.summary['total_items']
     
     @property
     def total_amount(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.summary['total_amount']
     
     def __str__(self):
         return f"{self.user.username}'s Cart"
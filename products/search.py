@@ -0,0 +1,339 @@
+import bisect
+import difflib
+import logging
+import re
+import uuid
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Q, When
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SEARCH_INDEX_TABLE = 'products_search_index'
+SEARCH_VOCAB_TABLE = 'products_search_vocab'
+SEARCH_RESULT_LIMIT = 500
+MAX_QUERY_TERMS = 8
+VOCABULARY_CACHE_KEY = 'products_search_vocabulary'
+VOCABULARY_CACHE_TIMEOUT = 60 * 60
+TYPO_CUTOFF = 0.75
+
+
+def tokenize(text):
+    """Split text into lowercase search terms"""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def build_document(product):
+    """Flatten the searchable fields of a product"""
+    tags = product.tags if isinstance(product.tags, list) else []
+    category = product.category if product.category_id else None
+    return {
+        'title': product.title or '',
+        'description': product.description or '',
+        'tags': ' '.join(str(tag) for tag in tags),
+        'category': category.name if category else '',
+    }
+
+
+def candidate_filter(candidates, column='product_id'):
+    """SQL restricting `column` to a product queryset's ids, with its params.
+
+    Lets the ranked query apply page filters (active, category, nearby)
+    before the result limit rather than after it.
+    """
+    if candidates is None:
+        return '', []
+    sql, params = candidates.order_by().values('pk').query.sql_with_params()
+    return f' AND {column} IN ({sql})', list(params)
+
+
+class BaseSearchBackend:
+    """Inverted index over product title, description, tags and category"""
+
+    def __init__(self, connection=connection):
+        # Migrations pass schema_editor.connection so --database is honoured
+        self.connection = connection
+
+    def setup(self, cursor):
+        pass
+
+    def teardown(self, cursor):
+        pass
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def search(self, terms, limit=SEARCH_RESULT_LIMIT, candidates=None):
+        """Return product ids ranked by relevance, or None if unsupported.
+
+        `candidates` is an optional Product queryset the results must be in.
+        """
+        return None
+
+    def vocabulary(self):
+        return []
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 index, keyed by a rowid derived from the product UUID"""
+
+    # bm25 weights for (product_id, title, description, tags, category)
+    COLUMN_WEIGHTS = (0.0, 10.0, 1.0, 4.0, 2.0)
+
+    @staticmethod
+    def rowid_for(product_id):
+        if not isinstance(product_id, uuid.UUID):
+            product_id = uuid.UUID(str(product_id))
+        # Top 63 bits keep the rowid a positive signed 64-bit integer
+        return product_id.int >> 65
+
+    def setup(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} USING fts5("
+            "product_id UNINDEXED, title, description, tags, category, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_VOCAB_TABLE} "
+            f"USING fts5vocab({SEARCH_INDEX_TABLE}, row)"
+        )
+
+    def teardown(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_VOCAB_TABLE}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_INDEX_TABLE}")
+
+    def index(self, products):
+        rows = []
+        for product in products:
+            document = build_document(product)
+            rows.append((
+                self.rowid_for(product.pk),
+                product.pk.hex,
+                document['title'],
+                document['description'],
+                document['tags'],
+                document['category'],
+            ))
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = %s",
+                [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_INDEX_TABLE} "
+                "(rowid, product_id, title, description, tags, category) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                rows
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = %s",
+                [(self.rowid_for(pk),) for pk in product_ids]
+            )
+
+    def search(self, terms, limit=SEARCH_RESULT_LIMIT, candidates=None):
+        # Terms are \w+ tokens, so quoting them is enough to escape FTS syntax
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in self.COLUMN_WEIGHTS)
+        # product_id holds uuid hex, the same form SQLite stores UUIDField in
+        restrict, params = candidate_filter(candidates)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {SEARCH_INDEX_TABLE} "
+                f"WHERE {SEARCH_INDEX_TABLE} MATCH %s{restrict} "
+                f"ORDER BY bm25({SEARCH_INDEX_TABLE}, {weights}) LIMIT %s",
+                [match, *params, limit]
+            )
+            return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+    def vocabulary(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT term FROM {SEARCH_VOCAB_TABLE} ORDER BY term")
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresFTSBackend(BaseSearchBackend):
+    """PostgreSQL tsvector index with a GIN index and weighted ranking"""
+
+    DOCUMENT_SQL = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'D')"
+    )
+
+    def setup(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} ("
+            "product_id uuid PRIMARY KEY REFERENCES products_product (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_TABLE}_document_idx "
+            f"ON {SEARCH_INDEX_TABLE} USING GIN (document)"
+        )
+
+    def teardown(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_INDEX_TABLE}")
+
+    def index(self, products):
+        rows = []
+        for product in products:
+            document = build_document(product)
+            rows.append((
+                product.pk,
+                document['title'],
+                document['tags'],
+                document['category'],
+                document['description'],
+            ))
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_INDEX_TABLE} (product_id, document) "
+                f"VALUES (%s, {self.DOCUMENT_SQL}) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE product_id = ANY(%s)",
+                [list(product_ids)]
+            )
+
+    def search(self, terms, limit=SEARCH_RESULT_LIMIT, candidates=None):
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        restrict, params = candidate_filter(candidates)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {SEARCH_INDEX_TABLE}, "
+                "to_tsquery('simple', %s) query "
+                f"WHERE document @@ query{restrict} "
+                "ORDER BY ts_rank_cd(document, query) DESC LIMIT %s",
+                [tsquery, *params, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def vocabulary(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT word FROM ts_stat('SELECT document FROM {SEARCH_INDEX_TABLE}') "
+                "ORDER BY word"
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresFTSBackend,
+}
+
+
+def get_backend(connection=connection):
+    """Search backend for the given (or default) database connection"""
+    backend_class = BACKENDS.get(connection.vendor, BaseSearchBackend)
+    return backend_class(connection)
+
+
+def get_vocabulary(backend):
+    vocabulary = cache.get(VOCABULARY_CACHE_KEY)
+    if vocabulary is None:
+        vocabulary = backend.vocabulary()
+        cache.set(VOCABULARY_CACHE_KEY, vocabulary, VOCABULARY_CACHE_TIMEOUT)
+    return vocabulary
+
+
+def correct_terms(terms, vocabulary):
+    """Replace terms that match nothing in the index with their closest spelling"""
+    corrected = []
+    for term in terms:
+        position = bisect.bisect_left(vocabulary, term)
+        if position < len(vocabulary) and vocabulary[position].startswith(term):
+            corrected.append(term)
+            continue
+        # Only compare against terms sharing the first letter and of similar length
+        start = bisect.bisect_left(vocabulary, term[0])
+        end = bisect.bisect_left(vocabulary, chr(ord(term[0]) + 1))
+        candidates = [
+            word for word in vocabulary[start:end]
+            if abs(len(word) - len(term)) <= 2
+        ]
+        matches = difflib.get_close_matches(term, candidates, n=1, cutoff=TYPO_CUTOFF)
+        corrected.append(matches[0] if matches else term)
+    return corrected
+
+
+def index_products(products):
+    try:
+        # A savepoint, so on PostgreSQL a failed statement does not abort
+        # the caller's transaction along with the index update
+        with transaction.atomic():
+            get_backend().index(products)
+        cache.delete(VOCABULARY_CACHE_KEY)
+    except Exception as e:
+        logger.error(f"Failed to index products: {str(e)}")
+
+
+def remove_products(product_ids):
+    try:
+        with transaction.atomic():
+            get_backend().remove(product_ids)
+        cache.delete(VOCABULARY_CACHE_KEY)
+    except Exception as e:
+        logger.error(f"Failed to remove products from search index: {str(e)}")
+
+
+def search_products(queryset, query):
+    """Filter a product queryset by full-text query, annotated with `search_rank`"""
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return queryset
+
+    backend = get_backend()
+    try:
+        with transaction.atomic():
+            # Ranked within the filtered queryset, so page filters cannot empty the capped result
+            product_ids = backend.search(terms, candidates=queryset)
+            if product_ids == []:
+                corrected = correct_terms(terms, get_vocabulary(backend))
+                if corrected != terms:
+                    product_ids = backend.search(corrected, candidates=queryset)
+    except Exception as e:
+        logger.error(f"Search backend failed, falling back to LIKE search: {str(e)}")
+        product_ids = None
+
+    if product_ids is None:
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term) |
+                Q(description__icontains=term) |
+                Q(category__name__icontains=term)
+            )
+        return queryset.filter(condition).annotate(search_rank=Case(
+            When(title__icontains=terms[0], then=0),
+            default=1,
+            output_field=IntegerField(),
+        ))
+
+    if not product_ids:
+        return queryset.none()
+
+    return queryset.filter(id__in=product_ids).annotate(search_rank=Case(
+        *[When(id=product_id, then=position) for position, product_id in enumerate(product_ids)],
+        output_field=IntegerField(),
+    ))
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import Category
+from .models import Product, ProductImage, Cart, CartItem
+from .search import index_products, remove_products
+
+REINDEX_CHUNK_SIZE = 500
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Keep the search index in step with product edits"""
+    index_products([instance])
+
+
+@receiver(post_save, sender=Product)
+def invalidate_carted_product(sender, instance, created, **kwargs):
+    """Cart summaries price items live, so a product edit stales every cart holding it"""
+    if created:
+        return
+    user_ids = CartItem.objects.filter(product=instance).values_list('cart__user_id', flat=True)
+    Cart.invalidate_cache(*user_ids)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Drop deleted products from the search index"""
+    remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    """Category names are indexed, so renames touch every product in it"""
+    if created:
+        return
+    
+    batch = []
+    products = Product.objects.filter(category=instance).select_related('category')
+    for product in products.iterator(chunk_size=REINDEX_CHUNK_SIZE):
+        batch.append(product)
+        if len(batch) >= REINDEX_CHUNK_SIZE:
+            index_products(batch)
+            batch = []
+    if batch:
+        index_products(batch)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    """Cart totals are cached per user"""
+    if CartItem.cart.is_cached(instance):
+        user_id = instance.cart.user_id
+    else:
+        # Just the owner, rather than loading the whole cart for every item write
+        user_id = Cart.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        Cart.invalidate_cache(user_id)
+
+
+@receiver(post_save, sender=ProductImage)
+def queue_product_image_processing(sender, instance, **kwargs):
+    """Resize new or replaced uploads in the background"""
+    if instance.image and instance.variants.get('source') != instance.image.name:
+        from .tasks import process_product_image
+        transaction.on_commit(lambda: process_product_image.delay(str(instance.id)))
@@ -0,0 +1,39 @@
+from celery import shared_task
+from .counters import flush_view_counts
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_product_view_counts():
+    """Write buffered product page views to the database"""
+    try:
+        flushed = flush_view_counts()
+        if flushed:
+            logger.info(f"Flushed {flushed} buffered product views")
+        return flushed
+    except Exception as e:
+        logger.error(f"Error flushing product view counts: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def process_product_image(image_id):
+    """Generate resized variants for an uploaded product image"""
+    from core.images import generate_variants
+    from .models import ProductImage
+    
+    try:
+        product_image = ProductImage.objects.get(id=image_id)
+        name = product_image.image.name
+        variants = generate_variants(name)
+        # update() skips post_save, so this does not queue another run
+        ProductImage.objects.filter(id=image_id).update(variants={'source': name, **variants})
+        return len(variants)
+    except ProductImage.DoesNotExist:
+        logger.warning(f"Product image {image_id} not found for processing")
+        return 0
+    except Exception as e:
+        logger.error(f"Error processing product image {image_id}: {str(e)}")
+        return f"Error: {str(e)}"
@@ -1,3 +1,26 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .search import PostgresFTSBackend, correct_terms, get_backend, tokenize
+
+
+class SearchHelpersTest(SimpleTestCase):
+    def test_tokenize_lowercases_and_strips_punctuation(self):
+        self.assertEqual(tokenize('Copper-Wire, 10kg!'), ['copper', 'wire', '10kg'])
+    
+    def test_correct_terms_keeps_known_prefixes(self):
+        vocabulary = ['aluminium', 'copper', 'wire']
+        self.assertEqual(correct_terms(['cop', 'wi'], vocabulary), ['cop', 'wi'])
+    
+    def test_correct_terms_fixes_typos(self):
+        vocabulary = ['aluminium', 'copper', 'plastic', 'wire']
+        self.assertEqual(correct_terms(['coper', 'plastik'], vocabulary), ['copper', 'plastic'])
+    
+    def test_backend_runs_on_the_connection_it_was_given(self):
+        other = mock.MagicMock(vendor='postgresql')
+        backend = get_backend(other)
+        
+        self.assertIsInstance(backend, PostgresFTSBackend)
+        backend.remove(['a'])
+        other.cursor.assert_called_once_with()
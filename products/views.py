@@ -2,30 +2,55 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Prefetch
 
 from django.views.decorators.http import require_http_methods
 from .models import Product, ProductImage, Wishlist, Cart, CartItem
+from .search import search_products
+from .counters import record_product_view
 from core.models import Category
+from core.geo import get_search_radius_km, get_user_location, vendors_within_radius
 
 
 def products_list(request):
     """Products listing with filters"""
-    products = Product.objects.filter(is_active=True).select_related('vendor', 'category')
+    products = Product.objects.filter(is_active=True).select_related('vendor', 'category').prefetch_related(
+        Prefetch('product_images', queryset=ProductImage.objects.order_by('-is_primary', 'created_at'))
+    )
     categories = Category.objects.filter(is_active=True)
     
     # Filters
     category_id = request.GET.get('category')
     search_query = request.GET.get('search')
-    sort_by = request.GET.get('sort', 'created_at')
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'created_at')
+    nearby = request.GET.get('nearby') == '1'
+    
+    # Hyperlocal radius filter around the user's default address; the
+    # lookups only run when the filter is on
+    search_radius = None
+    has_location = None
+    if nearby:
+        search_radius = get_search_radius_km()
+        user_location = get_user_location(request.user)
+        has_location = user_location is not None
+        if user_location:
+            try:
+                radius = min(float(request.GET.get('radius', search_radius)), search_radius)
+            except ValueError:
+                radius = search_radius
+            nearby_vendors = vendors_within_radius(user_location[0], user_location[1], radius)
+            products = products.filter(vendor_id__in=list(nearby_vendors))
     
     if category_id:
         products = products.filter(category_id=category_id)
     
     if search_query:
-        products = products.filter(title__icontains=search_query)
+        products = search_products(products, search_query)
     
     # Sorting
-    if sort_by == 'price_low':
+    if sort_by == 'relevance' and search_query:
+        products = products.order_by('search_rank', '-created_at')
+    elif sort_by == 'price_low':
         products = products.order_by('price')
     elif sort_by == 'price_high':
         products = products.order_by('-price')
@@ -45,6 +70,9 @@ def products_list(request):
         'selected_category': category_id,
         'search_query': search_query,
         'sort_by': sort_by,
+        'nearby': nearby,
+        'search_radius': search_radius,
+        'has_location': has_location,
     }
     return render(request, 'products/list.html', context)
 
@@ -53,9 +81,9 @@ def product_detail(request, product_id):
     """Product detail view"""
     product = get_object_or_404(Product, id=product_id, is_active=True)
     
-    # Increment view count
+    # Buffer the view; flush_product_view_counts applies it in bulk
+    record_product_view(product.id)
     product.views_count += 1
-    product.save(update_fields=['views_count'])
     
     # Check if in wishlist
     in_wishlist = False
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+
+def populate_vendor_locations(apps, schema_editor):
+    from core.geo import geohash_encode, to_float
+    
+    Vendor = apps.get_model('vendors', 'Vendor')
+    for vendor in Vendor.objects.all().iterator():
+        address = vendor.store_address if isinstance(vendor.store_address, dict) else {}
+        latitude = to_float(address.get('latitude'))
+        longitude = to_float(address.get('longitude'))
+        if latitude is None or longitude is None:
+            continue
+        vendor.latitude = round(latitude, 8)
+        vendor.longitude = round(longitude, 8)
+        vendor.geohash = geohash_encode(latitude, longitude)
+        vendor.save(update_fields=['latitude', 'longitude', 'geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['latitude', 'longitude'], name='vendor_location_idx'),
+        ),
+        migrations.RunPython(populate_vendor_locations, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import BaseModel
+from core.geo import geohash_encode, to_float
 
 User = get_user_model()
 
@@ -25,10 +26,36 @@ class Vendor(BaseModel):
     kyc_rejection_reason = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
     commission_rate = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    # Store location, mirrored from store_address for radius queries
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='vendor_location_idx'),
+        ]
     
     def __str__(self):
         return self.store_name
     
+    def save(self, *args, **kwargs):
+        address = self.store_address if isinstance(self.store_address, dict) else {}
+        latitude = to_float(address.get('latitude'))
+        longitude = to_float(address.get('longitude'))
+        if latitude is not None and longitude is not None:
+            self.latitude = round(latitude, 8)
+            self.longitude = round(longitude, 8)
+            self.geohash = geohash_encode(latitude, longitude)
+        else:
+            self.latitude = self.longitude = None
+            self.geohash = ''
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'store_address' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'latitude', 'longitude', 'geohash'}
+        super().save(*args, **kwargs)
+    
     def can_sell(self):
         """Check if vendor can sell products"""
         return self.kyc_status == 'approved' and self.is_active
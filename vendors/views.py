@@ -71,6 +71,8 @@ def vendor_register_form(request):
             'city': request.POST.get('city'),
             'state': request.POST.get('state'),
             'pincode': request.POST.get('pincode'),
+            'latitude': request.POST.get('latitude') or None,
+            'longitude': request.POST.get('longitude') or None,
         }
         
         try:
@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import Wallet, WalletTransaction
+from .models import Wallet, WalletTransaction, WalletCheckpoint, PaymentEvent
 
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
-    list_display = ('user', 'current_balance', 'total_recharged', 'total_spent', 'held_amount', 'is_active')
+    list_display = ('user', 'current_balance', 'total_recharged', 'total_earned', 'total_spent', 'held_amount', 'is_active')
     list_filter = ('is_active', 'created_at')
     search_fields = ('user__username', 'user__email')
     readonly_fields = ('created_at', 'updated_at')
@@ -14,5 +14,24 @@ class WalletAdmin(admin.ModelAdmin):
 class WalletTransactionAdmin(admin.ModelAdmin):
     list_display = ('wallet', 'transaction_type', 'amount', 'status', 'created_at')
     list_filter = ('transaction_type', 'status', 'created_at')
-    search_fields = ('wallet__user__username', 'description')
+    search_fields = ('wallet__user__username', 'description', 'razorpay_payment_id')
     readonly_fields = ('created_at', 'updated_at')
+    
+    def has_delete_permission(self, request, obj=None):
+        # The ledger is append-only; corrections are new postings
+        return False
+
+
+@admin.register(WalletCheckpoint)
+class WalletCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('wallet', 'cutoff', 'current_balance', 'held_amount', 'total_recharged', 'total_earned', 'total_spent')
+    search_fields = ('wallet__user__username',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'payment_id', 'status', 'created_at')
+    list_filter = ('event_type', 'status', 'created_at')
+    search_fields = ('event_id', 'payment_id')
+    readonly_fields = ('created_at', 'updated_at', 'processed_at')
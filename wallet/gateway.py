@@ -0,0 +1,212 @@
+import hashlib
+import hmac
+import logging
+import random
+import time
+import uuid
+from functools import lru_cache
+
+import razorpay
+import requests
+from razorpay.errors import BadRequestError, GatewayError as RazorpayGatewayError, ServerError
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+DEFAULT_POOL_SIZE = 20
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+
+# Failures within BREAKER_WINDOW seconds that open the circuit, and how long
+# it stays open; the state lives in the shared cache so every worker sees it
+BREAKER_THRESHOLD = 5
+BREAKER_WINDOW = 60
+BREAKER_COOLDOWN = 30
+
+
+class GatewayError(Exception):
+    """The gateway rejected or failed a call; the message is safe to show the user"""
+
+
+class GatewayUnavailable(GatewayError):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling a failing gateway for a cooldown instead of pinning workers on it"""
+
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, window=BREAKER_WINDOW, cooldown=BREAKER_COOLDOWN):
+        self.failures_key = f'circuit_{name}_failures'
+        self.open_key = f'circuit_{name}_open'
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+
+    def is_open(self):
+        return cache.get(self.open_key) is not None
+
+    def record_success(self):
+        cache.delete(self.failures_key)
+
+    def record_failure(self):
+        cache.add(self.failures_key, 0, self.window)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(self.failures_key, 1, self.window)
+            failures = 1
+        if failures >= self.threshold:
+            cache.set(self.open_key, True, self.cooldown)
+            cache.delete(self.failures_key)
+            logger.warning(f"Circuit {self.open_key} opened after {failures} failures")
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff, so retrying workers do not stampede"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class _PooledSession(requests.Session):
+    """Keep-alive connection pool with a default timeout on every request"""
+
+    def __init__(self, timeout, pool_size):
+        super().__init__()
+        self.timeout = timeout
+        self.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class BaseGateway:
+    """Payment gateway calls made by the wallet; amounts are in paise"""
+
+    def create_order(self, amount_paise, notes=None):
+        raise NotImplementedError
+
+    def capture_payment(self, payment_id, amount_paise):
+        raise NotImplementedError
+
+
+class RazorpayGateway(BaseGateway):
+    def __init__(self, key_id, key_secret, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+        self.client = razorpay.Client(session=_PooledSession(timeout, pool_size), auth=(key_id, key_secret))
+        self.breaker = CircuitBreaker('razorpay')
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            getattr(settings, 'RAZORPAY_KEY_ID', 'rzp_test_key'),
+            getattr(settings, 'RAZORPAY_KEY_SECRET', 'rzp_test_secret'),
+            timeout=getattr(settings, 'PAYMENT_GATEWAY_TIMEOUT', DEFAULT_TIMEOUT),
+            pool_size=getattr(settings, 'PAYMENT_GATEWAY_POOL_SIZE', DEFAULT_POOL_SIZE),
+        )
+
+    def _call(self, func, *args, idempotent=False):
+        """Run a client call with retries and the circuit breaker.
+
+        Connection failures are retried for every call; timeouts and 5xx
+        responses only for idempotent ones, since the first attempt may
+        have gone through.
+        """
+        if self.breaker.is_open():
+            raise GatewayUnavailable('Payment gateway is temporarily unavailable. Please try again shortly.')
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                result = func(*args)
+            except BadRequestError as e:
+                # Our request was wrong; the gateway itself is healthy
+                raise GatewayError(str(e)) from e
+            except requests.ConnectionError as e:
+                error, retryable = e, True
+            except (requests.Timeout, ServerError, RazorpayGatewayError) as e:
+                error, retryable = e, idempotent
+            else:
+                self.breaker.record_success()
+                return result
+
+            self.breaker.record_failure()
+            logger.warning(f"Razorpay call failed (attempt {attempt}/{MAX_ATTEMPTS}): {error}")
+            if not retryable or attempt == MAX_ATTEMPTS or self.breaker.is_open():
+                raise GatewayUnavailable('Payment gateway is not responding. Please try again shortly.') from error
+            time.sleep(backoff_delay(attempt))
+
+    def create_order(self, amount_paise, notes=None):
+        # An order created twice by a retry is never paid and simply expires
+        return self._call(self.client.order.create, {
+            'amount': amount_paise,
+            'currency': 'INR',
+            'payment_capture': 1,
+            'notes': notes or {},
+        })
+
+    def capture_payment(self, payment_id, amount_paise):
+        return self._call(self.client.payment.capture, payment_id, amount_paise, idempotent=True)
+
+
+class FakeGateway(BaseGateway):
+    """In-process gateway for offline load tests of the recharge flow.
+
+    Never touches the network; FAKE_GATEWAY_LATENCY and
+    FAKE_GATEWAY_FAILURE_RATE simulate a slow or flaky gateway. pay()
+    returns the signed callback fields a real checkout would post.
+    """
+
+    def __init__(self, key_secret, latency=0.0, failure_rate=0.0):
+        self.key_secret = key_secret
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            getattr(settings, 'RAZORPAY_KEY_SECRET', 'rzp_test_secret'),
+            latency=getattr(settings, 'FAKE_GATEWAY_LATENCY', 0.0),
+            failure_rate=getattr(settings, 'FAKE_GATEWAY_FAILURE_RATE', 0.0),
+        )
+
+    def _simulate(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise GatewayUnavailable('Payment gateway is not responding. Please try again shortly.')
+
+    def create_order(self, amount_paise, notes=None):
+        self._simulate()
+        return {
+            'id': f'order_fake{uuid.uuid4().hex[:14]}',
+            'amount': amount_paise,
+            'currency': 'INR',
+            'status': 'created',
+            'notes': notes or {},
+        }
+
+    def capture_payment(self, payment_id, amount_paise):
+        self._simulate()
+        return {'id': payment_id, 'amount': amount_paise, 'status': 'captured'}
+
+    def pay(self, order_id):
+        payment_id = f'pay_fake{uuid.uuid4().hex[:14]}'
+        signature = hmac.new(
+            self.key_secret.encode(), f'{order_id}|{payment_id}'.encode(), hashlib.sha256
+        ).hexdigest()
+        return {
+            'razorpay_order_id': order_id,
+            'razorpay_payment_id': payment_id,
+            'razorpay_signature': signature,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    """The configured gateway, built once per process so its pool is reused"""
+    backend = getattr(settings, 'PAYMENT_GATEWAY_BACKEND', 'wallet.gateway.RazorpayGateway')
+    return import_string(backend).from_settings()
@@ -0,0 +1,173 @@
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from reportlab.lib.colors import HexColor, black, white
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from .models import WalletTransaction
+
+INVOICE_CACHE_KEY = 'wallet_invoice_{}'
+INVOICE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+@lru_cache(maxsize=None)
+def _invoice_styles():
+    """Paragraph and table styles, built once per process"""
+    primary_color = HexColor('#198754')
+    secondary_color = HexColor('#f8f9fa')
+    styles = getSampleStyleSheet()
+    return {
+        'normal': styles['Normal'],
+        'heading': styles['Heading3'],
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30,
+            textColor=primary_color,
+            alignment=1  # Center
+        ),
+        'invoice_title': ParagraphStyle(
+            'InvoiceTitle',
+            parent=styles['Heading2'],
+            fontSize=18,
+            textColor=primary_color,
+            alignment=1
+        ),
+        'footer': ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=HexColor('#666666'),
+            alignment=1
+        ),
+        'details_table': TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ]),
+        'transaction_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), primary_color),
+            ('TEXTCOLOR', (0, 0), (-1, 0), white),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, black),
+            ('BACKGROUND', (0, -1), (-1, -1), secondary_color),
+        ]),
+        'balance_table': TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('BACKGROUND', (0, -1), (-1, -1), primary_color),
+            ('TEXTCOLOR', (0, -1), (-1, -1), white),
+        ]),
+    }
+
+
+def render_invoice(wallet_transaction):
+    """PDF bytes of a recharge invoice.
+
+    Rendered with invariant=True, so the same transaction always produces
+    the same bytes and therefore the same storage path.
+    """
+    styles = _invoice_styles()
+    user = wallet_transaction.wallet.user
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18,
+        invariant=True
+    )
+
+    invoice_table = Table([
+        ['Invoice ID:', f'INV-{wallet_transaction.id}'],
+        ['Date:', wallet_transaction.created_at.strftime('%B %d, %Y at %I:%M %p')],
+        ['Customer:', user.full_name or user.username],
+        ['Email:', user.email],
+        ['Payment ID:', wallet_transaction.payment_gateway_ref],
+    ], colWidths=[2*inch, 4*inch])
+    invoice_table.setStyle(styles['details_table'])
+
+    transaction_table = Table([
+        ['Description', 'Amount'],
+        ['Wallet Recharge', f'₹{wallet_transaction.amount:,.2f}'],
+        ['Gateway Charges', '₹0.00'],
+        ['Total Amount', f'₹{wallet_transaction.amount:,.2f}'],
+    ], colWidths=[4*inch, 2*inch])
+    transaction_table.setStyle(styles['transaction_table'])
+
+    balance_table = Table([
+        ['Previous Balance:', f'₹{wallet_transaction.balance_before:,.2f}'],
+        ['Amount Added:', f'₹{wallet_transaction.amount:,.2f}'],
+        ['New Balance:', f'₹{wallet_transaction.balance_after:,.2f}'],
+    ], colWidths=[3*inch, 3*inch])
+    balance_table.setStyle(styles['balance_table'])
+
+    doc.build([
+        Paragraph("KABAADWALA™", styles['title']),
+        Paragraph("Hyperlocal Scrap Marketplace", styles['normal']),
+        Spacer(1, 20),
+        Paragraph("WALLET RECHARGE INVOICE", styles['invoice_title']),
+        Spacer(1, 20),
+        invoice_table,
+        Spacer(1, 30),
+        Paragraph("TRANSACTION DETAILS", styles['heading']),
+        Spacer(1, 10),
+        transaction_table,
+        Spacer(1, 30),
+        Paragraph("WALLET SUMMARY", styles['heading']),
+        Spacer(1, 10),
+        balance_table,
+        Spacer(1, 40),
+        Paragraph("Thank you for using KABAADWALA™", styles['footer']),
+        Paragraph("For support, contact us at support@kabaadwala.com", styles['footer']),
+    ])
+    return buffer.getvalue()
+
+
+def invoice_storage_path(pdf_content):
+    """Content-addressed location; the unguessable name doubles as access control"""
+    digest = hashlib.sha256(pdf_content).hexdigest()
+    return f'invoices/{digest[:2]}/{digest}.pdf'
+
+
+def store_invoice(wallet_transaction):
+    """Render and store an invoice, recording its path on the transaction"""
+    pdf_content = render_invoice(wallet_transaction)
+    path = invoice_storage_path(pdf_content)
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(pdf_content))
+
+    WalletTransaction.objects.filter(pk=wallet_transaction.pk).update(invoice_path=path)
+    wallet_transaction.invoice_path = path
+    cache.set(INVOICE_CACHE_KEY.format(wallet_transaction.pk), pdf_content, INVOICE_CACHE_TIMEOUT)
+    return pdf_content
+
+
+def get_invoice_pdf(wallet_transaction):
+    """Invoice bytes from the cache, then storage, rendering only if neither has it"""
+    cache_key = INVOICE_CACHE_KEY.format(wallet_transaction.pk)
+    pdf_content = cache.get(cache_key)
+    if pdf_content is not None:
+        return pdf_content
+
+    if wallet_transaction.invoice_path and default_storage.exists(wallet_transaction.invoice_path):
+        with default_storage.open(wallet_transaction.invoice_path, 'rb') as fp:
+            pdf_content = fp.read()
+        cache.set(cache_key, pdf_content, INVOICE_CACHE_TIMEOUT)
+        return pdf_content
+
+    return store_invoice(wallet_transaction)
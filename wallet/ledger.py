@@ -0,0 +1,252 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Sum, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+from .models import Wallet, WalletTransaction, WalletCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Each posting moves its amount from one wallet account to another:
+#   recharge  gateway   -> available   (total_recharged, current_balance)
+#   earning   escrow    -> available   (total_earned, current_balance)
+#   hold      available -> held        (current_balance, held_amount)
+#   deduct    held      -> spent       (held_amount, total_spent)
+#   release / refund  held -> available
+# so current_balance + held_amount + total_spent ==
+# total_recharged + total_earned always.
+POSTING_EFFECTS = {
+    'recharge': {'total_recharged': 1, 'current_balance': 1},
+    'earning': {'total_earned': 1, 'current_balance': 1},
+    'hold': {'current_balance': -1, 'held_amount': 1},
+    'deduct': {'held_amount': -1, 'total_spent': 1},
+    'release': {'held_amount': -1, 'current_balance': 1},
+    'refund': {'held_amount': -1, 'current_balance': 1},
+}
+LEDGER_FIELDS = ('current_balance', 'held_amount', 'total_recharged', 'total_earned', 'total_spent')
+
+# Postings carry the time they were applied, but commit a moment later; a
+# checkpoint only covers postings older than this so none can slip under it
+CHECKPOINT_LAG = timedelta(minutes=5)
+
+
+class LedgerError(Exception):
+    """A posting would break the wallet invariants; nothing was written"""
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+def apply_postings(state, postings, now=None):
+    """Apply unsaved postings to `state` ({field: amount}) in memory.
+
+    Fills in balance_before/after, status and processed_at on each posting
+    and returns the net change per field.
+    """
+    now = now or timezone.now()
+    deltas = dict.fromkeys(LEDGER_FIELDS, Decimal('0.00'))
+    for posting in postings:
+        effects = POSTING_EFFECTS.get(posting.transaction_type)
+        if effects is None:
+            raise LedgerError(f'Unknown posting type: {posting.transaction_type}')
+        amount = Decimal(posting.amount)
+        if amount <= 0:
+            raise LedgerError('Posting amount must be positive')
+
+        posting.balance_before = state['current_balance']
+        for field, sign in effects.items():
+            state[field] += sign * amount
+            deltas[field] += sign * amount
+        if state['current_balance'] < 0:
+            raise InsufficientFunds('Insufficient wallet balance!')
+        if state['held_amount'] < 0:
+            raise LedgerError('Cannot settle more than is held')
+
+        posting.amount = amount
+        posting.balance_after = state['current_balance']
+        posting.status = 'completed'
+        posting.processed_at = now
+    return deltas
+
+
+def _lock_and_apply(wallet_id, postings):
+    """Lock the wallet row and apply postings to it; caller holds the transaction"""
+    wallet = Wallet.objects.select_for_update().get(pk=wallet_id)
+    now = timezone.now()
+    state = {field: getattr(wallet, field) for field in LEDGER_FIELDS}
+    deltas = apply_postings(state, postings, now)
+
+    Wallet.objects.filter(pk=wallet.pk).update(
+        updated_at=now,
+        **{field: F(field) + delta for field, delta in deltas.items() if delta}
+    )
+    for field in LEDGER_FIELDS:
+        setattr(wallet, field, state[field])
+
+    # update() skips post_save, so the navbar balance is invalidated here
+    transaction.on_commit(lambda: Wallet.invalidate_cache(wallet.user_id))
+    return wallet
+
+
+def post_many(wallet_id, postings):
+    """Append unsaved WalletTransaction postings to one wallet; see post_batch"""
+    for posting in postings:
+        posting.wallet_id = wallet_id
+    return post_batch(postings)
+
+
+def post_batch(postings):
+    """Append unsaved postings across any number of wallets atomically.
+
+    Every wallet involved is locked with one query (in pk order, so
+    concurrent batches cannot deadlock), balances move with a single
+    F()/Case UPDATE and the postings are written with one bulk insert.
+    Raises InsufficientFunds or LedgerError without writing anything.
+    """
+    by_wallet = defaultdict(list)
+    for posting in postings:
+        by_wallet[posting.wallet_id].append(posting)
+
+    with transaction.atomic():
+        wallets = Wallet.objects.select_for_update().filter(pk__in=by_wallet).order_by('pk').in_bulk()
+        now = timezone.now()
+        deltas = {}
+        for wallet_id, wallet_postings in by_wallet.items():
+            wallet = wallets.get(wallet_id)
+            if wallet is None:
+                raise LedgerError(f'Unknown wallet: {wallet_id}')
+            state = {field: getattr(wallet, field) for field in LEDGER_FIELDS}
+            deltas[wallet_id] = apply_postings(state, wallet_postings, now)
+            for posting in wallet_postings:
+                posting.wallet = wallet
+
+        updates = {}
+        for field in LEDGER_FIELDS:
+            whens = [
+                When(pk=wallet_id, then=F(field) + wallet_deltas[field])
+                for wallet_id, wallet_deltas in deltas.items() if wallet_deltas[field]
+            ]
+            if whens:
+                updates[field] = Case(
+                    *whens, default=F(field), output_field=DecimalField(max_digits=10, decimal_places=2)
+                )
+        Wallet.objects.filter(pk__in=deltas).update(updated_at=now, **updates)
+        created = WalletTransaction.objects.bulk_create(postings, batch_size=500)
+
+        # update() skips post_save, so navbar balances are invalidated here
+        user_ids = [wallet.user_id for wallet in wallets.values()]
+        transaction.on_commit(lambda: Wallet.invalidate_cache(*user_ids))
+    return created
+
+
+def post(wallet_id, transaction_type, amount, **fields):
+    """Append a single posting; see post_many"""
+    posting = WalletTransaction(transaction_type=transaction_type, amount=amount, **fields)
+    return post_many(wallet_id, [posting])[0]
+
+
+def complete_pending(transaction_id, **fields):
+    """Turn a pending recharge into a posting, at most once.
+
+    A failed recharge can still complete, since a gateway order may succeed
+    on a later attempt. `fields` (e.g. payment_gateway_ref) are set on the
+    row as it completes. Returns (transaction, applied); applied is False
+    when another request already completed it.
+    """
+    with transaction.atomic():
+        pending = WalletTransaction.objects.select_for_update().get(pk=transaction_id)
+        if pending.status not in ('pending', 'failed'):
+            return pending, False
+
+        pending.wallet = _lock_and_apply(pending.wallet_id, [pending])
+        for field, value in fields.items():
+            setattr(pending, field, value)
+        pending.save(update_fields=[
+            'status', 'amount', 'balance_before', 'balance_after', 'processed_at', 'updated_at',
+            *fields
+        ])
+    return pending, True
+
+
+def fail_pending(transaction_id, reason=''):
+    """Mark a pending recharge failed; completed postings are left alone"""
+    pending = WalletTransaction.objects.filter(pk=transaction_id, status='pending')
+    if reason:
+        return pending.update(
+            status='failed',
+            description=Concat('description', Value(f' - Failed: {reason}')),
+            updated_at=timezone.now()
+        )
+    return pending.update(status='failed', updated_at=timezone.now())
+
+
+def ledger_totals(wallet_id, until=None):
+    """Wallet totals rebuilt from its latest checkpoint plus later postings"""
+    checkpoints = WalletCheckpoint.objects.filter(wallet_id=wallet_id)
+    postings = WalletTransaction.objects.filter(wallet_id=wallet_id, status='completed')
+    if until is not None:
+        checkpoints = checkpoints.filter(cutoff__lte=until)
+        postings = postings.filter(processed_at__lte=until)
+
+    checkpoint = checkpoints.order_by('-cutoff').first()
+    if checkpoint is None:
+        totals = dict.fromkeys(LEDGER_FIELDS, Decimal('0.00'))
+    else:
+        totals = {field: getattr(checkpoint, field) for field in LEDGER_FIELDS}
+        postings = postings.filter(processed_at__gt=checkpoint.cutoff)
+
+    for row in postings.values('transaction_type').annotate(total=Sum('amount')):
+        for field, sign in POSTING_EFFECTS.get(row['transaction_type'], {}).items():
+            totals[field] += sign * row['total']
+    return totals
+
+
+def verify_wallet(wallet_id):
+    """Compare a wallet's stored balances with its ledger.
+
+    Returns {field: (stored, ledger)} for every mismatch; empty when the
+    wallet is consistent.
+    """
+    with transaction.atomic():
+        # The lock keeps postings from landing between the two reads
+        wallet = Wallet.objects.select_for_update().get(pk=wallet_id)
+        totals = ledger_totals(wallet_id)
+
+    return {
+        field: (getattr(wallet, field), totals[field])
+        for field in LEDGER_FIELDS
+        if getattr(wallet, field) != totals[field]
+    }
+
+
+def create_checkpoints(lag=CHECKPOINT_LAG):
+    """Checkpoint every wallet with postings since the last run and verify it.
+
+    Returns (checkpoints_created, wallets_with_drift).
+    """
+    cutoff = timezone.now() - lag
+    since = WalletCheckpoint.objects.aggregate(latest=Max('cutoff'))['latest']
+
+    touched = WalletTransaction.objects.filter(status='completed', processed_at__lte=cutoff)
+    if since is not None:
+        touched = touched.filter(processed_at__gt=since)
+    wallet_ids = list(touched.values_list('wallet_id', flat=True).distinct())
+
+    checkpoints = [
+        WalletCheckpoint(wallet_id=wallet_id, cutoff=cutoff, **ledger_totals(wallet_id, until=cutoff))
+        for wallet_id in wallet_ids
+    ]
+    WalletCheckpoint.objects.bulk_create(checkpoints, batch_size=500)
+
+    drifted = 0
+    for wallet_id in wallet_ids:
+        mismatches = verify_wallet(wallet_id)
+        if mismatches:
+            drifted += 1
+            logger.error(f"Wallet {wallet_id} does not match its ledger: {mismatches}")
+    return len(checkpoints), drifted
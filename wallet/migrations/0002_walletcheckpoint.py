@@ -0,0 +1,41 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_processed_at(apps, schema_editor):
+    # Ledger sums after a checkpoint are keyed on processed_at
+    WalletTransaction = apps.get_model('wallet', 'WalletTransaction')
+    WalletTransaction.objects.filter(
+        status='completed', processed_at__isnull=True
+    ).update(processed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cutoff', models.DateTimeField()),
+                ('current_balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('held_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_recharged', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_spent', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='wallet.wallet')),
+            ],
+            options={
+                'ordering': ['-cutoff'],
+                'indexes': [models.Index(fields=['wallet', '-cutoff'], name='wallet_checkpoint_cutoff_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_processed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+import uuid
+from django.db import migrations, models
+
+
+def backfill_payment_ids(apps, schema_editor):
+    # Completed callbacks stored the Razorpay payment id as the gateway ref.
+    # A payment that was credited twice keeps the id on its first row only.
+    WalletTransaction = apps.get_model('wallet', 'WalletTransaction')
+    seen = set()
+    updates = []
+    recharges = WalletTransaction.objects.filter(
+        transaction_type='recharge', status='completed', payment_gateway_ref__startswith='pay_'
+    ).order_by('created_at').only('id', 'payment_gateway_ref')
+    for transaction in recharges.iterator():
+        if transaction.payment_gateway_ref in seen:
+            continue
+        seen.add(transaction.payment_gateway_ref)
+        transaction.razorpay_payment_id = transaction.payment_gateway_ref
+        updates.append(transaction)
+    WalletTransaction.objects.bulk_update(updates, ['razorpay_payment_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0003_wallettransaction_invoice_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='razorpay_payment_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('event_type', models.CharField(max_length=50)),
+                ('payment_id', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('received', 'Received'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='received', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(backfill_payment_ids, migrations.RunPython.noop),
+    ]
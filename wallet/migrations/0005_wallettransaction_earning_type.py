@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0004_razorpay_payment_dedup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='wallettransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('recharge', 'Recharge'), ('hold', 'Hold'), ('deduct', 'Deduct'), ('release', 'Release'), ('refund', 'Refund'), ('earning', 'Earning')], max_length=20),
+        ),
+    ]
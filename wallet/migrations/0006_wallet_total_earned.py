@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def move_earnings_out_of_recharged(apps, schema_editor):
+    # Earnings used to be counted in total_recharged; move them to total_earned
+    Wallet = apps.get_model('wallet', 'Wallet')
+    WalletCheckpoint = apps.get_model('wallet', 'WalletCheckpoint')
+    WalletTransaction = apps.get_model('wallet', 'WalletTransaction')
+    earnings = WalletTransaction.objects.filter(transaction_type='earning', status='completed')
+
+    totals = earnings.values('wallet_id').annotate(total=Sum('amount')).values_list('wallet_id', 'total')
+    for wallet_id, total in totals:
+        Wallet.objects.filter(pk=wallet_id).update(
+            total_recharged=F('total_recharged') - total,
+            total_earned=F('total_earned') + total,
+        )
+
+    checkpoints = WalletCheckpoint.objects.filter(wallet_id__in=earnings.values('wallet_id'))
+    for checkpoint in checkpoints.iterator(chunk_size=500):
+        total = earnings.filter(
+            wallet_id=checkpoint.wallet_id, processed_at__lte=checkpoint.cutoff
+        ).aggregate(total=Sum('amount'))['total']
+        if total:
+            WalletCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                total_recharged=F('total_recharged') - total,
+                total_earned=total,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0005_wallettransaction_earning_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='total_earned',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='walletcheckpoint',
+            name='total_earned',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.RunPython(move_earnings_out_of_recharged, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,41 @@
 from django.db import models
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from core.models import BaseModel
+from decimal import Decimal
 
 User = get_user_model()
 
 
 class Wallet(BaseModel):
+    BALANCE_CACHE_KEY = 'wallet_balance_{}'
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wallet')
     current_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     total_recharged = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Vendor shares of settled orders; kept apart from gateway recharges
+    total_earned = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     total_spent = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     held_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     is_active = models.BooleanField(default=True)
     
     def __str__(self):
         return f"{self.user.username} - ₹{self.current_balance}"
+    
+    @classmethod
+    def get_cached_balance(cls, user_id):
+        """Current balance for navbar display, cached until the wallet changes"""
+        cache_key = cls.BALANCE_CACHE_KEY.format(user_id)
+        balance = cache.get(cache_key)
+        if balance is None:
+            balance = cls.objects.filter(user_id=user_id).values_list(
+                'current_balance', flat=True).first() or Decimal('0.00')
+            cache.set(cache_key, balance, None)
+        return balance
+    
+    @classmethod
+    def invalidate_cache(cls, *user_ids):
+        cache.delete_many([cls.BALANCE_CACHE_KEY.format(user_id) for user_id in user_ids])
 
 
 class WalletTransaction(BaseModel):
@@ -24,6 +45,7 @@ class WalletTransaction(BaseModel):
         ('deduct', 'Deduct'),
         ('release', 'Release'),
         ('refund', 'Refund'),
+        ('earning', 'Earning'),
     ]
     
     STATUS_CHOICES = [
@@ -38,14 +60,65 @@ class WalletTransaction(BaseModel):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     order_id = models.UUIDField(blank=True, null=True)
     payment_gateway_ref = models.CharField(max_length=255, blank=True)
+    # A gateway payment can credit at most one transaction
+    razorpay_payment_id = models.CharField(max_length=100, unique=True, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     description = models.TextField()
+    # Completed rows are ledger postings and are never edited afterwards;
+    # balance_before/after and processed_at are filled in by wallet.ledger
     balance_before = models.DecimalField(max_digits=10, decimal_places=2)
     balance_after = models.DecimalField(max_digits=10, decimal_places=2)
     processed_at = models.DateTimeField(blank=True, null=True)
+    # Stored recharge invoice, written by the generate_recharge_invoice task
+    invoice_path = models.CharField(max_length=255, blank=True)
     
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.wallet.user.username} - {self.transaction_type} - ₹{self.amount}"
+
+
+class PaymentEvent(BaseModel):
+    """Razorpay webhook deliveries, one row per event id so retries are dropped"""
+    STATUS_CHOICES = [
+        ('received', 'Received'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+    
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=50)
+    payment_id = models.CharField(max_length=100, blank=True, db_index=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='received')
+    error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.event_type} - {self.event_id}"
+
+
+class WalletCheckpoint(BaseModel):
+    """Ledger totals of a wallet as of `cutoff`, so verifying a wallet only
+    sums the postings made after its latest checkpoint"""
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='checkpoints')
+    cutoff = models.DateTimeField()
+    current_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    held_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    total_recharged = models.DecimalField(max_digits=10, decimal_places=2)
+    total_earned = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    total_spent = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        ordering = ['-cutoff']
+        indexes = [
+            models.Index(fields=['wallet', '-cutoff'], name='wallet_checkpoint_cutoff_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.wallet.user.username} @ {self.cutoff:%Y-%m-%d %H:%M}"
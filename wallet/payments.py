@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from . import ledger
+from .models import PaymentEvent, WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+# payment id -> transaction id of payments already credited; lets retried
+# callbacks and webhooks return before touching the database
+PROCESSED_PAYMENT_KEY = 'razorpay_payment_{}'
+PROCESSED_PAYMENT_TIMEOUT = 60 * 60 * 24
+
+# Events still 'received' after this are re-queued by sweep_stale_events
+STALE_EVENT_AGE = timedelta(minutes=5)
+STALE_EVENT_BATCH = 100
+
+CREDIT_EVENTS = ('payment.captured', 'order.paid')
+FAILURE_EVENTS = ('payment.failed',)
+
+
+class PaymentError(Exception):
+    """A gateway payment cannot be applied to any pending recharge"""
+
+
+def _signature_matches(message, signature, secret):
+    expected = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+def verify_payment_signature(razorpay_order_id, razorpay_payment_id, signature):
+    """Checkout callback signature: HMAC of 'order_id|payment_id' with the key secret"""
+    return _signature_matches(
+        f"{razorpay_order_id}|{razorpay_payment_id}".encode(),
+        signature,
+        getattr(settings, 'RAZORPAY_KEY_SECRET', 'rzp_test_secret')
+    )
+
+
+def verify_webhook_signature(body, signature):
+    """Webhook signature: HMAC of the raw body with the webhook secret"""
+    secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '')
+    return bool(secret) and _signature_matches(body, signature, secret)
+
+
+def get_processed_transaction_id(payment_id):
+    """Transaction already credited by this payment, or None"""
+    transaction_id = cache.get(PROCESSED_PAYMENT_KEY.format(payment_id))
+    if transaction_id is None:
+        transaction_id = WalletTransaction.objects.filter(
+            razorpay_payment_id=payment_id
+        ).values_list('id', flat=True).first()
+        if transaction_id is not None:
+            cache.set(PROCESSED_PAYMENT_KEY.format(payment_id), transaction_id, PROCESSED_PAYMENT_TIMEOUT)
+    return transaction_id
+
+
+def apply_payment(payment_id, razorpay_order_id, amount_paise=None):
+    """Credit the pending recharge a captured payment belongs to, exactly once.
+
+    The recharge is found by the Razorpay order id it was created with,
+    which the payment signature covers. Returns (transaction, applied);
+    applied is False for a payment that was already credited.
+    """
+    processed_id = get_processed_transaction_id(payment_id)
+    if processed_id is not None:
+        return WalletTransaction.objects.get(pk=processed_id), False
+
+    recharges = WalletTransaction.objects.filter(
+        transaction_type='recharge', payment_gateway_ref=razorpay_order_id
+    )
+    pending = recharges.order_by('created_at').first()
+    if pending is None:
+        raise PaymentError(f'No recharge found for payment {payment_id}')
+    if amount_paise is not None and int(pending.amount * 100) != int(amount_paise):
+        raise PaymentError(f'Amount of payment {payment_id} does not match recharge {pending.pk}')
+
+    try:
+        wallet_transaction, applied = ledger.complete_pending(
+            pending.pk, payment_gateway_ref=payment_id, razorpay_payment_id=payment_id
+        )
+    except IntegrityError:
+        # Lost the race to credit this payment on another recharge row
+        return WalletTransaction.objects.get(razorpay_payment_id=payment_id), False
+
+    if applied:
+        cache.set(PROCESSED_PAYMENT_KEY.format(payment_id), wallet_transaction.pk, PROCESSED_PAYMENT_TIMEOUT)
+        from .tasks import generate_recharge_invoice
+        transaction.on_commit(lambda: generate_recharge_invoice.delay(str(wallet_transaction.pk)))
+    return wallet_transaction, applied
+
+
+def record_event(event_id, event_type, payload):
+    """Store a webhook delivery; returns (event, created), created False for a retry"""
+    entity = payload.get('payload', {}).get('payment', {}).get('entity', {})
+    try:
+        return PaymentEvent.objects.get_or_create(
+            event_id=event_id,
+            defaults={
+                'event_type': event_type,
+                'payment_id': entity.get('id', ''),
+                'payload': payload,
+            }
+        )
+    except IntegrityError:
+        return PaymentEvent.objects.get(event_id=event_id), False
+
+
+def process_event(event):
+    """Apply one stored webhook event and record the outcome on it"""
+    entity = event.payload.get('payload', {}).get('payment', {}).get('entity', {})
+    status = 'ignored'
+    error = ''
+    try:
+        if event.event_type in CREDIT_EVENTS and entity.get('id') and entity.get('order_id'):
+            _, applied = apply_payment(entity['id'], entity['order_id'], amount_paise=entity.get('amount'))
+            status = 'processed' if applied else 'ignored'
+        elif event.event_type in FAILURE_EVENTS and entity.get('order_id'):
+            pending = WalletTransaction.objects.filter(
+                transaction_type='recharge', payment_gateway_ref=entity['order_id']
+            ).values_list('id', flat=True).first()
+            if pending is not None and ledger.fail_pending(pending, entity.get('error_description') or 'Payment failed'):
+                status = 'processed'
+    except PaymentError as e:
+        status, error = 'failed', str(e)
+        logger.warning(f"Razorpay event {event.event_id} not applied: {error}")
+
+    PaymentEvent.objects.filter(pk=event.pk).update(
+        status=status, error=error, processed_at=timezone.now(), updated_at=timezone.now()
+    )
+    return status
+
+
+def stale_event_ids(age=STALE_EVENT_AGE, limit=STALE_EVENT_BATCH):
+    """Events whose processing task failed for good or never ran"""
+    return list(
+        PaymentEvent.objects.filter(status='received', created_at__lt=timezone.now() - age)
+        .order_by('created_at').values_list('id', flat=True)[:limit]
+    )
@@ -11,3 +11,9 @@ def create_user_wallet(sender, instance, created, **kwargs):
     """Create wallet when user is created"""
     if created:
         Wallet.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Wallet)
+def invalidate_wallet_balance(sender, instance, **kwargs):
+    """Navbar balance is cached per user"""
+    Wallet.invalidate_cache(instance.user_id)
@@ -1,6 +1,9 @@
 from celery import shared_task
-from django.db import transaction
-from .models import WalletTransaction, Wallet
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import render_to_string
+from .models import WalletTransaction, PaymentEvent
+from . import invoices, ledger, payments
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,31 +13,21 @@ logger = logging.getLogger(__name__)
 def process_wallet_recharge(transaction_id, payment_method):
     """Process wallet recharge payment"""
     try:
-        wallet_transaction = WalletTransaction.objects.get(id=transaction_id)
-        wallet = wallet_transaction.wallet
-        
         # Simulate payment gateway processing
         # In real implementation, integrate with Razorpay/Stripe
         payment_success = True  # Simulate success
         
         if payment_success:
-            with transaction.atomic():
-                # Update wallet balance
-                wallet.current_balance += wallet_transaction.amount
-                wallet.total_recharged += wallet_transaction.amount
-                wallet.save()
-                
-                # Update transaction
-                wallet_transaction.status = 'completed'
-                wallet_transaction.balance_after = wallet.current_balance
-                wallet_transaction.payment_gateway_ref = f"PAY_{transaction_id[:8]}"
-                wallet_transaction.save()
-                
-                logger.info(f"Wallet recharge successful: {transaction_id}")
-                return f"Recharge successful: ₹{wallet_transaction.amount}"
+            wallet_transaction, applied = ledger.complete_pending(
+                transaction_id, payment_gateway_ref=f"PAY_{str(transaction_id)[:8]}"
+            )
+            if not applied:
+                return f"Recharge already {wallet_transaction.status}: {transaction_id}"
+            
+            logger.info(f"Wallet recharge successful: {transaction_id}")
+            return f"Recharge successful: ₹{wallet_transaction.amount}"
         else:
-            wallet_transaction.status = 'failed'
-            wallet_transaction.save()
+            ledger.fail_pending(transaction_id)
             logger.error(f"Wallet recharge failed: {transaction_id}")
             return f"Recharge failed: {transaction_id}"
             
@@ -47,40 +40,105 @@ def process_wallet_recharge(transaction_id, payment_method):
 def release_held_amount(order_id):
     """Release held amount after order completion"""
     try:
-        from orders.models import Order
-        order = Order.objects.get(id=order_id)
-        wallet = order.user.wallet
+        from orders.escrow import settle_orders
         
-        # Find hold transaction
-        hold_transaction = WalletTransaction.objects.filter(
-            wallet=wallet,
-            order_id=order_id,
-            transaction_type='hold',
-            status='completed'
-        ).first()
+        # Settles the buyer hold and credits the vendor, like the nightly release
+        if not settle_orders([order_id], notes='Released after order completion'):
+            return f"No held amount to release for order: {order_id}"
+        
+        logger.info(f"Amount released for order: {order_id}")
+        return f"Amount released for order: {order_id}"
         
-        if hold_transaction:
-            with transaction.atomic():
-                # Release held amount and deduct from wallet
-                wallet.held_amount -= hold_transaction.amount
-                wallet.total_spent += hold_transaction.amount
-                wallet.save()
-                
-                # Create deduct transaction
-                WalletTransaction.objects.create(
-                    wallet=wallet,
-                    transaction_type='deduct',
-                    amount=hold_transaction.amount,
-                    order_id=order_id,
-                    description=f'Payment for order {order.order_number}',
-                    balance_before=wallet.current_balance,
-                    balance_after=wallet.current_balance,
-                    status='completed'
-                )
-                
-                logger.info(f"Amount released for order: {order_id}")
-                return f"Amount released for order: {order.order_number}"
-                
     except Exception as e:
         logger.error(f"Error releasing held amount: {str(e)}")
         return f"Error: {str(e)}"
+
+
+@shared_task
+def checkpoint_wallet_ledgers():
+    """Snapshot ledger totals of recently active wallets and check for drift"""
+    try:
+        created, drifted = ledger.create_checkpoints()
+        if drifted:
+            logger.error(f"{drifted} wallets do not match their ledger")
+        return f"Checkpointed {created} wallets, {drifted} with drift"
+    except Exception as e:
+        logger.error(f"Error checkpointing wallet ledgers: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def generate_recharge_invoice(transaction_id):
+    """Store the invoice of a completed recharge and email it to the user"""
+    try:
+        wallet_transaction = WalletTransaction.objects.select_related('wallet__user').get(
+            id=transaction_id, transaction_type='recharge', status='completed'
+        )
+        user = wallet_transaction.wallet.user
+        
+        try:
+            pdf_content = invoices.get_invoice_pdf(wallet_transaction)
+        except Exception as e:
+            # Still send the receipt; the invoice renders again on download
+            logger.error(f"Invoice generation failed for {transaction_id}: {str(e)}")
+            pdf_content = None
+        
+        email = EmailMultiAlternatives(
+            subject="KABAADWALA™ - Wallet Recharge Invoice",
+            body=f'Your wallet has been recharged with ₹{wallet_transaction.amount}. New balance: ₹{wallet_transaction.balance_after}',
+            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'KABAADWALA <noreply@kabaadwala.com>'),
+            to=[user.email],
+        )
+        email.attach_alternative(render_to_string('emails/recharge_success.html', {
+            'user': user,
+            'amount': wallet_transaction.amount,
+            'new_balance': wallet_transaction.balance_after,
+            'transaction_id': wallet_transaction.id,
+        }), 'text/html')
+        if pdf_content is not None:
+            email.attach(f'invoice_{wallet_transaction.id}.pdf', pdf_content, 'application/pdf')
+        email.send(fail_silently=True)
+        
+        logger.info(f"Recharge invoice sent to {user.email}")
+        return f"Invoice sent for recharge: {transaction_id}"
+        
+    except Exception as e:
+        logger.error(f"Error sending recharge invoice: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+# Transient failures (lock timeouts, a lost connection) are retried; an
+# event that still fails stays 'received' for sweep_payment_events
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, retry_backoff_max=300, max_retries=5)
+def process_payment_event(event_id):
+    """Apply a stored Razorpay webhook event"""
+    try:
+        event = PaymentEvent.objects.get(id=event_id)
+    except PaymentEvent.DoesNotExist:
+        logger.warning(f"Payment event {event_id} not found")
+        return f"Event not found: {event_id}"
+    if event.status != 'received':
+        return f"Event already {event.status}: {event.event_id}"
+    
+    try:
+        status = payments.process_event(event)
+    except Exception as e:
+        logger.error(f"Error processing payment event {event.event_id}: {str(e)}")
+        raise
+    logger.info(f"Razorpay event {event.event_id} ({event.event_type}): {status}")
+    return f"Event {status}: {event.event_id}"
+
+
+@shared_task
+def sweep_payment_events():
+    """Re-queue webhook events that were stored but never applied"""
+    try:
+        event_ids = payments.stale_event_ids()
+        for event_id in event_ids:
+            process_payment_event.delay(str(event_id))
+        if event_ids:
+            logger.warning(f"Re-queued {len(event_ids)} stale payment events")
+        return len(event_ids)
+    except Exception as e:
+        logger.error(f"Error sweeping payment events: {str(e)}")
+        return f"Error: {str(e)}"
@@ -1,3 +1,186 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .gateway import CircuitBreaker, FakeGateway, GatewayUnavailable, RazorpayGateway
+from .ledger import InsufficientFunds, LedgerError, apply_postings
+from .payments import verify_payment_signature, verify_webhook_signature
+from .models import PaymentEvent, Wallet, WalletTransaction
+from .payments import record_event
+from .tasks import process_payment_event
+
+
+def _state(current='0.00', held='0.00', recharged='0.00', spent='0.00', earned='0.00'):
+    return {
+        'current_balance': Decimal(current),
+        'held_amount': Decimal(held),
+        'total_recharged': Decimal(recharged),
+        'total_earned': Decimal(earned),
+        'total_spent': Decimal(spent),
+    }
+
+
+class ApplyPostingsTest(SimpleTestCase):
+    def test_postings_stay_balanced(self):
+        state = _state()
+        postings = [
+            WalletTransaction(transaction_type='recharge', amount='500.00'),
+            WalletTransaction(transaction_type='hold', amount='200.00'),
+            WalletTransaction(transaction_type='hold', amount='100.00'),
+            WalletTransaction(transaction_type='deduct', amount='200.00'),
+            WalletTransaction(transaction_type='refund', amount='100.00'),
+        ]
+        apply_postings(state, postings)
+        
+        self.assertEqual(state, _state('300.00', '0.00', '500.00', '200.00'))
+        self.assertEqual(
+            state['current_balance'] + state['held_amount'] + state['total_spent'],
+            state['total_recharged'] + state['total_earned']
+        )
+        # Each posting records the balance it moved from and to
+        self.assertEqual(
+            [(p.balance_before, p.balance_after) for p in postings],
+            [(0, 500), (500, 300), (300, 200), (200, 200), (200, 300)]
+        )
+    
+    def test_vendor_earning_is_an_inflow(self):
+        state = _state()
+        apply_postings(state, [WalletTransaction(transaction_type='earning', amount='95.00')])
+        # Earnings are not recharges, so they do not show up in total_recharged
+        self.assertEqual(state, _state('95.00', earned='95.00'))
+    
+    def test_hold_cannot_overdraw(self):
+        with self.assertRaises(InsufficientFunds):
+            apply_postings(_state('50.00', recharged='50.00'), [
+                WalletTransaction(transaction_type='hold', amount='50.01'),
+            ])
+    
+    def test_cannot_settle_more_than_held(self):
+        with self.assertRaises(LedgerError):
+            apply_postings(_state(held='10.00', recharged='10.00'), [
+                WalletTransaction(transaction_type='deduct', amount='20.00'),
+            ])
+
+
+class PaymentSignatureTest(SimpleTestCase):
+    @override_settings(RAZORPAY_KEY_SECRET='key-secret')
+    def test_callback_signature(self):
+        signature = hmac.new(b'key-secret', b'order_1|pay_1', hashlib.sha256).hexdigest()
+        self.assertTrue(verify_payment_signature('order_1', 'pay_1', signature))
+        self.assertFalse(verify_payment_signature('order_2', 'pay_1', signature))
+        self.assertFalse(verify_payment_signature('order_1', 'pay_1', None))
+    
+    @override_settings(RAZORPAY_WEBHOOK_SECRET='hook-secret')
+    def test_webhook_signature(self):
+        body = b'{"event": "payment.captured"}'
+        signature = hmac.new(b'hook-secret', body, hashlib.sha256).hexdigest()
+        self.assertTrue(verify_webhook_signature(body, signature))
+        self.assertFalse(verify_webhook_signature(body + b' ', signature))
+    
+    @override_settings(RAZORPAY_WEBHOOK_SECRET='')
+    def test_webhooks_rejected_without_secret(self):
+        signature = hmac.new(b'', b'{}', hashlib.sha256).hexdigest()
+        self.assertFalse(verify_webhook_signature(b'{}', signature))
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch('wallet.gateway.time.sleep')
+class RazorpayGatewayRetryTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.gateway = RazorpayGateway('key', 'secret')
+    
+    def test_connection_errors_are_retried(self, sleep):
+        call = mock.Mock(side_effect=[requests.ConnectionError(), {'id': 'order_1'}])
+        self.assertEqual(self.gateway._call(call), {'id': 'order_1'})
+        self.assertEqual(call.call_count, 2)
+    
+    def test_timeouts_are_not_retried_unless_idempotent(self, sleep):
+        call = mock.Mock(side_effect=requests.ReadTimeout())
+        with self.assertRaises(GatewayUnavailable):
+            self.gateway._call(call)
+        self.assertEqual(call.call_count, 1)
+    
+    def test_open_circuit_skips_the_call(self, sleep):
+        breaker = CircuitBreaker('razorpay', threshold=1)
+        breaker.record_failure()
+        call = mock.Mock()
+        with self.assertRaises(GatewayUnavailable):
+            self.gateway._call(call)
+        call.assert_not_called()
+
+
+class FakeGatewayTest(SimpleTestCase):
+    @override_settings(RAZORPAY_KEY_SECRET='key-secret')
+    def test_pay_is_signed_like_razorpay(self):
+        gateway = FakeGateway('key-secret')
+        order = gateway.create_order(10000)
+        callback = gateway.pay(order['id'])
+        self.assertTrue(verify_payment_signature(
+            callback['razorpay_order_id'], callback['razorpay_payment_id'], callback['razorpay_signature']
+        ))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RAZORPAY_WEBHOOK_SECRET='hook-secret')
+class PaymentEventRetryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username='payer', email='payer@example.com', password='pass')
+        self.wallet = Wallet.objects.get(user=user)
+        WalletTransaction.objects.create(
+            wallet=self.wallet,
+            transaction_type='recharge',
+            amount=Decimal('100.00'),
+            payment_gateway_ref='order_1',
+            description='Wallet recharge',
+            balance_before=Decimal('0.00'),
+            balance_after=Decimal('0.00')
+        )
+        self.payload = {
+            'event': 'payment.captured',
+            'payload': {'payment': {'entity': {'id': 'pay_1', 'order_id': 'order_1', 'amount': 10000}}},
+        }
+    
+    def _deliver(self):
+        body = json.dumps(self.payload).encode()
+        return self.client.post(
+            reverse('wallet:razorpay_webhook'),
+            body,
+            content_type='application/json',
+            HTTP_X_RAZORPAY_SIGNATURE=hmac.new(b'hook-secret', body, hashlib.sha256).hexdigest(),
+            HTTP_X_RAZORPAY_EVENT_ID='evt_1'
+        )
+    
+    def test_failed_attempt_is_requeued_and_applied(self):
+        event, _ = record_event('evt_1', 'payment.captured', self.payload)
+        
+        with mock.patch('wallet.payments.ledger.complete_pending', side_effect=OperationalError('lock timeout')):
+            with self.assertRaises(OperationalError):
+                process_payment_event(str(event.pk))
+        self.assertEqual(PaymentEvent.objects.get(pk=event.pk).status, 'received')
+        
+        # Razorpay's retry of the same event queues it again
+        with mock.patch('wallet.views.process_payment_event.delay') as delay:
+            self.assertEqual(self._deliver().status_code, 200)
+        delay.assert_called_once_with(str(event.pk))
+        
+        process_payment_event(str(event.pk))
+        self.assertEqual(PaymentEvent.objects.get(pk=event.pk).status, 'processed')
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).current_balance, Decimal('100.00'))
+        
+        # Once applied, further retries are only acknowledged
+        with mock.patch('wallet.views.process_payment_event.delay') as delay:
+            self._deliver()
+        delay.assert_not_called()
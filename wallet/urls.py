@@ -8,6 +8,8 @@ urlpatterns = [
     path('', views.wallet_detail, name='detail'),
     path('recharge/', views.recharge_wallet, name='recharge'),
     path('transactions/', views.transaction_history, name='transactions'),
+    path('transactions/<uuid:transaction_id>/invoice/', views.download_invoice, name='invoice'),
     path('payment-callback/', views.payment_callback, name='payment_callback'),
+    path('razorpay-webhook/', views.razorpay_webhook, name='razorpay_webhook'),
     path('payment-error/', views.payment_error_log, name='payment_error_log'),
 ]
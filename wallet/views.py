@@ -6,21 +6,15 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
 from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from .models import Wallet, WalletTransaction
-from .tasks import process_wallet_recharge
-import razorpay
+from .tasks import process_wallet_recharge, process_payment_event
+from . import invoices, ledger, payments
+from .gateway import GatewayError, get_gateway
 import json
-import hmac
 import hashlib
 
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(auth=(
-    getattr(settings, 'RAZORPAY_KEY_ID', 'rzp_test_key'),
-    getattr(settings, 'RAZORPAY_KEY_SECRET', 'rzp_test_secret')
-))
-
-
 @login_required
 def wallet_detail(request):
     """Wallet detail view - only for customers"""
@@ -87,18 +81,13 @@ def recharge_wallet(request):
             # Create Razorpay order
             print(f"Creating Razorpay order...")
             try:
-                razorpay_order = razorpay_client.order.create({
-                    'amount': int(amount * 100),  # Amount in paise
-                    'currency': 'INR',
-                    'payment_capture': 1,
-                    'notes': {
-                        'user_id': str(request.user.id),
-                        'user_email': request.user.email,
-                        'transaction_type': 'wallet_recharge'
-                    }
+                razorpay_order = get_gateway().create_order(int(amount * 100), notes={  # Amount in paise
+                    'user_id': str(request.user.id),
+                    'user_email': request.user.email,
+                    'transaction_type': 'wallet_recharge'
                 })
                 print(f"Razorpay order created: {razorpay_order['id']}")
-            except Exception as razorpay_error:
+            except GatewayError as razorpay_error:
                 print(f"❌ Razorpay API Error: {str(razorpay_error)}")
                 if "authentication" in str(razorpay_error).lower():
                     messages.error(request, 'Payment gateway configuration error. Please contact support.')
@@ -186,6 +175,22 @@ def transaction_history(request):
     return render(request, 'wallet/transactions.html', context)
 
 
+@login_required
+def download_invoice(request, transaction_id):
+    """Download the PDF invoice of a completed recharge"""
+    wallet_transaction = get_object_or_404(
+        WalletTransaction.objects.select_related('wallet__user'),
+        id=transaction_id,
+        wallet__user=request.user,
+        transaction_type='recharge',
+        status='completed'
+    )
+    response = HttpResponse(invoices.get_invoice_pdf(wallet_transaction), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="invoice_{wallet_transaction.id}.pdf"'
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
 @csrf_exempt
 @require_POST
 def payment_callback(request):
@@ -196,226 +201,37 @@ def payment_callback(request):
         razorpay_signature = request.POST.get('razorpay_signature')
         transaction_id = request.POST.get('transaction_id')
         
-        # Verify payment signature
-        generated_signature = hmac.new(
-            getattr(settings, 'RAZORPAY_KEY_SECRET', 'rzp_test_secret').encode(),
-            f"{razorpay_order_id}|{razorpay_payment_id}".encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if generated_signature == razorpay_signature:
+        if payments.verify_payment_signature(razorpay_order_id, razorpay_payment_id, razorpay_signature):
+            # Fast path for a callback that was already applied (e.g. a refresh)
+            if payments.get_processed_transaction_id(razorpay_payment_id) is not None:
+                messages.info(request, 'This payment has already been processed.')
+                return redirect('wallet:detail')
+            
+            transaction = get_object_or_404(
+                WalletTransaction, payment_gateway_ref=razorpay_order_id, transaction_type='recharge'
+            )
+            
             # Payment successful - capture the payment
             try:
                 # Capture payment to ensure it appears in dashboard
-                payment_capture = razorpay_client.payment.capture(razorpay_payment_id, int(transaction.amount * 100))
+                payment_capture = get_gateway().capture_payment(razorpay_payment_id, int(transaction.amount * 100))
                 print(f"✅ Payment captured: {payment_capture}")
             except Exception as capture_error:
                 print(f"⚠️ Payment capture warning: {str(capture_error)}")
                 # Continue even if capture fails as payment is already verified
             
-            # Payment successful
-            transaction = get_object_or_404(WalletTransaction, id=transaction_id)
-            
-            # Update transaction
-            transaction.status = 'completed'
-            transaction.payment_gateway_ref = razorpay_payment_id
-            transaction.save()
-            
-            # Update wallet balance
-            wallet = transaction.wallet
-            wallet.current_balance += transaction.amount
-            wallet.total_recharged += transaction.amount
-            transaction.balance_after = wallet.current_balance
-            wallet.save()
-            transaction.save()
-            
-            # Send recharge success email
-            from django.core.mail import send_mail
-            from django.template.loader import render_to_string
-            
-            try:
-                # Generate PDF invoice
-                from reportlab.pdfgen import canvas
-                from reportlab.lib.pagesizes import letter, A4
-                from reportlab.lib.colors import HexColor, black, white
-                from reportlab.lib.units import inch
-                from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                from io import BytesIO
-                import os
-                
-                buffer = BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-                
-                # Define colors
-                primary_color = HexColor('#198754')
-                secondary_color = HexColor('#f8f9fa')
-                
-                # Get styles
-                styles = getSampleStyleSheet()
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Heading1'],
-                    fontSize=24,
-                    spaceAfter=30,
-                    textColor=primary_color,
-                    alignment=1  # Center
-                )
-                
-                # Build invoice content
-                story = []
-                
-                # Header
-                story.append(Paragraph("KABAADWALA™", title_style))
-                story.append(Paragraph("Hyperlocal Scrap Marketplace", styles['Normal']))
-                story.append(Spacer(1, 20))
-                
-                # Invoice title
-                invoice_title = ParagraphStyle(
-                    'InvoiceTitle',
-                    parent=styles['Heading2'],
-                    fontSize=18,
-                    textColor=primary_color,
-                    alignment=1
-                )
-                story.append(Paragraph("WALLET RECHARGE INVOICE", invoice_title))
-                story.append(Spacer(1, 20))
-                
-                # Invoice details table
-                invoice_data = [
-                    ['Invoice ID:', f'INV-{transaction.id}'],
-                    ['Date:', transaction.created_at.strftime('%B %d, %Y at %I:%M %p')],
-                    ['Customer:', transaction.wallet.user.full_name or transaction.wallet.user.username],
-                    ['Email:', transaction.wallet.user.email],
-                    ['Payment ID:', razorpay_payment_id],
-                ]
-                
-                invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
-                invoice_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ]))
-                story.append(invoice_table)
-                story.append(Spacer(1, 30))
-                
-                # Transaction details
-                story.append(Paragraph("TRANSACTION DETAILS", styles['Heading3']))
-                story.append(Spacer(1, 10))
-                
-                transaction_data = [
-                    ['Description', 'Amount'],
-                    ['Wallet Recharge', f'₹{transaction.amount:,.2f}'],
-                    ['Gateway Charges', '₹0.00'],
-                    ['Total Amount', f'₹{transaction.amount:,.2f}'],
-                ]
-                
-                transaction_table = Table(transaction_data, colWidths=[4*inch, 2*inch])
-                transaction_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), white),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                    ('GRID', (0, 0), (-1, -1), 1, black),
-                    ('BACKGROUND', (0, -1), (-1, -1), secondary_color),
-                ]))
-                story.append(transaction_table)
-                story.append(Spacer(1, 30))
-                
-                # Wallet balance
-                story.append(Paragraph("WALLET SUMMARY", styles['Heading3']))
-                story.append(Spacer(1, 10))
-                
-                balance_data = [
-                    ['Previous Balance:', f'₹{transaction.balance_before:,.2f}'],
-                    ['Amount Added:', f'₹{transaction.amount:,.2f}'],
-                    ['New Balance:', f'₹{wallet.current_balance:,.2f}'],
-                ]
-                
-                balance_table = Table(balance_data, colWidths=[3*inch, 3*inch])
-                balance_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-                    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                    ('BACKGROUND', (0, -1), (-1, -1), primary_color),
-                    ('TEXTCOLOR', (0, -1), (-1, -1), white),
-                ]))
-                story.append(balance_table)
-                story.append(Spacer(1, 40))
-                
-                # Footer
-                footer_style = ParagraphStyle(
-                    'Footer',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    textColor=HexColor('#666666'),
-                    alignment=1
-                )
-                story.append(Paragraph("Thank you for using KABAADWALA™", footer_style))
-                story.append(Paragraph("For support, contact us at support@kabaadwala.com", footer_style))
-                
-                # Build PDF
-                doc.build(story)
-                pdf_content = buffer.getvalue()
-                buffer.close()
-                
-                subject = f"KABAADWALA™ - Wallet Recharge Invoice"
-                html_message = render_to_string('emails/recharge_success.html', {
-                    'user': transaction.wallet.user,
-                    'amount': transaction.amount,
-                    'new_balance': wallet.current_balance,
-                    'transaction_id': transaction.id,
-                })
-                
-                from django.core.mail import EmailMessage
-                email = EmailMessage(
-                    subject=subject,
-                    body=f'Your wallet has been recharged with ₹{transaction.amount}. New balance: ₹{wallet.current_balance}',
-                    from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'KABAADWALA <noreply@kabaadwala.com>'),
-                    to=[transaction.wallet.user.email],
-                )
-                email.attach(f'invoice_{transaction.id}.pdf', pdf_content, 'application/pdf')
-                email.send(fail_silently=True)
-                
-                print(f"✅ Recharge email with PDF invoice sent to {transaction.wallet.user.email}")
-            except Exception as e:
-                print(f"❌ Email/PDF generation failed: {str(e)}")
-                # Fallback to simple email
-                try:
-                    subject = f"KABAADWALA™ - Wallet Recharged Successfully"
-                    html_message = render_to_string('emails/recharge_success.html', {
-                        'user': transaction.wallet.user,
-                        'amount': transaction.amount,
-                        'new_balance': wallet.current_balance,
-                        'transaction_id': transaction.id,
-                    })
-                    
-                    send_mail(
-                        subject=subject,
-                        message=f'Your wallet has been recharged with ₹{transaction.amount}. New balance: ₹{wallet.current_balance}',
-                        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'KABAADWALA <noreply@kabaadwala.com>'),
-                        recipient_list=[transaction.wallet.user.email],
-                        html_message=html_message,
-                        fail_silently=True
-                    )
-                    print(f"✅ Simple recharge email sent to {transaction.wallet.user.email}")
-                except Exception as e2:
-                    print(f"❌ Fallback email also failed: {str(e2)}")
+            # Credits the wallet and queues the invoice at most once per payment
+            transaction, applied = payments.apply_payment(razorpay_payment_id, razorpay_order_id)
+            if not applied:
+                messages.info(request, 'This payment has already been processed.')
+                return redirect('wallet:detail')
             
             messages.success(request, f'Wallet recharged successfully with ₹{transaction.amount}!')
             return redirect('wallet:detail')
         else:
             # Payment verification failed
-            transaction = get_object_or_404(WalletTransaction, id=transaction_id)
-            transaction.status = 'failed'
-            transaction.save()
+            get_object_or_404(WalletTransaction, id=transaction_id)
+            ledger.fail_pending(transaction_id)
             
             messages.error(request, 'Payment verification failed. Please try again.')
             return redirect('wallet:recharge')
@@ -425,6 +241,28 @@ def payment_callback(request):
         return redirect('wallet:recharge')
 
 
+@csrf_exempt
+@require_POST
+def razorpay_webhook(request):
+    """Accept a Razorpay webhook; it is applied by a Celery task"""
+    if not payments.verify_webhook_signature(request.body, request.headers.get('X-Razorpay-Signature')):
+        return JsonResponse({'status': 'invalid signature'}, status=400)
+    
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'status': 'invalid payload'}, status=400)
+    
+    event_id = request.headers.get('X-Razorpay-Event-Id') or hashlib.sha256(request.body).hexdigest()
+    event, created = payments.record_event(event_id, payload.get('event', ''), payload)
+    if created or event.status == 'received':
+        # A retry of an event whose processing failed queues it again
+        process_payment_event.delay(str(event.id))
+    
+    # Retries of an applied event are acknowledged without doing anything
+    return JsonResponse({'status': 'ok'})
+
+
 @csrf_exempt
 @require_POST
 def payment_error_log(request):
@@ -447,14 +285,11 @@ def payment_error_log(request):
         
         # Update transaction status if exists
         if transaction_id:
-            try:
-                transaction = WalletTransaction.objects.get(id=transaction_id)
-                transaction.status = 'failed'
-                transaction.description += f" - Failed: {error.get('description', 'Unknown error')}"
-                transaction.save()
+            # Only a pending recharge can fail; completed postings are final
+            if ledger.fail_pending(transaction_id, error.get('description', 'Unknown error')):
                 print(f"✅ Transaction {transaction_id} marked as failed")
-            except WalletTransaction.DoesNotExist:
-                print(f"❌ Transaction {transaction_id} not found")
+            else:
+                print(f"❌ Pending transaction {transaction_id} not found")
         
         return JsonResponse({'status': 'logged'})
         